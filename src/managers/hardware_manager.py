@@ -235,7 +235,10 @@ class HardwareManager(QObject):
         return self.send_command("MODE_EULER")
     
     def set_vhit_mode(self) -> bool:
-        """Establece modo VHIT en el IMU"""
+        """
+        Establece modo VHIT en el IMU (firmware Arduino: aceleración y giro, sin orientación).
+        El análisis vHIT en vivo usa el ángulo del stream LIVE y no necesita este modo.
+        """
         return self.send_command("MODE_VHIT")
     
     def zero_position(self) -> bool:
@@ -61,7 +61,8 @@ class TestManager(QObject):
             "seguimiento_lento": "Seguimiento Lento",
             "optoquinetico": "Optoquinético",
             "sacadas": "Sacadas",
-            "espontaneo": "Espontáneo"
+            "espontaneo": "Espontáneo",
+            "vhit": "Impulso Cefálico (vHIT)"
         }
         
         # Protocolos que necesitan estímulos
@@ -235,15 +236,16 @@ class TestManager(QObject):
             if not self.siev_manager:
                 raise Exception("Gestor de usuarios no disponible")
             
-            # Validar archivo
+            # Validar archivo (una sola apertura; deja la metadata en caché)
             validation = self.siev_manager.validate_siev(file_path)
             if not validation['valid']:
                 errors = '\n'.join(validation['errors'])
                 raise Exception(f"Archivo inválido:\n{errors}")
             
-            # Cargar datos del usuario
-            user_data = self.siev_manager.get_user_info(file_path)
-            user_tests = self.siev_manager.get_user_tests(file_path)
+            # Cargar datos del usuario desde la metadata ya validada
+            metadata = validation['metadata']
+            user_data = metadata.get('usuario', {})
+            user_tests = metadata.get('pruebas', [])
             
             # Actualizar estado
             self.current_user_siev = file_path
@@ -168,12 +168,13 @@ class VideoManager(QObject):
             self.video_mode_changed.emit('live')
             print("Cambiado a modo video en vivo")
     
-    def switch_to_player_mode(self, video_data: bytes):
+    def switch_to_player_mode(self, video_data):
         """
         Cambia a modo reproductor con datos de video específicos
         
         Args:
-            video_data: Datos binarios del video a reproducir
+            video_data: Ruta del video (SievManager.get_test_video_path) o
+                        datos binarios del video a reproducir
         """
         if self.video_widget:
             success = self.video_widget.switch_to_player(video_data)
@@ -0,0 +1,107 @@
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                               QLineEdit, QTreeWidget, QTreeWidgetItem, QFileDialog,
+                               QHeaderView)
+from PySide6.QtCore import Qt, QTimer
+from datetime import datetime
+import os
+
+
+class PatientSearchDialog(QDialog):
+    """Búsqueda de pacientes en el catálogo de expedientes .siev"""
+    def __init__(self, siev_manager, parent=None):
+        super().__init__(parent)
+        self.siev_manager = siev_manager
+        self.selected_path = None
+        self.setWindowTitle("Abrir Usuario - Sistema VNG")
+        self.setModal(True)
+        self.resize(760, 480)
+
+        # Buscar al dejar de escribir (no en cada tecla)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.refresh_results)
+
+        self.setup_ui()
+        self.refresh_results()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setSpacing(10)
+        layout.setContentsMargins(15, 15, 15, 15)
+
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Buscar por nombre o ID de paciente...")
+        self.search_edit.textChanged.connect(lambda _: self.search_timer.start())
+        layout.addWidget(self.search_edit)
+
+        self.results_tree = QTreeWidget()
+        self.results_tree.setHeaderLabels(["Nombre", "ID", "Pruebas", "Última prueba", "Archivo"])
+        self.results_tree.setRootIsDecorated(False)
+        self.results_tree.setSortingEnabled(True)
+        self.results_tree.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.results_tree.itemDoubleClicked.connect(lambda item, _: self.open_item(item))
+        layout.addWidget(self.results_tree)
+
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("font-size: 11px; color: #666;")
+        layout.addWidget(self.status_label)
+
+        button_layout = QHBoxLayout()
+
+        self.browse_btn = QPushButton("Examinar...")
+        self.browse_btn.clicked.connect(self.browse_file)
+        button_layout.addWidget(self.browse_btn)
+        button_layout.addStretch()
+
+        self.open_btn = QPushButton("Abrir")
+        self.open_btn.setDefault(True)
+        self.open_btn.clicked.connect(lambda: self.open_item(self.results_tree.currentItem()))
+        button_layout.addWidget(self.open_btn)
+
+        cancel_btn = QPushButton("Cancelar")
+        cancel_btn.clicked.connect(self.reject)
+        button_layout.addWidget(cancel_btn)
+
+        layout.addLayout(button_layout)
+
+    def refresh_results(self):
+        """Consulta el catálogo con el texto de búsqueda"""
+        results = self.siev_manager.search_patients(self.search_edit.text())
+
+        self.results_tree.setSortingEnabled(False)
+        self.results_tree.clear()
+        for entry in results:
+            ultima = entry.get('ultima_prueba') or entry.get('actualizado')
+            item = QTreeWidgetItem([
+                entry.get('nombre') or "",
+                entry.get('id_paciente') or "",
+                str(entry.get('total_pruebas') or 0),
+                datetime.fromtimestamp(ultima).strftime("%Y-%m-%d %H:%M") if ultima else "",
+                os.path.basename(entry['ruta'])
+            ])
+            item.setData(0, Qt.UserRole, entry['ruta'])
+            self.results_tree.addTopLevelItem(item)
+        self.results_tree.setSortingEnabled(True)
+
+        if self.results_tree.topLevelItemCount():
+            self.results_tree.setCurrentItem(self.results_tree.topLevelItem(0))
+        self.status_label.setText(f"{len(results)} expedientes")
+
+    def open_item(self, item):
+        if item is None:
+            return
+        self.selected_path = item.data(0, Qt.UserRole)
+        self.accept()
+
+    def browse_file(self):
+        """Elegir un archivo fuera del catálogo"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self,
+            "Abrir Usuario - Sistema VNG",
+            self.siev_manager.base_path,
+            "Archivos SIEV (*.siev);;Todos los archivos (*.*)"
+        )
+        if file_path:
+            self.selected_path = file_path
+            self.accept()
@@ -9,10 +9,58 @@ from PySide6.QtWidgets import (
     QTableWidgetItem, QMessageBox, QFrame, QSplitter, QGroupBox,
     QGridLayout, QHeaderView
 )
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QFont
 from datetime import datetime
 
+from utils.DetectorNistagmo import analizar_pruebas, parametros_analisis, CANALES_NISTAGMO
+
+
+class NystagmusAnalysisWorker(QThread):
+    """Analiza los nistagmos de las pruebas del informe sin bloquear la UI"""
+    
+    analysis_done = Signal(dict)  # test_id -> canal -> resultados
+    
+    def __init__(self, siev_manager, siev_path, test_ids):
+        super().__init__()
+        self.siev_manager = siev_manager
+        self.siev_path = siev_path
+        self.test_ids = list(test_ids)
+    
+    def run(self):
+        """
+        Analiza ambos ojos y ambos ejes repartiendo las pruebas en un pool de
+        procesos. Las pruebas con análisis vigente en el .siev no se recalculan.
+        """
+        try:
+            cache_parameters = parametros_analisis()
+            
+            # Reutilizar análisis guardados si los datos y parámetros no cambiaron
+            results = self.siev_manager.get_cached_analyses(self.siev_path, self.test_ids,
+                                                            cache_parameters)
+            
+            tests_columns = {}
+            for test_id in self.test_ids:
+                if test_id in results:
+                    continue
+                columns = self.siev_manager.extract_test_columns(
+                    self.siev_path, test_id, ['timestamp'] + list(CANALES_NISTAGMO))
+                if columns:
+                    tests_columns[test_id] = columns
+            
+            if tests_columns:
+                new_results = analizar_pruebas(tests_columns)
+                self.siev_manager.store_analyses(self.siev_path, new_results, cache_parameters)
+                results.update(new_results)
+            
+            print(f"Análisis: {len(results) - len(tests_columns)} desde caché, "
+                  f"{len(tests_columns)} calculados")
+            self.analysis_done.emit(results)
+            
+        except Exception as e:
+            print(f"Error analizando pruebas del informe: {e}")
+            self.analysis_done.emit({})
+
 
 class TestSelectionPage(QWizardPage):
     """Primera página: Selección de pruebas"""
@@ -336,6 +384,7 @@ class ReportSummaryPage(QWizardPage):
         super().__init__()
         self.user_data = user_data
         self.selected_tests = []
+        self.analysis_running = False
         
         self.setTitle("Resumen del Informe")
         self.setSubTitle("Revise la información y agregue comentarios")
@@ -390,11 +439,22 @@ class ReportSummaryPage(QWizardPage):
         self.tests_table.setMaximumHeight(150)
         summary_layout.addWidget(self.tests_table)
         
-        # Espacio para resumen de resultados (futuro)
+        # Resumen de resultados: análisis de nistagmos por prueba y canal
         summary_layout.addWidget(QLabel("Resumen de Resultados:"))
-        results_label = QLabel("(Esta funcionalidad se implementará posteriormente)")
-        results_label.setStyleSheet("color: #666; font-style: italic; padding: 10px;")
-        summary_layout.addWidget(results_label)
+        self.results_status_label = QLabel()
+        self.results_status_label.setStyleSheet("color: #666; font-style: italic;")
+        summary_layout.addWidget(self.results_status_label)
+        
+        self.results_table = QTableWidget()
+        self.results_table.setColumnCount(4)
+        self.results_table.setHorizontalHeaderLabels(["Prueba", "Canal", "Nistagmos", "VCL promedio (°/s)"])
+        results_header = self.results_table.horizontalHeader()
+        results_header.setSectionResizeMode(0, QHeaderView.Stretch)
+        results_header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        results_header.setSectionResizeMode(2, QHeaderView.ResizeToContents)
+        results_header.setSectionResizeMode(3, QHeaderView.ResizeToContents)
+        self.results_table.setMaximumHeight(150)
+        summary_layout.addWidget(self.results_table)
         
         summary_group.setLayout(summary_layout)
         layout.addWidget(summary_group)
@@ -478,6 +538,42 @@ class ReportSummaryPage(QWizardPage):
         except Exception as e:
             print(f"Error actualizando tabla de pruebas: {e}")
     
+    def set_analysis_running(self):
+        """Marca el análisis en curso (el informe no se puede generar todavía)"""
+        self.analysis_running = True
+        self.results_table.setRowCount(0)
+        self.results_status_label.setText("Analizando nistagmos...")
+        self.completeChanged.emit()
+    
+    def update_analysis_results(self, results):
+        """Llenar la tabla de resultados con el análisis de nistagmos"""
+        try:
+            rows = []
+            for test_item in self.selected_tests:
+                test_id = test_item['test_id']
+                tipo = test_item['test_data'].get('tipo', test_id)
+                for channel, result in (results.get(test_id) or {}).items():
+                    rows.append((tipo, channel, result.get('total_nistagmos'), result.get('vcl_promedio')))
+            
+            self.results_table.setRowCount(len(rows))
+            for row, (tipo, channel, total, vcl) in enumerate(rows):
+                self.results_table.setItem(row, 0, QTableWidgetItem(tipo))
+                self.results_table.setItem(row, 1, QTableWidgetItem(channel))
+                self.results_table.setItem(row, 2, QTableWidgetItem(str(total if total is not None else '-')))
+                self.results_table.setItem(row, 3, QTableWidgetItem(f"{vcl:.1f}" if vcl is not None else '-'))
+            self.results_table.resizeRowsToContents()
+            
+            self.results_status_label.setText("" if rows else "Sin resultados de análisis")
+        except Exception as e:
+            print(f"Error mostrando resultados del análisis: {e}")
+        finally:
+            self.analysis_running = False
+            self.completeChanged.emit()
+    
+    def isComplete(self):
+        """No generar el informe mientras el análisis está en curso"""
+        return not self.analysis_running and super().isComplete()
+    
     def get_comments(self):
         """Obtener comentarios ingresados"""
         return self.comments_text.toPlainText().strip()
@@ -489,6 +585,8 @@ class ReportWizard(QWizard):
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
+        self.analysis_results = {}
+        self.analysis_worker = None
         
         self.setWindowTitle("Generar Informe")
         self.setFixedSize(800, 600)
@@ -536,10 +634,43 @@ class ReportWizard(QWizard):
                 # Transferir pruebas seleccionadas
                 selected_tests = self.test_selection_page.get_selected_tests()
                 self.summary_page.update_selected_tests(selected_tests)
+                self.analyze_selected_tests(selected_tests)
                 
         except Exception as e:
             print(f"Error en cambio de página: {e}")
     
+    def analyze_selected_tests(self, selected_tests):
+        """
+        Lanza en un hilo de trabajo el análisis de nistagmos de las pruebas
+        seleccionadas; los resultados llegan a on_analysis_done.
+        """
+        siev_manager = self.main_window.siev_manager
+        siev_path = self.main_window.current_user_siev
+        if not siev_manager or not siev_path:
+            return
+        
+        self.analysis_results = {}
+        self.summary_page.set_analysis_running()
+        
+        worker = NystagmusAnalysisWorker(
+            siev_manager, siev_path, [test_item['test_id'] for test_item in selected_tests])
+        worker.analysis_done.connect(self.on_analysis_done)
+        self.analysis_worker = worker
+        worker.start()
+    
+    def on_analysis_done(self, results):
+        """Recibir los resultados del análisis (descarta los de selecciones anteriores)"""
+        if self.sender() is not self.analysis_worker:
+            return
+        self.analysis_results = results
+        self.summary_page.update_analysis_results(results)
+    
+    def done(self, result):
+        """Esperar al análisis en curso antes de cerrar (el hilo no puede destruirse activo)"""
+        if self.analysis_worker is not None and self.analysis_worker.isRunning():
+            self.analysis_worker.wait()
+        super().done(result)
+    
     def accept(self):
         """Manejar finalización del wizard"""
         try:
@@ -556,6 +687,13 @@ class ReportWizard(QWizard):
             print(f"Comentarios: {comments if comments else '(Sin comentarios)'}")
             print("========================")
             
+            # El análisis de nistagmos (self.analysis_results) ya terminó: el
+            # botón de generar se habilita al llegar los resultados
+            for test_id, channels in self.analysis_results.items():
+                for channel, result in channels.items():
+                    print(f"  {test_id} {channel}: {result['total_nistagmos']} nistagmos, "
+                          f"VCL promedio {result['vcl_promedio']:.1f}°/s")
+            
             # TODO: Aquí se implementará la generación real del informe
             QMessageBox.information(
                 self, 
@@ -53,6 +53,9 @@ class Ui_MainWindow(object):
         self.actionEspont_neo = QAction(MainWindow)
         self.actionEspont_neo.setObjectName(u"actionEspont_neo")
         self.actionEspont_neo.setEnabled(False)
+        self.actionVHIT = QAction(MainWindow)
+        self.actionVHIT.setObjectName(u"actionVHIT")
+        self.actionVHIT.setEnabled(False)
         self.actionSeguimiento_Lento = QAction(MainWindow)
         self.actionSeguimiento_Lento.setObjectName(u"actionSeguimiento_Lento")
         self.actionSeguimiento_Lento.setEnabled(False)
@@ -485,6 +488,7 @@ class Ui_MainWindow(object):
         self.menubar.addAction(self.menuConfiguraci_n.menuAction())
         self.menuCalofrica.addAction(self.actionEspont_neo)
         self.menuCalofrica.addAction(self.menuPruebas_Calor_cas.menuAction())
+        self.menuCalofrica.addAction(self.actionVHIT)
         self.menuPruebas_Calor_cas.addAction(self.actionOD_44)
         self.menuPruebas_Calor_cas.addAction(self.actionOI_44)
         self.menuPruebas_Calor_cas.addAction(self.actionOD_30)
@@ -525,6 +529,7 @@ class Ui_MainWindow(object):
         self.actionOD_30.setText(QCoreApplication.translate("MainWindow", u"OD 30", None))
         self.actionOI_30.setText(QCoreApplication.translate("MainWindow", u"OI 30", None))
         self.actionEspont_neo.setText(QCoreApplication.translate("MainWindow", u"Espont\u00e1neo", None))
+        self.actionVHIT.setText(QCoreApplication.translate("MainWindow", u"Impulso Cef\u00e1lico (vHIT)", None))
         self.actionSeguimiento_Lento.setText(QCoreApplication.translate("MainWindow", u"Seguimiento Lento", None))
         self.actionOptoquinetico.setText(QCoreApplication.translate("MainWindow", u"Optoquinetico", None))
         self.actionSacadas.setText(QCoreApplication.translate("MainWindow", u"Sacadas", None))
@@ -1,10 +1,11 @@
 import os
 import time
+import numpy as np
 from PySide6.QtWidgets import (QMainWindow, QMenu, QWidgetAction, QSlider, 
                             QHBoxLayout, QWidget, QLabel, QCheckBox, 
                             QMessageBox, QDialog, QFileDialog, QTreeWidgetItem)
 
-from PySide6.QtCore import Qt, QTimer
+from PySide6.QtCore import Qt, QTimer, QThread
 
 # Diálogos y versionado funciona?ddd
 from ui.dialogs.tracking_dialog import TrackingCalibrationDialog
@@ -18,12 +19,17 @@ from utils.DetectorNistagmo import DetectorNistagmo
 from utils.EyeDataProcessor import EyeDataProcessor
 from utils.CalibrationManager import CalibrationManager
 from utils.data_storage import DataStorage
+from utils.acquisition_thread import EyeAcquisitionThread
+from utils.vhit_engine import HeadImpulseEngine
+from utils.imu_timeline import parse_imu_line
 from utils.graphing.triple_plot_widget import TriplePlotWidget, PlotConfigurations
 from utils.config_manager import ConfigManager
 from utils.CameraResolutionDetector import CameraResolutionDetector
 from utils.utils import select_max_resolution
 from ui.dialogs.user_dialog import NewUserDialog
+from ui.dialogs.patient_search_dialog import PatientSearchDialog
 from utils.SievManager import SievManager
+from utils.siev_writer import SievSaveQueue
 from utils.protocol_manager import ProtocolManager
 from datetime import datetime
 from ui.views.video_fullscreen_widget import VideoFullscreenWidget
@@ -64,6 +70,7 @@ class MainWindow(QMainWindow):
 
         # === GESTOR DE USUARIOS ===
         self.siev_manager = None
+        self.siev_save_queue = None
         self.current_user_siev = None
         self.current_user_data = None
         # === GESTOR DE PROTOCOLOS ===
@@ -71,6 +78,10 @@ class MainWindow(QMainWindow):
         self.current_evaluator = None  # Por compatibilidad, aunque se maneja en protocol_manager
         self.fixed_on_flag = False
         
+        # === vHIT ===
+        self.vhit_active = False
+        self.head_impulses = []  # Impulsos cefálicos de la prueba vHIT en curso
+        
 
         self.calculadorahidp = CalculadoraHipoDpDialog()
 
@@ -90,6 +101,7 @@ class MainWindow(QMainWindow):
         self.init_calibration_system()
         self.init_graphics_system()
         self.init_recording_system()
+        self.init_acquisition_system()
         self.init_video_recorder()
 
         self.init_processing_system()
@@ -250,22 +262,15 @@ class MainWindow(QMainWindow):
                 print("Sistema de archivos no disponible")
                 return None
             
-            # === AGREGAR VERIFICACIÓN PREVIA ===
-            if self.siev_manager.has_test_video(self.current_user_siev, test_id):
-                print(f"Video confirmado en .siev para {test_id}")
-            else:
-                print(f"ADVERTENCIA: No se detectó video en .siev para {test_id}")
-                return None
-            
-            # Extraer datos de video del archivo .siev
-            video_data = self.siev_manager.extract_test_video_data(
+            # Ruta del video (extraído por bloques a la caché, sin copiarlo en memoria)
+            video_path = self.siev_manager.get_test_video_path(
                 self.current_user_siev, 
                 test_id
             )
             
-            if video_data:
-                print(f"Video cargado para prueba {test_id}: {len(video_data)} bytes")
-                return video_data
+            if video_path:
+                print(f"Video listo para prueba {test_id}: {video_path}")
+                return video_path
             else:
                 print(f"No se encontró video para prueba {test_id}")
                 return None
@@ -325,58 +330,42 @@ class MainWindow(QMainWindow):
             # Limpiar gráfico primero
             self.plot_widget.clearPlots()
             
-            # Extraer datos CSV del archivo .siev
-            csv_data = self.siev_manager.extract_test_csv_data(
+            # Extraer las columnas de la prueba del archivo .siev
+            columns = self.siev_manager.extract_test_columns(
                 self.current_user_siev, 
-                test_id
+                test_id,
+                ['timestamp', 'left_eye_x', 'left_eye_y', 'left_eye_detected',
+                 'right_eye_x', 'right_eye_y', 'right_eye_detected', 'imu_x', 'imu_y']
             )
             
-            if not csv_data:
-                print(f"No se encontraron datos CSV para prueba {test_id}")
+            if len(columns.get('timestamp', ())) == 0:
+                print(f"No se encontraron datos para prueba {test_id}")
                 return
             
-            print(f"Cargando {len(csv_data)} puntos de datos al gráfico")
-            
-            # CONVERTIR TIMESTAMPS A TIEMPO RELATIVO
-            first_timestamp = None
-            right_eye_x_values = []
-            relative_timestamps = []
-            
-            for i, row in enumerate(csv_data):
-                try:
-                    timestamp = float(row.get('timestamp', 0))
-                    
-                    # Establecer tiempo de referencia
-                    if first_timestamp is None:
-                        first_timestamp = timestamp
-                    
-                    # Convertir a tiempo relativo (segundos desde el inicio)
-                    relative_time = timestamp - first_timestamp
-                    
-                    right_eye = None  
-                    if row.get('right_eye_detected', False) and row.get('right_eye_x') is not None:
-                        right_eye_x = float(row.get('right_eye_x', 0))
-                        right_eye_y = float(row.get('right_eye_y', 0))
-                        right_eye = [right_eye_x, right_eye_y]
-                        
-                        # RECOLECTAR DATOS PARA DEBUG
-                        right_eye_x_values.append(right_eye_x)
-                        relative_timestamps.append(relative_time)
-                    
-                    left_eye = None
-                    if row.get('left_eye_detected', False) and row.get('left_eye_x') is not None:
-                        left_eye = [float(row.get('left_eye_x', 0)), float(row.get('left_eye_y', 0))]
-                    
-                    imu_x = float(row.get('imu_x', 0))
-                    imu_y = float(row.get('imu_y', 0))
-                    
-                    # USAR TIEMPO RELATIVO PARA EL GRÁFICO
-                    data_point = [left_eye, right_eye, imu_x, imu_y, relative_time]
-                    self.plot_widget.updatePlots(data_point)
-                    
-                except (ValueError, TypeError) as e:
-                    print(f"Error procesando punto {i}: {e}")
-                    continue
+            timestamps = columns['timestamp']
+            print(f"Cargando {len(timestamps)} puntos de datos al gráfico")
+            
+            # CONVERTIR TIMESTAMPS A TIEMPO RELATIVO (vectorizado)
+            relative_times = timestamps - timestamps[0]
+            right_valid = (columns['right_eye_detected'] > 0) & np.isfinite(columns['right_eye_x'])
+            left_valid = (columns['left_eye_detected'] > 0) & np.isfinite(columns['left_eye_x'])
+            
+            # RECOLECTAR DATOS PARA EL AJUSTE DE ZOOM
+            right_eye_x_values = columns['right_eye_x'][right_valid].tolist()
+            relative_timestamps = relative_times[right_valid].tolist()
+            max_time = float(relative_times[-1])
+            
+            rows = zip(relative_times.tolist(), left_valid.tolist(), right_valid.tolist(),
+                       columns['left_eye_x'].tolist(), columns['left_eye_y'].tolist(),
+                       columns['right_eye_x'].tolist(), columns['right_eye_y'].tolist(),
+                       columns['imu_x'].tolist(), columns['imu_y'].tolist())
+            for (relative_time, has_left, has_right, left_x, left_y,
+                 right_x, right_y, imu_x, imu_y) in rows:
+                left_eye = [left_x, left_y] if has_left else None
+                right_eye = [right_x, right_y] if has_right else None
+                
+                # USAR TIEMPO RELATIVO PARA EL GRÁFICO
+                self.plot_widget.updatePlots([left_eye, right_eye, imu_x, imu_y, relative_time])
             
             # === AJUSTE AUTOMÁTICO MEJORADO ===
             if right_eye_x_values and hasattr(self.plot_widget, 'plots') and self.plot_widget.plots:
@@ -411,7 +400,11 @@ class MainWindow(QMainWindow):
                     plot.getViewBox().updateAutoRange()
             
             print(f"Datos cargados con tiempo relativo (0 → {max_time:.2f}s)")
-            
+
+            # Prueba vHIT: reprocesar los impulsos con el mismo motor que en vivo
+            if test_data.get('tipo') == 'vhit':
+                self.head_impulses = self.protocol_manager.analyze_head_impulses(test_id)
+
         except Exception as e:
             print(f"Error cargando datos al gráfico: {e}")
 
@@ -797,6 +790,11 @@ class MainWindow(QMainWindow):
                 plot_config=config
             )
             self.ui.layout_graph.addWidget(self.plot_widget)
+            
+            # Unidades de los ejes según la calibración (grados o px)
+            if self.calibration_manager:
+                self.plot_widget.set_calibrated(self.calibration_manager.is_calibrated)
+                self.calibration_manager.calibration_completed.connect(self.plot_widget.set_calibrated)
             print("Sistema de gráficos inicializado")
         except Exception as e:
             print(f"Error inicializando gráficos: {e}")
@@ -822,16 +820,59 @@ class MainWindow(QMainWindow):
         except Exception as e:
             print(f"Error inicializando grabación: {e}")
 
+    def init_acquisition_system(self):
+        """Inicializar hilo de adquisición de muestras (independiente de la GUI)"""
+        try:
+            self.acquisition_thread = EyeAcquisitionThread(
+                self.data_storage,
+                self.calibration_manager,
+                graph_interval_ms=self.graph_update_interval
+            )
+            self.acquisition_thread.samples_ready.connect(self.handle_acquired_samples)
+            self.acquisition_thread.vhit_ready.connect(self.handle_head_impulses)
+            
+            # Posiciones e IMU llegan directo desde sus hilos, sin pasar por la GUI
+            if self.video_widget:
+                self.video_widget.add_position_consumer(self.acquisition_thread.push_positions)
+            if self.serial_thread:
+                self.serial_thread.data_received.connect(
+                    self.acquisition_thread.push_imu_data, Qt.DirectConnection
+                )
+            
+            self.acquisition_thread.start(QThread.HighPriority)
+            print("Sistema de adquisición inicializado")
+        except Exception as e:
+            print(f"Error inicializando adquisición: {e}")
+            self.acquisition_thread = None
+
     def init_user_system(self):
         """Inicializar sistema de usuarios"""
         try:
             # Crear directorio de usuarios si no existe
             users_path = os.path.join(self.data_path, "users")
             self.siev_manager = SievManager(users_path)
+            
+            # Guardados de pruebas en segundo plano
+            self.siev_save_queue = SievSaveQueue(self.siev_manager)
+            self.siev_save_queue.save_progress.connect(self.on_siev_save_progress)
+            self.siev_save_queue.save_finished.connect(self.on_siev_save_finished)
+            self.siev_save_queue.start()
             print(f"Sistema de usuarios inicializado: {users_path}")
         except Exception as e:
             print(f"Error inicializando sistema de usuarios: {e}")
             self.siev_manager = None
+            self.siev_save_queue = None
+
+    def on_siev_save_progress(self, siev_path, done, total):
+        """Mostrar el avance de un guardado en segundo plano"""
+        self.statusBar().showMessage(
+            f"Guardando {os.path.basename(siev_path)}... {int(100 * done / max(total, 1))}%")
+
+    def on_siev_save_finished(self, siev_path, success, message):
+        """Informar el resultado de un guardado en segundo plano"""
+        self.statusBar().showMessage(message, 5000)
+        if not success:
+            QMessageBox.warning(self, "Error guardando prueba", message)
 
     def init_processing_system(self):
         """Inicializar sistema de procesamiento de datos"""
@@ -874,10 +915,7 @@ class MainWindow(QMainWindow):
         self.recording_timer.timeout.connect(self.update_recording_time)
         self.recording_timer.start(100)
         
-        # Timer para gráficos
-        self.graph_timer = QTimer()
-        self.graph_timer.timeout.connect(self.flush_graph_buffer)
-        self.graph_timer.start(self.graph_update_interval)
+        # Los gráficos se alimentan con los lotes de EyeAcquisitionThread (samples_ready)
         
         # Timer para nistagmos
         #self.nistagmo_timer = QTimer()
@@ -960,6 +998,8 @@ class MainWindow(QMainWindow):
                 self.ui.actionSacadas.triggered.connect(lambda: self.protocol_manager.open_protocol_dialog("sacadas"))
             if hasattr(self.ui, 'actionEspont_neo'):
                 self.ui.actionEspont_neo.triggered.connect(lambda: self.protocol_manager.open_protocol_dialog("espontaneo"))
+            if hasattr(self.ui, 'actionVHIT'):
+                self.ui.actionVHIT.triggered.connect(lambda: self.protocol_manager.open_protocol_dialog("vhit"))
 
             # Conectar calibración
             if hasattr(self.ui, 'actionCalibrar'):
@@ -1097,14 +1137,18 @@ class MainWindow(QMainWindow):
     def handle_serial_data(self, data):
         """Procesar datos seriales del IMU"""
         try:
-            parts = data.split(",")
-            if len(parts) >= 3:
-                self.pos_hit = [float(parts[0]), float(parts[1]), float(parts[2])]
-        except (ValueError, IndexError) as e:
+            sample = parse_imu_line(data)
+            if sample is not None:
+                self.pos_hit = list(sample[1][:3])
+        except Exception as e:
             print(f"Error procesando datos serial: {e}")
 
     def handle_eye_positions(self, pos):
-        """Procesar posiciones oculares principales - SISTEMA COMPLETO"""
+        """
+        Procesar posiciones oculares en la GUI.
+        La adquisición (calibración, almacenamiento y gráfico) la hace
+        EyeAcquisitionThread; aquí solo queda la calibración interactiva.
+        """
         self.pos_eye = pos
         
         # Si hay calibración en progreso, enviar datos al sistema de calibración
@@ -1113,69 +1157,45 @@ class MainWindow(QMainWindow):
                 left_eye = self.pos_eye[1] if len(self.pos_eye) > 1 else None
                 right_eye = self.pos_eye[0] if len(self.pos_eye) > 0 else None
                 self.calibration_controller.process_eye_positions(left_eye, right_eye)
+
+    def handle_acquired_samples(self, batch):
+        """Recibir un lote de EyeAcquisitionThread y enviarlo a los gráficos"""
+        self.total_data_points = self.acquisition_thread.total_samples
+        self.graph_data_buffer.extend(batch)
+        self.flush_graph_buffer()
+
+    def set_vhit_analysis(self, enabled):
+        """
+        Instalar o quitar el motor de impulsos cefálicos del hilo de adquisición
         
-        # Procesar datos normalmente para grabación/visualización
-        if not self.send_to_graph:
+        El motor usa el ángulo de cabeza del stream LIVE del IMU (cuaternión),
+        así que no hace falta cambiar el modo del dispositivo.
+        """
+        if enabled == self.vhit_active or not self.acquisition_thread:
             return
-            
-        try:
-            # Extraer posiciones según estructura original
-            left_eye = self.pos_eye[1] if len(self.pos_eye) > 1 else None
-            right_eye = self.pos_eye[0] if len(self.pos_eye) > 0 else None
-            
-            # APLICAR CALIBRACIÓN SI ESTÁ DISPONIBLE
-            if self.calibration_manager and self.calibration_manager.is_calibrated:
-                left_eye_degrees, right_eye_degrees = self.calibration_manager.convert_to_degrees(
-                    left_eye, right_eye
-                )
-                # Usar datos calibrados en grados
-                processed_left = left_eye_degrees
-                processed_right = right_eye_degrees
-            else:
-                # Usar datos en píxeles si no hay calibración
-                processed_left = left_eye
-                processed_right = right_eye
-            
-            # ===============================================
-            # DATOS CRUDOS PARA CSV - SIN PROCESAMIENTO
-            # ===============================================
-            if self.is_recording:
-                # Datos completamente crudos - sin procesar NADA
-                raw_left = processed_left
-                raw_right = processed_right
-                raw_imu_x = float(self.pos_hit[0])
-                raw_imu_y = float(self.pos_hit[1])
-                raw_timestamp = time.time()
-                
-                # Almacenar datos tal como vienen de la cámara
-                self.data_storage.add_data_point(
-                    raw_left, raw_right, raw_imu_x, raw_imu_y, raw_timestamp
-                )
-                self.total_data_points += 1
-                
-
-            
-            # ===============================================
-            # GRÁFICA CON DATOS CRUDOS TAMBIÉN
-            # ===============================================
-            current_time = time.time()
-            if current_time - self.last_graph_update >= (self.graph_update_interval / 1000.0):
-                # Enviar datos crudos a la gráfica (sin procesamiento)
-                raw_left = processed_left
-                raw_right = processed_right
-                raw_imu_x = float(self.pos_hit[0])
-                raw_imu_y = float(self.pos_hit[1])
-                
-                # Crear un solo punto crudo para la gráfica
-                graph_point = (raw_left, raw_right, raw_imu_x, raw_imu_y, self.graph_time)
-                self.graph_data_buffer.append(graph_point)
-                self.last_graph_update = current_time
-            
-        except Exception as e:
-            print(f"Error en handle_eye_positions: {e}")
-            import traceback
-            traceback.print_exc()
         
+        engine = HeadImpulseEngine() if enabled else None
+        self.acquisition_thread.set_vhit_engine(engine, eye='right', axis=0)
+        self.vhit_active = enabled
+        if enabled:
+            self.head_impulses = []
+        print(f"Análisis vHIT {'activado' if enabled else 'desactivado'}")
+
+    def handle_head_impulses(self, impulses):
+        """Recibir impulsos cefálicos completados desde EyeAcquisitionThread"""
+        for impulse in impulses:
+            self.head_impulses.append(impulse)
+            gain = impulse['gain']
+            gain_text = '-' if gain is None else f"{gain:.2f}"
+            saccades = []
+            if impulse['covert_saccade']:
+                saccades.append('encubierta')
+            if impulse['overt_saccade']:
+                saccades.append('manifiesta')
+            saccade_text = f", sacada {' y '.join(saccades)}" if saccades else ""
+            print(f"Impulso {len(self.head_impulses)}: "
+                  f"pico {impulse['direction'] * impulse['peak_velocity']:+.0f}°/s, "
+                  f"ganancia {gain_text}{saccade_text}")
 
     def flush_graph_buffer(self):
         """Enviar datos acumulados a los gráficos - SISTEMA COMPLETO"""
@@ -1398,6 +1418,11 @@ class MainWindow(QMainWindow):
                 print("Error iniciando prueba en protocol_manager")
                 return
             
+            # Prueba vHIT: analizar impulsos cefálicos en el hilo de adquisición
+            current_test_data = self.get_selected_test_data()
+            if current_test_data:
+                self.set_vhit_analysis(current_test_data['test_data'].get('tipo') == 'vhit')
+            
             # Iniciar calibración o grabación según corresponda
             if hasattr(self, 'current_protocol') and self.current_protocol in ['sacadas', 'seguimiento_lento', 'ng_optocinetico']:
                 # Protocolos con estímulos
@@ -1544,6 +1569,8 @@ class MainWindow(QMainWindow):
         self.update_time_display_in_test_label(f"Calibrando: {self.CALIBRATION_TIME}s")
         
         self.send_to_graph = True
+        if self.acquisition_thread:
+            self.acquisition_thread.start_session(self.recording_start_time + self.CALIBRATION_TIME)
         QTimer.singleShot(self.CALIBRATION_TIME * 1000, self.start_recording)
 
     def start_recording(self):
@@ -1561,6 +1588,8 @@ class MainWindow(QMainWindow):
         timestamp = time.strftime("%Y%m%d_%H%M%S")
         filename = f"vng_recording_{timestamp}.csv"
         self.data_storage.start_recording(filename)
+        if self.acquisition_thread:
+            self.acquisition_thread.start_session(self.recording_start_time, recording=True)
         
         # Configurar gráficos
         if self.plot_widget:
@@ -1597,6 +1626,12 @@ class MainWindow(QMainWindow):
         self.graph_time = 0.0
         self.send_to_graph = False
         
+        # Vaciar la cola de adquisición antes de cerrar el almacenamiento
+        if self.acquisition_thread and not self.acquisition_thread.stop_session():
+            print("ADVERTENCIA: La prueba puede quedar sin las últimas muestras")
+        if self.vhit_active:
+            self.set_vhit_analysis(False)
+        
         # Detener almacenamiento de datos
         if was_recording:
             self.data_storage.stop_recording()
@@ -1856,13 +1891,18 @@ class MainWindow(QMainWindow):
             # Asegurar que el directorio existe
             os.makedirs(initial_dir, exist_ok=True)
             
-            # Abrir diálogo de archivo
-            file_path, _ = QFileDialog.getOpenFileName(
-                self,
-                "Abrir Usuario - Sistema VNG",
-                initial_dir,
-                "Archivos SIEV (*.siev);;Todos los archivos (*.*)"
-            )
+            if self.siev_manager and self.siev_manager.catalog is not None:
+                # Búsqueda en el catálogo de expedientes
+                dialog = PatientSearchDialog(self.siev_manager, self)
+                file_path = dialog.selected_path if dialog.exec() else None
+            else:
+                # Abrir diálogo de archivo
+                file_path, _ = QFileDialog.getOpenFileName(
+                    self,
+                    "Abrir Usuario - Sistema VNG",
+                    initial_dir,
+                    "Archivos SIEV (*.siev);;Todos los archivos (*.*)"
+                )
             
             if file_path:
                 self.load_user_from_file(file_path)
@@ -1893,8 +1933,9 @@ class MainWindow(QMainWindow):
                 warning_msg = "El archivo se puede abrir pero tiene advertencias:\n\n" + "\n".join(validation["warnings"])
                 QMessageBox.warning(self, "Advertencias", warning_msg)
             
-            # Cargar datos del usuario
-            user_data = self.siev_manager.get_user_info(file_path)
+            # Cargar datos del usuario desde la metadata ya validada
+            user_data = validation["metadata"].get("usuario", {})
+            total_tests = len(validation["metadata"].get("pruebas", []))
             
             if not user_data:
                 QMessageBox.warning(self, "Error", "No se pudieron cargar los datos del usuario")
@@ -1922,7 +1963,7 @@ class MainWindow(QMainWindow):
                 "Usuario Cargado", 
                 f"Usuario '{user_name}' cargado exitosamente.\n\n"
                 f"Archivo: {file_name}\n"
-                f"Total de pruebas: {len(self.siev_manager.get_user_tests(file_path))}"
+                f"Total de pruebas: {total_tests}"
             )
             
             print(f"Usuario cargado: {user_name} desde {file_path}")
@@ -2087,6 +2128,8 @@ class MainWindow(QMainWindow):
                 self.ui.actionOptoquinetico.setEnabled(enabled)
             if hasattr(self.ui, 'actionSacadas'):
                 self.ui.actionSacadas.setEnabled(enabled)
+            if hasattr(self.ui, 'actionVHIT'):
+                self.ui.actionVHIT.setEnabled(enabled)
             
         except Exception as e:
             print(f"Error habilitando funciones de prueba: {e}")
@@ -2189,9 +2232,11 @@ class MainWindow(QMainWindow):
             # Crear ventana fullscreen
             self.fullscreen_widget = VideoFullscreenWidget(self.video_widget)
             
-            # Conectar señal de video del video_widget
+            # Conectar señal de video del video_widget (frames escalados en el VideoThread)
             if hasattr(self.video_widget, 'sig_frame'):
                 self.video_widget.sig_frame.connect(self.fullscreen_widget.update_video_frame)
+                self.fullscreen_widget.target_size_changed.connect(self.video_widget.set_fullscreen_target)
+                self.video_widget.set_fullscreen_target(*self.fullscreen_widget.get_target_size())
             
             # Sincronizar tiempo inicial
             current_time = self.ui.lbl_time.text()
@@ -2213,8 +2258,10 @@ class MainWindow(QMainWindow):
                 if hasattr(self.video_widget, 'sig_frame'):
                     try:
                         self.video_widget.sig_frame.disconnect(self.fullscreen_widget.update_video_frame)
+                        self.fullscreen_widget.target_size_changed.disconnect(self.video_widget.set_fullscreen_target)
                     except:
                         pass
+                    self.video_widget.clear_fullscreen_target()
                 
                 # Cerrar ventana
                 self.fullscreen_widget.close()
@@ -2302,8 +2349,11 @@ class MainWindow(QMainWindow):
                 self.nistagmo_timer.stop()
             if hasattr(self, 'recording_timer'):
                 self.recording_timer.stop()
-            if hasattr(self, 'graph_timer'):
-                self.graph_timer.stop()
+            if getattr(self, 'acquisition_thread', None):
+                self.acquisition_thread.stop()
+            if self.siev_save_queue:
+                # Terminar de escribir las pruebas pendientes
+                self.siev_save_queue.stop()
             
             
             if self.fullscreen_widget:
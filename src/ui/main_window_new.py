@@ -166,6 +166,9 @@ class MainWindow(QMainWindow):
         
         # Hardware
         self.hardware_manager.imu_data_received.connect(self.handle_serial_data)
+        if self.data_manager.plot_widget:
+            self.data_manager.plot_widget.set_calibrated(self.hardware_manager.is_calibrated())
+            self.hardware_manager.calibration_completed.connect(self.data_manager.plot_widget.set_calibrated)
         
         # Test manager
         self.test_manager.user_loaded.connect(self.on_user_loaded)
@@ -1,11 +1,14 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel
 from PySide6.QtCore import Qt, Signal
-from PySide6.QtGui import QFont, QPixmap
+from PySide6.QtGui import QFont, QPixmap, QImage
 from PySide6.QtWidgets import QApplication
 
 class VideoFullscreenWidget(QWidget):
     """Ventana separada para mostrar video en pantalla completa"""
     
+    # Tamaño del área de video; el VideoThread escala los frames a este tamaño
+    target_size_changed = Signal(int, int)
+    
     def __init__(self, video_widget=None):
         super().__init__()
         self.video_widget = video_widget
@@ -47,7 +50,8 @@ class VideoFullscreenWidget(QWidget):
         self.video_frame = QLabel()
         self.video_frame.setStyleSheet("background-color: black;")
         self.video_frame.setAlignment(Qt.AlignCenter)
-        self.video_frame.setScaledContents(True)
+        # Los frames llegan ya escalados desde el VideoThread: no reescalar en la GUI
+        self.video_frame.setScaledContents(False)
         layout.addWidget(self.video_frame, stretch=1)
         
         # Contador de tiempo (esquina superior derecha)
@@ -91,11 +95,19 @@ class VideoFullscreenWidget(QWidget):
         if hasattr(self, 'green_dot'):
             # Posicionar punto verde en el centro horizontal, margen superior
             self.green_dot.move(self.width() // 2 - 8, 30)
+        if hasattr(self, 'video_frame'):
+            self.target_size_changed.emit(self.video_frame.width(), self.video_frame.height())
+    
+    def get_target_size(self):
+        """Tamaño actual del área de video (ancho, alto)."""
+        return self.video_frame.width(), self.video_frame.height()
     
-    def update_video_frame(self, pixmap):
-        """Actualizar frame de video"""
-        if isinstance(pixmap, QPixmap):
-            self.video_frame.setPixmap(pixmap)
+    def update_video_frame(self, frame):
+        """Actualizar frame de video (QImage ya escalado o QPixmap)"""
+        if isinstance(frame, QImage):
+            self.video_frame.setPixmap(QPixmap.fromImage(frame))
+        elif isinstance(frame, QPixmap):
+            self.video_frame.setPixmap(frame)
     
     def update_time_display(self, time_text):
         """Actualizar contador de tiempo"""
@@ -4,6 +4,88 @@ from typing import Optional, Tuple, List, Dict
 from PySide6.QtCore import QObject, Signal
 
 
+# Columnas de datos (CSV/arrays) que corresponden a cada ojo
+EYE_COLUMNS = {
+    'left_eye': ('left_eye_x', 'left_eye_y'),
+    'right_eye': ('right_eye_x', 'right_eye_y')
+}
+
+
+def is_usable_calibration(parameters: Optional[Dict]) -> bool:
+    """
+    Indica si unos parámetros de calibración sirven para convertir a grados:
+    calibrados y con todos los factores px/grado positivos (misma condición
+    que convert_to_degrees). Si no, las columnas quedan en píxeles.
+    """
+    if not parameters or not parameters.get('is_calibrated'):
+        return False
+    try:
+        return all(parameters['conversion_factors'][eye][key] > 0
+                   for eye in EYE_COLUMNS
+                   for key in ('px_per_degree_x', 'px_per_degree_y'))
+    except (KeyError, TypeError):
+        return False
+
+
+def pixels_to_degrees(columns: Dict[str, np.ndarray], parameters: Optional[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Convierte columnas completas de píxeles a grados (vectorizado).
+    
+    Args:
+        columns: Diccionario columna -> array (p.ej. 'left_eye_x'); NaN = ojo no detectado
+        parameters: Parámetros de CalibrationManager.get_calibration_parameters()
+    
+    Returns:
+        Nuevo diccionario con las columnas de ojos convertidas; el resto sin
+        cambios. Sin una calibración utilizable (is_usable_calibration) las
+        columnas quedan en píxeles.
+    """
+    result = dict(columns)
+    if not is_usable_calibration(parameters):
+        return result
+    
+    for eye, (col_x, col_y) in EYE_COLUMNS.items():
+        factors = parameters['conversion_factors'][eye]
+        reference = parameters['reference_points'][eye]
+        if col_x in columns:
+            result[col_x] = (np.asarray(columns[col_x], dtype=np.float64) - reference['x']) / factors['px_per_degree_x']
+        if col_y in columns:
+            result[col_y] = (np.asarray(columns[col_y], dtype=np.float64) - reference['y']) / factors['px_per_degree_y']
+    
+    return result
+
+
+def degrees_to_pixels(columns: Dict[str, np.ndarray], parameters: Optional[Dict]) -> Dict[str, np.ndarray]:
+    """Operación inversa de pixels_to_degrees (recupera los píxeles originales)."""
+    result = dict(columns)
+    if not is_usable_calibration(parameters):
+        return result
+    
+    for eye, (col_x, col_y) in EYE_COLUMNS.items():
+        factors = parameters['conversion_factors'][eye]
+        reference = parameters['reference_points'][eye]
+        if col_x in columns:
+            result[col_x] = np.asarray(columns[col_x], dtype=np.float64) * factors['px_per_degree_x'] + reference['x']
+        if col_y in columns:
+            result[col_y] = np.asarray(columns[col_y], dtype=np.float64) * factors['px_per_degree_y'] + reference['y']
+    
+    return result
+
+
+def recalibrate_columns(columns: Dict[str, np.ndarray], stored_parameters: Optional[Dict],
+                        new_parameters: Optional[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Recalibra columnas grabadas: deshace la calibración con la que se
+    guardaron (si la hubo) y aplica la nueva.
+    
+    Args:
+        columns: Columnas tal como están almacenadas en la prueba
+        stored_parameters: Calibración usada al grabar (None si se grabó en píxeles)
+        new_parameters: Calibración a aplicar
+    """
+    return pixels_to_degrees(degrees_to_pixels(columns, stored_parameters), new_parameters)
+
+
 class CalibrationManager(QObject):
     """
     Gestor de calibración que convierte posiciones oculares de píxeles a grados.
@@ -391,6 +473,30 @@ class CalibrationManager(QObject):
         
         return left_eye_degrees, right_eye_degrees
     
+    def convert_arrays_to_degrees(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Versión vectorizada de convert_to_degrees para columnas completas.
+        
+        Args:
+            columns: Diccionario con arrays 'left_eye_x', 'left_eye_y',
+                     'right_eye_x', 'right_eye_y' (NaN = no detectado)
+        """
+        return pixels_to_degrees(columns, self.get_calibration_parameters())
+    
+    def get_calibration_parameters(self) -> Dict:
+        """
+        Parámetros de calibración serializables (JSON) para guardar con cada prueba
+        y poder recalibrarla después sin volver a grabar.
+        """
+        return {
+            'is_calibrated': bool(self.is_calibrated),
+            'conversion_factors': {eye: dict(values) for eye, values in self.conversion_factors.items()},
+            'reference_points': {eye: dict(values) for eye, values in self.reference_points.items()},
+            'led_separation_cm': self.LED_SEPARATION_TOTAL,
+            'led_distance_cm': self.LED_DISTANCE_FROM_EYE,
+            'timestamp': time.time()
+        }
+    
     def get_calibration_summary(self) -> Dict:
         """
         Obtiene un resumen de la calibración actual.
@@ -1,7 +1,20 @@
 import numpy as np
 from scipy import signal
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Tuple, Optional, Union
+import multiprocessing
+import os
+
+# Canales de una prueba analizados en bloque: ojo × eje
+CANALES_NISTAGMO = ('left_eye_x', 'left_eye_y', 'right_eye_x', 'right_eye_y')
+
+# Incrementar cuando cambie el algoritmo, para invalidar análisis guardados
+VERSION_ANALISIS = 2
+
+# Diferencia máxima (°/s) entre la VCL promedio del modo streaming (filtros
+# causales) y la del procesamiento completo sobre los mismos datos
+TOLERANCIA_VCL_STREAMING = 1.0
 
 class DetectorNistagmo:
     """
@@ -36,10 +49,17 @@ class DetectorNistagmo:
         # Para almacenar resultados
         self.datos_raw = None
         self.datos_filtrados = None
+        self.datos_pasobajo = None
         self.velocidad = None
         self.indices_sacadas = []
         self.segmentos_vcl = []
         
+        # Coeficientes SOS ya diseñados, por (fs, freq_pb, freq_pa)
+        self._sos_cache = {}
+        
+        # Estado del modo streaming
+        self._reiniciar_stream()
+        
     def procesar_datos(self, datos: Union[List[float], np.ndarray]) -> Dict:
         """
         Procesa una lista de datos oculares para detectar nistagmos.
@@ -52,8 +72,13 @@ class DetectorNistagmo:
         """
         self.datos_raw = np.array(datos)
         
-        # Paso 1: Filtrar los datos
-        self.datos_filtrados = self._filtrar_datos(self.datos_raw)
+        # El procesamiento completo invalida el estado del modo streaming
+        self._reiniciar_stream()
+        
+        # Paso 1: Filtrar los datos (el paso-alto solo se usa para detectar
+        # sacadas; las pendientes de VCL se ajustan sobre el paso-bajo)
+        self.datos_pasobajo = self._filtrar_pasobajo(self.datos_raw)
+        self.datos_filtrados = self._filtrar_pasoalto(self.datos_pasobajo)
         
         # Paso 2: Calcular la velocidad (derivada)
         self.velocidad = self._calcular_velocidad(self.datos_filtrados)
@@ -78,22 +103,149 @@ class DetectorNistagmo:
     
     def añadir_datos(self, nuevos_datos: Union[List[float], np.ndarray]) -> Dict:
         """
-        Añade nuevos datos a los existentes y realiza el procesamiento.
+        Añade nuevos datos y actualiza la detección de forma incremental.
         Útil para procesamiento en tiempo real.
         
+        Los filtros se aplican con sosfilt conservando su estado entre llamadas
+        (filtrado causal), y solo se cierran los segmentos nuevos: el costo de
+        cada llamada depende del tamaño del bloque, no de la historia completa.
+        
         Args:
             nuevos_datos: Nuevos datos de posición ocular a añadir
             
         Returns:
-            Diccionario con los resultados actualizados
+            Diccionario con los resultados actualizados, incluyendo
+            'nuevas_sacadas' y 'nuevos_segmentos' detectados en esta llamada
         """
-        if self.datos_raw is None:
-            self.datos_raw = np.array(nuevos_datos)
-        else:
-            self.datos_raw = np.concatenate([self.datos_raw, nuevos_datos])
+        nuevos = np.asarray(nuevos_datos, dtype=float).ravel()
+        
+        if not self._stream_activo:
+            # Continuar sobre datos procesados previamente en modo completo
+            previos = self.datos_raw
+            self._reiniciar_stream()
+            self._stream_activo = True
+            self.indices_sacadas = []
+            self.segmentos_vcl = []
+            if previos is not None and len(previos) > 0:
+                nuevos = np.concatenate([np.asarray(previos, dtype=float).ravel(), nuevos])
+        
+        nuevas_sacadas = []
+        nuevos_segmentos = []
+        
+        if len(nuevos) > 0:
+            inicio = self._n_stream
+            pasobajo, filtrados, velocidad = self._filtrar_bloque(nuevos)
+            
+            self._raw_stream = self._anexar(self._raw_stream, inicio, nuevos)
+            self._pasobajo_stream = self._anexar(self._pasobajo_stream, inicio, pasobajo)
+            self._filtrados_stream = self._anexar(self._filtrados_stream, inicio, filtrados)
+            self._velocidad_stream = self._anexar(self._velocidad_stream, inicio, velocidad)
+            self._n_stream = inicio + len(nuevos)
+            
+            nuevas_sacadas = self._detectar_sacadas_bloque(velocidad, inicio)
+            for idx_sacada in nuevas_sacadas:
+                if self.indices_sacadas:
+                    segmento = self._segmento_vcl(self.indices_sacadas[-1], idx_sacada,
+                                                  self._velocidad_stream, self._pasobajo_stream)
+                    if segmento is not None:
+                        nuevos_segmentos.append(segmento)
+                        self._suma_vcl += segmento['velocidad']
+                self.indices_sacadas.append(idx_sacada)
+            self.segmentos_vcl.extend(nuevos_segmentos)
+        
+        n = self._n_stream
+        self.datos_raw = self._raw_stream[:n]
+        self.datos_pasobajo = self._pasobajo_stream[:n]
+        self.datos_filtrados = self._filtrados_stream[:n]
+        self.velocidad = self._velocidad_stream[:n]
+        
+        return {
+            'indices_sacadas': self.indices_sacadas,
+            'segmentos_vcl': self.segmentos_vcl,
+            'total_nistagmos': len(self.segmentos_vcl),
+            'vcl_promedio': self._suma_vcl / len(self.segmentos_vcl) if self.segmentos_vcl else 0,
+            'velocidad_filtrada': self.velocidad,
+            'datos_filtrados': self.datos_filtrados,
+            'nuevas_sacadas': nuevas_sacadas,
+            'nuevos_segmentos': nuevos_segmentos
+        }
+    
+    def reiniciar(self) -> None:
+        """Descarta los datos acumulados y el estado de los filtros."""
+        self.datos_raw = None
+        self.datos_filtrados = None
+        self.datos_pasobajo = None
+        self.velocidad = None
+        self.indices_sacadas = []
+        self.segmentos_vcl = []
+        self._reiniciar_stream()
+    
+    def analizar_canales(self, columnas: Dict[str, np.ndarray],
+                         canales: Tuple[str, ...] = CANALES_NISTAGMO) -> Dict[str, Dict]:
+        """
+        Analiza en una sola pasada varios canales de una prueba
+        (ojo izquierdo/derecho × horizontal/vertical).
+        
+        Los canales se apilan en una matriz y se filtran y derivan juntos;
+        solo la detección de picos y la segmentación se hacen por canal.
+        No modifica los resultados almacenados del detector.
+        
+        Args:
+            columnas: Nombre de columna -> array de posiciones (NaN = sin detección)
+            canales: Columnas a analizar
+            
+        Returns:
+            Diccionario canal -> resultados (sin las señales completas);
+            los canales ausentes o sin datos suficientes se omiten
+        """
+        nombres = []
+        senales = []
+        for canal in canales:
+            datos = columnas.get(canal)
+            if datos is None:
+                continue
+            datos = self._rellenar_huecos(np.asarray(datos, dtype=float))
+            if datos is not None:
+                nombres.append(canal)
+                senales.append(datos)
+        
+        if not senales:
+            return {}
+        
+        # Todas las columnas de una prueba tienen el mismo largo
+        matriz = np.vstack(senales)
+        sos_pb, sos_pa, sos_vel = self._obtener_sos()
+        pasobajo = signal.sosfiltfilt(sos_pb, matriz, axis=-1)
+        filtrados = signal.sosfiltfilt(sos_pa, pasobajo, axis=-1)
+        
+        velocidades = np.gradient(filtrados, axis=-1) * self.fs
+        velocidades = signal.sosfiltfilt(sos_vel, velocidades, axis=-1)
+        
+        resultados = {}
+        for canal, posicion, velocidad in zip(nombres, pasobajo, velocidades):
+            indices_sacadas = self._detectar_sacadas(velocidad)
+            segmentos = self._identificar_vcl(indices_sacadas, velocidad, posicion)
+            resultados[canal] = {
+                'indices_sacadas': indices_sacadas,
+                'segmentos_vcl': segmentos,
+                'total_nistagmos': len(segmentos),
+                'vcl_promedio': float(np.mean([seg['velocidad'] for seg in segmentos])) if segmentos else 0
+            }
         
-        # Reprocesar con todos los datos
-        return self.procesar_datos(self.datos_raw)
+        return resultados
+    
+    def _rellenar_huecos(self, datos: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Interpola linealmente las muestras NaN (parpadeos, pupila no detectada).
+        Retorna None si no quedan datos suficientes para filtrar.
+        """
+        validos = np.isfinite(datos)
+        if np.count_nonzero(validos) < 10:
+            return None
+        if validos.all():
+            return datos
+        indices = np.arange(len(datos))
+        return np.interp(indices, indices[validos], datos[validos])
     
     def obtener_marcas_nistagmos(self) -> List[int]:
         """
@@ -178,22 +330,39 @@ class DetectorNistagmo:
         plt.tight_layout()
         plt.show()
     
+    def _obtener_sos(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Retorna los filtros (paso-bajo, paso-alto, suavizado de velocidad)
+        en forma SOS, diseñándolos solo cuando cambian los parámetros.
+        """
+        clave = (self.fs, self.freq_pb, self.freq_pa)
+        sos = self._sos_cache.get(clave)
+        if sos is None:
+            nyquist = self.fs / 2
+            sos = (
+                signal.butter(2, self.freq_pb / nyquist, 'low', output='sos'),
+                signal.butter(1, self.freq_pa / nyquist, 'high', output='sos'),
+                signal.butter(1, 10 / nyquist, 'low', output='sos')
+            )
+            self._sos_cache[clave] = sos
+        return sos
+    
     def _filtrar_datos(self, datos: np.ndarray) -> np.ndarray:
         """Aplica filtros para eliminar ruido y deriva."""
-        # Convertir a numpy array si no lo es
-        datos_np = np.array(datos)
-        
-        # Diseñar filtro paso-bajo (Butterworth)
-        b_pb, a_pb = signal.butter(2, self.freq_pb / (self.fs/2), 'low')
-        
-        # Diseñar filtro paso-alto para eliminar deriva
-        b_pa, a_pa = signal.butter(1, self.freq_pa / (self.fs/2), 'high')
-        
-        # Aplicar filtros en cascada
-        datos_pb = signal.filtfilt(b_pb, a_pb, datos_np)
-        datos_filtrados = signal.filtfilt(b_pa, a_pa, datos_pb)
-        
-        return datos_filtrados
+        return self._filtrar_pasoalto(self._filtrar_pasobajo(datos))
+    
+    def _filtrar_pasobajo(self, datos: np.ndarray) -> np.ndarray:
+        """Butterworth paso-bajo (ruido); conserva la pendiente de la fase lenta."""
+        sos_pb, _, _ = self._obtener_sos()
+        return signal.sosfiltfilt(sos_pb, np.array(datos))
+    
+    def _filtrar_pasoalto(self, datos: np.ndarray) -> np.ndarray:
+        """
+        Butterworth paso-alto (deriva), solo para detectar sacadas: a 0.5 Hz
+        atenúa las rampas de fase lenta y sesgaría las pendientes de VCL.
+        """
+        _, sos_pa, _ = self._obtener_sos()
+        return signal.sosfiltfilt(sos_pa, datos)
     
     def _calcular_velocidad(self, datos: np.ndarray) -> np.ndarray:
         """Calcula la velocidad como la derivada de la posición."""
@@ -206,11 +375,122 @@ class DetectorNistagmo:
         velocidad[-1] = (datos[-1] - datos[-2]) * self.fs
         
         # Suavizar la velocidad ligeramente
-        b, a = signal.butter(1, 10 / (self.fs/2), 'low')
-        velocidad_suavizada = signal.filtfilt(b, a, velocidad)
+        _, _, sos_vel = self._obtener_sos()
+        velocidad_suavizada = signal.sosfiltfilt(sos_vel, velocidad)
         
         return velocidad_suavizada
     
+    # ------------------------------------------------------------------
+    # Modo streaming
+    # ------------------------------------------------------------------
+    
+    def _reiniciar_stream(self) -> None:
+        """Reinicia el estado de filtros y segmentación del modo streaming."""
+        self._stream_activo = False
+        self._zi_pb = None
+        self._zi_pa = None
+        self._zi_vel = None
+        self._zi_posicion = None
+        self._ultimo_filtrado = None
+        self._tramo_sacada = None  # [signo, índice del pico, |velocidad| del pico]
+        self._suma_vcl = 0.0
+        self._n_stream = 0
+        self._raw_stream = np.empty(0)
+        self._pasobajo_stream = np.empty(0)
+        self._filtrados_stream = np.empty(0)
+        self._velocidad_stream = np.empty(0)
+    
+    @staticmethod
+    def _anexar(buffer: np.ndarray, n: int, nuevos: np.ndarray) -> np.ndarray:
+        """Escribe nuevos valores tras los n primeros, creciendo por duplicación."""
+        requerido = n + len(nuevos)
+        if requerido > len(buffer):
+            ampliado = np.empty(max(requerido, 2 * len(buffer), 1024))
+            ampliado[:n] = buffer[:n]
+            buffer = ampliado
+        buffer[n:requerido] = nuevos
+        return buffer
+    
+    def _filtrar_bloque(self, bloque: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filtra un bloque nuevo de forma causal continuando el estado previo.
+        
+        Returns:
+            (posición para las pendientes, posición filtrada, velocidad
+            suavizada) del bloque; las sacadas se detectan sobre la velocidad
+            y las pendientes de VCL se ajustan sobre la posición sin paso-alto
+        """
+        sos_pb, sos_pa, sos_vel = self._obtener_sos()
+        
+        if self._zi_pb is None:
+            # Arrancar en estado estacionario para evitar el transitorio inicial
+            x0 = bloque[0]
+            self._zi_pb = signal.sosfilt_zi(sos_pb) * x0
+            self._zi_pa = signal.sosfilt_zi(sos_pa) * x0
+            self._zi_vel = np.zeros((sos_vel.shape[0], 2))
+            self._zi_posicion = signal.sosfilt_zi(sos_vel) * x0
+        
+        datos_pb, self._zi_pb = signal.sosfilt(sos_pb, bloque, zi=self._zi_pb)
+        filtrados, self._zi_pa = signal.sosfilt(sos_pa, datos_pb, zi=self._zi_pa)
+        
+        # Diferencia hacia atrás usando la última muestra del bloque anterior
+        anterior = filtrados[0] if self._ultimo_filtrado is None else self._ultimo_filtrado
+        velocidad = np.diff(filtrados, prepend=anterior) * self.fs
+        self._ultimo_filtrado = filtrados[-1]
+        
+        velocidad, self._zi_vel = signal.sosfilt(sos_vel, velocidad, zi=self._zi_vel)
+        
+        # La velocidad lleva además el retardo del suavizado: la posición para
+        # las pendientes pasa por el mismo filtro para que los índices de las
+        # sacadas coincidan (una rampa conserva su pendiente al filtrarla)
+        posicion, self._zi_posicion = signal.sosfilt(sos_vel, datos_pb, zi=self._zi_posicion)
+        return posicion, filtrados, velocidad
+    
+    def _detectar_sacadas_bloque(self, velocidad: np.ndarray, desplazamiento: int) -> List[int]:
+        """
+        Detecta sacadas en un bloque de velocidad.
+        
+        Cada tramo continuo sobre el umbral (con el mismo signo) es una sacada
+        cuyo índice es el pico del tramo; solo se confirma cuando el tramo
+        termina, por lo que un tramo abierto se arrastra al siguiente bloque.
+        """
+        nuevas = []
+        signos = np.sign(velocidad) * (np.abs(velocidad) > self.umbral_sacada)
+        limites = np.concatenate(([0], np.flatnonzero(np.diff(signos)) + 1, [len(signos)]))
+        
+        for inicio, fin in zip(limites[:-1], limites[1:]):
+            signo = signos[inicio]
+            tramo_abierto = self._tramo_sacada
+            
+            if signo == 0:
+                if tramo_abierto is not None:
+                    self._confirmar_sacada(tramo_abierto[1], nuevas)
+                    self._tramo_sacada = None
+                continue
+            
+            pico_local = int(np.argmax(np.abs(velocidad[inicio:fin])))
+            magnitud = abs(velocidad[inicio + pico_local])
+            indice_pico = desplazamiento + inicio + pico_local
+            
+            if tramo_abierto is not None and tramo_abierto[0] == signo:
+                # Continuación del tramo iniciado en el bloque anterior
+                if magnitud > tramo_abierto[2]:
+                    tramo_abierto[1] = indice_pico
+                    tramo_abierto[2] = magnitud
+            else:
+                if tramo_abierto is not None:
+                    self._confirmar_sacada(tramo_abierto[1], nuevas)
+                self._tramo_sacada = [signo, indice_pico, magnitud]
+        
+        return nuevas
+    
+    def _confirmar_sacada(self, indice: int, nuevas: List[int]) -> None:
+        """Acepta una sacada si respeta la distancia mínima a la anterior."""
+        distancia_minima = int(0.1 * self.fs)
+        anterior = nuevas[-1] if nuevas else (self.indices_sacadas[-1] if self.indices_sacadas else None)
+        if anterior is None or indice - anterior >= distancia_minima:
+            nuevas.append(indice)
+    
     def _detectar_sacadas(self, velocidad: np.ndarray) -> List[int]:
         """Detecta las sacadas basándose en el umbral de velocidad."""
         # Encontrar puntos donde la velocidad supera el umbral (en cualquier dirección)
@@ -227,60 +507,260 @@ class DetectorNistagmo:
         
         return indices_picos.tolist()
     
-    def _identificar_vcl(self) -> List[Dict]:
-        """Identifica las fases lentas entre sacadas consecutivas."""
-        segmentos_vcl = []
+    def _identificar_vcl(self, indices_sacadas: Optional[List[int]] = None,
+                         velocidad: Optional[np.ndarray] = None,
+                         datos_filtrados: Optional[np.ndarray] = None) -> List[Dict]:
+        """
+        Identifica las fases lentas entre sacadas consecutivas.
         
-        if len(self.indices_sacadas) < 2:
-            return segmentos_vcl
+        Todos los segmentos se evalúan a la vez: el fin de cada sacada se
+        obtiene con un índice de "próxima muestra lenta" y las pendientes con
+        sumas por segmento (mínimos cuadrados en forma cerrada).
         
-        for i in range(len(self.indices_sacadas) - 1):
-            idx_inicio = self.indices_sacadas[i]
-            idx_fin = self.indices_sacadas[i + 1]
-            
-            # Encontrar dónde termina realmente la sacada (cuando la velocidad baja del umbral)
-            fin_sacada = idx_inicio
-            for j in range(idx_inicio, min(idx_fin, idx_inicio + int(0.2 * self.fs))):
-                if abs(self.velocidad[j]) < self.umbral_sacada * 0.5:
-                    fin_sacada = j
-                    break
-            
-            # Ajustar el inicio de la VCL para que comience después de que termine la sacada
-            idx_inicio_vcl = fin_sacada + 1
-            
-            # Verificar que la duración mínima se cumpla
-            duracion = (idx_fin - idx_inicio_vcl) / self.fs
-            if duracion < self.duracion_minima_vcl:
-                continue
-            
-            # Calcular la velocidad promedio durante la VCL (pendiente)
-            tiempo = np.arange(idx_inicio_vcl, idx_fin) / self.fs
-            posicion = self.datos_filtrados[idx_inicio_vcl:idx_fin]
+        datos_filtrados es la posición sobre la que se ajustan las pendientes
+        (paso-bajo, sin el paso-alto de la detección de sacadas). Sin
+        argumentos usa los resultados almacenados del último procesamiento.
+        """
+        if indices_sacadas is None:
+            indices_sacadas, velocidad, datos_filtrados = (
+                self.indices_sacadas, self.velocidad, self.datos_pasobajo)
+        
+        sacadas = np.asarray(indices_sacadas, dtype=np.int64)
+        if len(sacadas) < 2:
+            return []
+        
+        velocidad = np.asarray(velocidad, dtype=float)
+        posicion = np.asarray(datos_filtrados, dtype=float)
+        idx_inicio = sacadas[:-1]
+        idx_fin = sacadas[1:]
+        
+        # Fin de la sacada: primera muestra con velocidad bajo la mitad del umbral,
+        # buscada dentro de los 0.2 s siguientes y antes de la próxima sacada
+        fin_sacada = self._proxima_muestra_lenta(velocidad)[idx_inicio]
+        limite = np.minimum(idx_fin, idx_inicio + int(0.2 * self.fs))
+        fin_sacada = np.where(fin_sacada < limite, fin_sacada, idx_inicio)
+        
+        # La VCL comienza después de que termina la sacada y termina donde
+        # empieza la siguiente (última muestra lenta antes de su pico)
+        idx_inicio_vcl = fin_sacada + 1
+        ultima_lenta = self._ultima_muestra_lenta(velocidad)[idx_fin]
+        idx_fin = np.where(ultima_lenta > np.maximum(idx_inicio_vcl, idx_fin - int(0.2 * self.fs)),
+                           ultima_lenta + 1, idx_fin)
+        n = idx_fin - idx_inicio_vcl
+        duracion = n / self.fs
+        
+        # Duración mínima y al menos 3 puntos para un ajuste lineal confiable
+        validos = (duracion >= self.duracion_minima_vcl) & (n >= 3)
+        if not np.any(validos):
+            return []
+        
+        idx_inicio, idx_fin = idx_inicio[validos], idx_fin[validos]
+        idx_inicio_vcl, n, duracion = idx_inicio_vcl[validos], n[validos], duracion[validos]
+        
+        pendiente = self._pendientes_segmentos(posicion, idx_inicio_vcl, idx_fin)
+        
+        # Solo considerar VCL si la dirección es opuesta a la sacada anterior
+        opuestas = np.sign(pendiente) != np.sign(velocidad[idx_inicio])
+        amplitud = np.abs(posicion[idx_fin - 1] - posicion[idx_inicio_vcl])
+        
+        return [
+            {
+                'inicio': int(ini),
+                'fin': int(fin),
+                'velocidad': float(vel),
+                'duracion': float(dur),
+                'amplitud': float(amp)
+            }
+            for ini, fin, vel, dur, amp in zip(idx_inicio_vcl[opuestas], idx_fin[opuestas],
+                                               pendiente[opuestas], duracion[opuestas],
+                                               amplitud[opuestas])
+        ]
+    
+    def _proxima_muestra_lenta(self, velocidad: np.ndarray) -> np.ndarray:
+        """
+        Para cada índice, el primer índice >= a él con |velocidad| bajo la
+        mitad del umbral (len(velocidad) si no existe).
+        """
+        n = len(velocidad)
+        lentas = np.abs(velocidad) < self.umbral_sacada * 0.5
+        candidatos = np.where(lentas, np.arange(n), n)
+        return np.minimum.accumulate(candidatos[::-1])[::-1]
+    
+    def _ultima_muestra_lenta(self, velocidad: np.ndarray) -> np.ndarray:
+        """
+        Para cada índice, el último índice <= a él con |velocidad| bajo la
+        mitad del umbral (-1 si no existe).
+        """
+        lentas = np.abs(velocidad) < self.umbral_sacada * 0.5
+        candidatos = np.where(lentas, np.arange(len(velocidad)), -1)
+        return np.maximum.accumulate(candidatos)
+    
+    def _pendientes_segmentos(self, posicion: np.ndarray,
+                              inicios: np.ndarray, fines: np.ndarray) -> np.ndarray:
+        """
+        Pendiente de mínimos cuadrados (°/s) de posicion[inicio:fin] para
+        cada segmento, equivalente a np.polyfit(t, x, 1) por segmento.
+        """
+        # Sumas por segmento con reduceat sobre límites intercalados; los
+        # segmentos no se solapan y están ordenados, así que los límites también
+        limites = np.column_stack([inicios, fines]).ravel()
+        if limites[-1] >= len(posicion):
+            posicion = np.append(posicion, 0.0)
+        
+        # Índice centrado en cada segmento (k - (n-1)/2): sum(k) = 0 y no hay
+        # cancelación entre sumas grandes en registros largos. Los centros
+        # crecen con los segmentos, así que se propagan con maximum.accumulate
+        n = (fines - inicios).astype(float)
+        centros = np.full(len(posicion), -np.inf)
+        centros[inicios] = inicios + (n - 1) / 2
+        centrados = np.arange(len(posicion)) - np.maximum.accumulate(centros)
+        centrados[~np.isfinite(centrados)] = 0.0
+        
+        suma_kx = np.add.reduceat(centrados * posicion, limites)[::2]
+        suma_kk = (n - 1) * n * (n + 1) / 12
+        pendiente_muestra = suma_kx / suma_kk
+        return pendiente_muestra * self.fs
+    
+    def _segmento_vcl(self, idx_inicio: int, idx_fin: int,
+                      velocidad: np.ndarray, datos_filtrados: np.ndarray) -> Optional[Dict]:
+        """Calcula la VCL entre dos sacadas consecutivas, o None si no es válida."""
+        # Encontrar dónde termina realmente la sacada (cuando la velocidad baja del umbral)
+        fin_sacada = idx_inicio
+        for j in range(idx_inicio, min(idx_fin, idx_inicio + int(0.2 * self.fs))):
+            if abs(velocidad[j]) < self.umbral_sacada * 0.5:
+                fin_sacada = j
+                break
+        
+        # Ajustar el inicio de la VCL para que comience después de que termine la sacada
+        idx_inicio_vcl = fin_sacada + 1
+        
+        # y el final para que no incluya el comienzo de la sacada siguiente
+        for j in range(idx_fin, max(idx_inicio_vcl, idx_fin - int(0.2 * self.fs)), -1):
+            if abs(velocidad[j]) < self.umbral_sacada * 0.5:
+                idx_fin = j + 1
+                break
+        
+        # Verificar que la duración mínima se cumpla
+        duracion = (idx_fin - idx_inicio_vcl) / self.fs
+        if duracion < self.duracion_minima_vcl:
+            return None
+        
+        # Calcular la velocidad promedio durante la VCL (pendiente)
+        tiempo = np.arange(idx_inicio_vcl, idx_fin) / self.fs
+        posicion = datos_filtrados[idx_inicio_vcl:idx_fin]
+        
+        if len(tiempo) < 3:  # Necesitamos al menos 3 puntos para un ajuste lineal confiable
+            return None
             
-            if len(tiempo) < 3:  # Necesitamos al menos 3 puntos para un ajuste lineal confiable
-                continue
-                
-            # Ajuste lineal para calcular la pendiente (VCL)
-            try:
-                pendiente, interseccion = np.polyfit(tiempo, posicion, 1)
-                
-                # La pendiente es la velocidad de la VCL
-                velocidad_vcl = pendiente
-                
-                # Solo considerar VCL si la dirección es opuesta a la sacada anterior
-                if np.sign(velocidad_vcl) != np.sign(self.velocidad[idx_inicio]):
-                    segmentos_vcl.append({
-                        'inicio': idx_inicio_vcl,
-                        'fin': idx_fin,
-                        'velocidad': velocidad_vcl,
-                        'duracion': duracion,
-                        'amplitud': abs(posicion[-1] - posicion[0])
-                    })
-            except:
-                # En caso de error en el ajuste, omitimos este segmento
-                continue
+        # Ajuste lineal para calcular la pendiente (VCL)
+        try:
+            pendiente, interseccion = np.polyfit(tiempo, posicion, 1)
+        except:
+            # En caso de error en el ajuste, omitimos este segmento
+            return None
+        
+        # La pendiente es la velocidad de la VCL
+        velocidad_vcl = pendiente
+        
+        # Solo considerar VCL si la dirección es opuesta a la sacada anterior
+        if np.sign(velocidad_vcl) == np.sign(velocidad[idx_inicio]):
+            return None
+        
+        return {
+            'inicio': idx_inicio_vcl,
+            'fin': idx_fin,
+            'velocidad': velocidad_vcl,
+            'duracion': duracion,
+            'amplitud': abs(posicion[-1] - posicion[0])
+        }
+
+
+def estimar_frecuencia_muestreo(tiempos: np.ndarray) -> Optional[float]:
+    """Frecuencia de muestreo (Hz) a partir de la mediana de los intervalos."""
+    tiempos = np.asarray(tiempos, dtype=float)
+    if len(tiempos) < 2:
+        return None
+    intervalo = np.median(np.diff(tiempos))
+    return 1.0 / intervalo if intervalo > 0 else None
+
+
+def parametros_analisis(parametros: Optional[Dict] = None) -> Dict:
+    """
+    Descripción completa de un análisis (versión, canales y parámetros),
+    usada como parte de la clave de caché de resultados.
+    """
+    return {
+        'version': VERSION_ANALISIS,
+        'canales': list(CANALES_NISTAGMO),
+        'detector': dict(parametros or {})
+    }
+
+
+def analizar_prueba(columnas: Dict[str, np.ndarray], parametros: Optional[Dict] = None) -> Dict[str, Dict]:
+    """
+    Analiza todos los canales de una prueba.
+    
+    Si los parámetros no indican la frecuencia de muestreo, se estima a
+    partir de la columna 'timestamp'. Es una función de módulo para poder
+    ejecutarse en un proceso del pool.
+    
+    Args:
+        columnas: Nombre de columna -> array
+        parametros: Argumentos para DetectorNistagmo
+    """
+    parametros = dict(parametros or {})
+    if 'frecuencia_muestreo' not in parametros and 'timestamp' in columnas:
+        fs = estimar_frecuencia_muestreo(columnas['timestamp'])
+        if fs:
+            parametros['frecuencia_muestreo'] = fs
+    
+    return DetectorNistagmo(**parametros).analizar_canales(columnas)
+
+
+def analizar_pruebas(pruebas: Dict[str, Dict[str, np.ndarray]], parametros: Optional[Dict] = None,
+                     max_workers: Optional[int] = None) -> Dict[str, Dict[str, Dict]]:
+    """
+    Analiza varias pruebas en paralelo con un pool de procesos.
+    
+    Los procesos se crean con spawn (no fork): se puede llamar desde una
+    aplicación Qt con hilos en marcha. Es bloqueante; desde la UI, llamarla
+    en un hilo de trabajo.
+    
+    Args:
+        pruebas: ID de prueba -> columnas de la prueba
+        parametros: Argumentos para DetectorNistagmo (comunes a todas)
+        max_workers: Procesos máximos (por defecto, uno por núcleo)
         
-        return segmentos_vcl
+    Returns:
+        ID de prueba -> resultados por canal
+    """
+    if not pruebas:
+        return {}
+    
+    max_workers = min(max_workers or os.cpu_count() or 1, len(pruebas))
+    if max_workers <= 1:
+        return {test_id: analizar_prueba(columnas, parametros) for test_id, columnas in pruebas.items()}
+    
+    resultados = {}
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 mp_context=multiprocessing.get_context('spawn')) as pool:
+            futuros = {test_id: pool.submit(analizar_prueba, columnas, parametros)
+                       for test_id, columnas in pruebas.items()}
+            for test_id, futuro in futuros.items():
+                try:
+                    resultados[test_id] = futuro.result()
+                except Exception as e:
+                    print(f"Error analizando prueba {test_id}: {e}")
+                    resultados[test_id] = {}
+    except Exception as e:
+        # Sin pool disponible: análisis secuencial
+        print(f"Pool de procesos no disponible, análisis secuencial: {e}")
+        for test_id, columnas in pruebas.items():
+            if test_id not in resultados:
+                resultados[test_id] = analizar_prueba(columnas, parametros)
+    
+    return resultados
 
 
 # Ejemplo de uso:
@@ -322,5 +802,27 @@ if __name__ == "__main__":
     print(f"VCL promedio: {resultados['vcl_promedio']:.2f}°/s")
     print(f"Marcas de nistagmos (índices): {detector.obtener_marcas_nistagmos()}")
     
+    # El modo streaming (bloques como llegan en vivo, filtros causales) debe
+    # dar la misma VCL que el procesamiento completo: nistagmo en diente de
+    # sierra a 200 Hz con fase lenta de -10°/s
+    fs_stream = 200
+    vcl_real = -10.0
+    periodo, duracion_sacada = 0.5, 0.04
+    fase = np.arange(0, 30, 1 / fs_stream) % periodo
+    velocidad_ocular = np.where(fase < periodo - duracion_sacada, vcl_real,
+                                -vcl_real * (periodo - duracion_sacada) / duracion_sacada)
+    sierra = np.cumsum(velocidad_ocular) / fs_stream
+    sierra += np.random.default_rng(0).normal(0, 0.02, len(sierra))
+    
+    completo = DetectorNistagmo(frecuencia_muestreo=fs_stream).procesar_datos(sierra)
+    detector_stream = DetectorNistagmo(frecuencia_muestreo=fs_stream)
+    for inicio_bloque in range(0, len(sierra), 37):
+        streaming = detector_stream.añadir_datos(sierra[inicio_bloque:inicio_bloque + 37])
+    diferencia = abs(streaming['vcl_promedio'] - completo['vcl_promedio'])
+    print(f"VCL completa {completo['vcl_promedio']:.2f}°/s, streaming "
+          f"{streaming['vcl_promedio']:.2f}°/s (real {vcl_real:.1f}°/s)")
+    if diferencia > TOLERANCIA_VCL_STREAMING:
+        print(f"ADVERTENCIA: VCL en streaming y completa difieren en {diferencia:.2f}°/s")
+    
     # Visualizar
     detector.visualizar()
\ No newline at end of file
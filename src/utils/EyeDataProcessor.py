@@ -1,14 +1,53 @@
 import numpy as np
+from scipy import signal
 from typing import List, Dict, Tuple, Optional, Union
 import time
 from collections import deque
 
+
+def _simulate_linear_system(F: np.ndarray, G: np.ndarray, inputs: np.ndarray, x0: np.ndarray) -> np.ndarray:
+    """
+    Simula x_k = F @ x_{k-1} + G @ u_k para k = 0..N-1, partiendo de x_{-1} = x0,
+    sobre varios canales a la vez y sin bucles por muestra.
+    
+    La respuesta a las entradas se calcula con lfilter (función de transferencia
+    de cada par entrada/estado) y la respuesta libre F^(k+1) x0 por autovalores.
+    
+    Args:
+        F: Matriz de transición (n, n)
+        G: Matriz de entrada (n, m)
+        inputs: Entradas (N, m, canales)
+        x0: Estado inicial (n, canales)
+        
+    Returns:
+        Estados (N, n, canales)
+    """
+    n_samples = inputs.shape[0]
+    n = F.shape[0]
+    states = np.zeros((n_samples, n, inputs.shape[2]))
+    
+    # Respuesta forzada: la salida es el estado actual x_k = F x_{k-1} + G u_k
+    for j in range(G.shape[1]):
+        num, den = signal.ss2tf(F, G, F, G, input=j)
+        for i in range(n):
+            states[:, i, :] += signal.lfilter(num[i], den, inputs[:, j, :], axis=0)
+    
+    # Respuesta libre desde el estado inicial
+    eigenvalues, V = np.linalg.eig(F)
+    coefs = np.linalg.solve(V, x0.astype(complex))
+    powers = eigenvalues[None, :] ** np.arange(1, n_samples + 1)[:, None]
+    states += np.einsum('in,kn,nc->kic', V, powers, coefs).real
+    
+    return states
+
+
 class KalmanFilter:
     """
     Implementación avanzada del filtro de Kalman para seguimiento de posición ocular.
     Esta versión incluye aceleración en el modelo de estado para un seguimiento más suave.
     """
-    def __init__(self, initial_state=None, process_noise=0.01, measurement_noise=0.1, stability_factor=0.01):
+    def __init__(self, initial_state=None, process_noise=0.01, measurement_noise=0.1, stability_factor=0.01,
+                 steady_state=False):
         # Inicializar filtro con valores por defecto si no se proporciona estado inicial
         if initial_state is None:
             self.state = np.zeros(6)  # [x, y, vel_x, vel_y, acc_x, acc_y]
@@ -57,14 +96,69 @@ class KalmanFilter:
         
         # Bandera para saber si se ha inicializado
         self.initialized = initial_state is not None
+        
+        self.I = np.eye(6)
+        
+        # Modo estacionario: ganancia fija precalculada, sin propagar P
+        self.steady_state = False
+        self._steady = None
+        self.set_steady_state(steady_state)
+    
+    def set_steady_state(self, enabled: bool):
+        """
+        Activa el modo de ganancia estacionaria. La ganancia se obtiene una
+        vez resolviendo la ecuación de Riccati y cada paso queda en un par
+        de productos matriz-vector (sin covarianzas ni inversiones).
+        """
+        self.steady_state = enabled
+        if enabled and self._steady is None:
+            self._steady = self._compute_steady_state()
+    
+    def _axis_model(self):
+        """Modelo de un eje [pos, vel, acc]: los ejes x e y son independientes."""
+        idx = [0, 2, 4]
+        A = self.A[np.ix_(idx, idx)]
+        Q = self.Q[np.ix_(idx, idx)]
+        return A, Q, self.R[0, 0]
+    
+    def _compute_steady_state(self, max_iterations=10000, tolerance=1e-12):
+        """
+        Itera la recursión de Riccati de un eje hasta converger.
+        
+        Returns:
+            Diccionario con la ganancia del eje (3,), la ganancia completa (6, 2)
+            y las covarianzas a priori/a posteriori estacionarias
+        """
+        A, Q, r = self._axis_model()
+        H = np.array([1.0, 0.0, 0.0])
+        P_post = np.eye(3)
+        
+        for _ in range(max_iterations):
+            P_prior = A @ P_post @ A.T + Q
+            K = P_prior @ H / (P_prior[0, 0] + r)
+            new_post = P_prior - np.outer(K, H @ P_prior)
+            converged = np.max(np.abs(new_post - P_post)) < tolerance
+            P_post = new_post
+            if converged:
+                break
+        
+        P_prior = A @ P_post @ A.T + Q
+        K = P_prior @ H / (P_prior[0, 0] + r)
+        
+        gain = np.zeros((6, 2))
+        gain[[0, 2, 4], 0] = K
+        gain[[1, 3, 5], 1] = K
+        
+        return {'K_axis': K, 'K': gain, 'P_prior': P_prior, 'P_post': P_post, 'A_axis': A}
     
     def predict(self):
         """Realiza la predicción del siguiente estado basado en el modelo"""
         # Predecir estado
         self.state = self.A @ self.state
         
-        # Actualizar covarianza
-        self.P = self.A @ self.P @ self.A.T + self.Q
+        # Actualizar covarianza (no se usa con ganancia estacionaria)
+        if not self.steady_state:
+            self.P = self.A @ self.P @ self.A.T + self.Q
         
         return self.state[:2]  # Devolver solo posición (x, y)
     
@@ -105,6 +199,14 @@ class KalmanFilter:
             if accel_magnitude > 15.0:  # Umbral para considerar movimiento brusco
                 self.sudden_movement = True
         
+        if self.steady_state:
+            # Ganancia fija: el estado ya fue predicho en predict()
+            self.state = self.state + self._steady['K'] @ (z - self.state[:2])
+            if self.sudden_movement:
+                prev_pos = self.measurement_history[-2]
+                self.state[2:4] = (z - prev_pos) * 0.8 + self.state[2:4] * 0.2
+            return self._apply_smoothing(self.state[:2])
+        
         # Ajustar la matriz de proceso si se detecta movimiento brusco
         if self.sudden_movement:
             # Aumentar temporalmente el process noise para adaptarse más rápido
@@ -121,8 +223,8 @@ class KalmanFilter:
         # Calcular covarianza de la innovación
         S = self.H @ self.P @ self.H.T + self.R
         
-        # Calcular ganancia de Kalman
-        K = self.P @ self.H.T @ np.linalg.inv(S)
+        # Calcular ganancia de Kalman (S es simétrica: K = P H^T S^-1)
+        K = np.linalg.solve(S, self.H @ self.P).T
         
         # Actualizar estado
         self.state = self.state + K @ y
@@ -134,8 +236,7 @@ class KalmanFilter:
                 self.state[2:4] = (z - prev_pos) * 0.8 + self.state[2:4] * 0.2  # Actualizar velocidad
         
         # Actualizar covarianza
-        I = np.eye(6)
-        self.P = (I - K @ self.H) @ self.P
+        self.P = (self.I - K @ self.H) @ self.P
         
         # Aplicar suavizado adicional a través de spline cúbico para la salida
         smoothed_position = self._apply_smoothing(self.state[:2])
@@ -173,6 +274,54 @@ class KalmanFilter:
         
         return np.array([smoothed_x, smoothed_y])
     
+    def filter_arrays(self, measurements: np.ndarray, smooth: bool = False) -> np.ndarray:
+        """
+        Filtra una secuencia completa de posiciones con la ganancia estacionaria.
+        
+        Args:
+            measurements: Array (N, 2) de posiciones [x, y] sin NaN
+            smooth: Aplicar además el suavizador Rauch-Tung-Striebel (no causal,
+                    para revisión offline)
+            
+        Returns:
+            Array (N, 2) de posiciones estimadas
+        """
+        z = np.asarray(measurements, dtype=float)
+        if len(z) == 0:
+            return z.reshape(0, 2)
+        
+        steady = self._steady or self._compute_steady_state()
+        A, K = steady['A_axis'], steady['K_axis']
+        H = np.array([[1.0, 0.0, 0.0]])
+        
+        # Filtro: s_k = (I - K H) A s_{k-1} + K z_k, con s_{-1} = [z_0, 0, 0]
+        # (estado fijo del modelo, de modo que s_0 = [z_0, 0, 0] como en update)
+        F = (np.eye(3) - np.outer(K, H)) @ A
+        x0 = np.zeros((3, 2))
+        x0[0] = z[0]
+        states = _simulate_linear_system(F, K[:, None], z[:, None, :], x0)
+        
+        if smooth:
+            states = self._rts_smooth(states, steady)
+        
+        return states[:, 0, :]
+    
+    @staticmethod
+    def _rts_smooth(states: np.ndarray, steady: Dict) -> np.ndarray:
+        """
+        Suavizador RTS con covarianzas estacionarias:
+        ŝ_k = s_k + C (ŝ_{k+1} - A s_k), con C = P_post A^T P_prior^-1.
+        Se resuelve como sistema lineal en tiempo invertido.
+        """
+        A = steady['A_axis']
+        C = steady['P_post'] @ A.T @ np.linalg.inv(steady['P_prior'])
+        
+        reversed_states = states[::-1]
+        # w_j = C w_{j-1} + (I - C A) u_j, con w_{-1} = A u_0 para que w_0 = u_0
+        x0 = A @ reversed_states[0]
+        smoothed = _simulate_linear_system(C, np.eye(3) - C @ A, reversed_states, x0)
+        return smoothed[::-1]
+    
     def reset(self):
         """Reinicia el filtro"""
         self.state = np.zeros(6)
@@ -240,6 +389,7 @@ class EyeDataProcessor:
         
         # Parámetro para activar/desactivar filtro Kalman
         self.kalman_enabled = True
+        self.kalman_steady_state = False  # Ganancia precalculada en el camino en vivo
         
         # Parámetros adicionales para suavizado
         self.extra_smoothing = True   # Suavizado adicional post-kalman
@@ -572,15 +722,67 @@ class EyeDataProcessor:
             initial_state=left_state[:2] if left_state is not None else None,
             process_noise=process_noise,
             measurement_noise=measurement_noise,
-            stability_factor=stability_factor
+            stability_factor=stability_factor,
+            steady_state=self.kalman_steady_state
         )
         
         self.kalman_right = KalmanFilter(
             initial_state=right_state[:2] if right_state is not None else None,
             process_noise=process_noise,
             measurement_noise=measurement_noise,
-            stability_factor=stability_factor
+            stability_factor=stability_factor,
+            steady_state=self.kalman_steady_state
         )
+    
+    def set_kalman_steady_state(self, enabled: bool):
+        """Activa o desactiva la ganancia Kalman estacionaria (camino en vivo)"""
+        self.kalman_steady_state = enabled
+        self.kalman_left.set_steady_state(enabled)
+        self.kalman_right.set_steady_state(enabled)
+    
+    def process_arrays(self, left_eye: Optional[np.ndarray], right_eye: Optional[np.ndarray],
+                       smooth: bool = False) -> Dict[str, Optional[np.ndarray]]:
+        """
+        Procesa una prueba completa de forma vectorizada (centrado y filtro
+        Kalman estacionario), sin modificar el estado del procesamiento en vivo.
+        
+        Args:
+            left_eye: Array (N, 2) de posiciones del ojo izquierdo (NaN = sin detección)
+            right_eye: Array (N, 2) de posiciones del ojo derecho (NaN = sin detección)
+            smooth: Aplicar suavizador Rauch-Tung-Striebel (revisión offline)
+            
+        Returns:
+            Diccionario {'left': array (N, 2), 'right': array (N, 2)}; las muestras
+            sin detección siguen siendo NaN
+        """
+        results = {}
+        for side, data, center, kalman in (
+                ('left', left_eye, self.left_eye_center, self.kalman_left),
+                ('right', right_eye, self.right_eye_center, self.kalman_right)):
+            if data is None:
+                results[side] = None
+                continue
+            
+            data = np.array(data, dtype=float).reshape(-1, 2)
+            if center is not None:
+                data -= np.asarray(center, dtype=float)
+            
+            detected = np.all(np.isfinite(data), axis=1)
+            if not self.processing_enabled or not self.kalman_enabled or np.count_nonzero(detected) < 2:
+                results[side] = data
+                continue
+            
+            # Rellenar huecos por interpolación lineal para mantener el sistema invariante
+            if not detected.all():
+                indices = np.arange(len(data))
+                for axis in range(2):
+                    data[:, axis] = np.interp(indices, indices[detected], data[detected, axis])
+            
+            filtered = kalman.filter_arrays(data, smooth=smooth)
+            filtered[~detected] = np.nan
+            results[side] = filtered
+        
+        return results
         
     def set_extra_smoothing(self, enabled: bool, buffer_size: int = 5):
         """
@@ -1,17 +1,78 @@
-import tarfile
 import json
+import math
 import os
 import time
-import shutil
+import hashlib
 from io import BytesIO
 from typing import Dict, List, Optional, Any
 import tempfile
+import threading
+
+try:
+    from utils.siev_container import (SievContainer, create_siev, update_siev, siev_lock,
+                                      needs_repack, repack_siev)
+    from utils.siev_catalog import SievCatalog
+except ImportError:
+    from siev_container import (SievContainer, create_siev, update_siev, siev_lock,
+                                needs_repack, repack_siev)
+    from siev_catalog import SievCatalog
+
+
+# Tamaño máximo de la caché de videos extraídos (se borran los más antiguos)
+VIDEO_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# Columnas de las muestras de una prueba y su tipo en disco. Cada columna se
+# guarda como data/{test_id}/{columna}.npy (recording_time ya no se guarda:
+# era una copia de timestamp).
+SAMPLE_DTYPES = {
+    'timestamp': 'float64',
+    'left_eye_x': 'float32',
+    'left_eye_y': 'float32',
+    'left_eye_detected': 'bool',
+    'right_eye_x': 'float32',
+    'right_eye_y': 'float32',
+    'right_eye_detected': 'bool',
+    'imu_x': 'float32',
+    'imu_y': 'float32',
+    'imu_z': 'float32',
+}
+
+
+# Metadata ya interpretada por archivo: ruta -> ((mtime_ns, tamaño), metadata)
+_metadata_cache = {}
+_metadata_cache_guard = threading.Lock()
+
+
+def _siev_signature(siev_path: str) -> tuple:
+    stat = os.stat(siev_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _copy_json(value):
+    """Copia una estructura JSON (dicts y listas anidados) sin usar deepcopy"""
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+def _float_or_nan(value) -> float:
+    """Convierte una celda a float (vacía o no numérica -> NaN)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
 
 
 class SievManager:
     """
-    Gestor de archivos .siev (tar.gz) que contienen datos completos de usuarios VNG.
+    Gestor de archivos .siev que contienen datos completos de usuarios VNG.
     Maneja creación, actualización y extracción de expedientes de usuarios.
+    
+    El contenedor es ZIP con actualizaciones incrementales (ver
+    utils.siev_container); los .siev tar.gz antiguos se siguen leyendo y se
+    convierten al primer guardado (o todos de una vez con utils.siev_repack).
     """
     
     def __init__(self, base_path: str = None):
@@ -26,72 +87,176 @@ class SievManager:
         
         self.base_path = base_path
         os.makedirs(self.base_path, exist_ok=True)
+        
+        # Videos extraídos para el reproductor (se reutilizan entre aperturas)
+        self.video_cache_path = os.path.join(os.path.dirname(self.base_path), "cache", "videos")
+        
+        # Catálogo de expedientes para búsquedas sin abrir archivos
+        try:
+            self.catalog = SievCatalog(os.path.join(os.path.dirname(self.base_path), "catalog.db"))
+        except Exception as e:
+            print(f"Catálogo de expedientes no disponible: {e}")
+            self.catalog = None
     
     
 
     def extract_test_csv_data(self, siev_path: str, test_id: str) -> List[Dict]:
         """
-        Extrae datos CSV de una prueba específica desde el archivo .siev
+        Extrae los datos de una prueba como filas (formato del CSV original)
+        
+        Las pruebas guardadas por columnas se convierten a filas; para leer
+        datos numéricos es preferible extract_test_columns.
         
         Args:
             siev_path: Ruta del archivo .siev
             test_id: ID de la prueba
             
         Returns:
-            Lista de diccionarios con los datos CSV o lista vacía
+            Lista de diccionarios con los datos o lista vacía
         """
         try:
             if not os.path.exists(siev_path):
                 print(f"Archivo .siev no encontrado: {siev_path}")
                 return []
             
-            with tarfile.open(siev_path, 'r:gz') as tar:
-                # Buscar archivo CSV de la prueba
-                csv_filename = f"data/{test_id}.csv"
+            with SievContainer(siev_path) as container:
+                columns = self._read_npy_columns(container, f"data/{test_id}/")
+                if columns:
+                    keys = list(columns.keys())
+                    values = [columns[key].tolist() for key in keys]
+                    csv_data = []
+                    for row_values in zip(*values):
+                        row = {key: (None if value != value else value)  # NaN -> vacío
+                               for key, value in zip(keys, row_values)}
+                        row['recording_time'] = row.get('timestamp')
+                        csv_data.append(row)
+                    print(f"Datos extraídos: {len(csv_data)} registros para prueba {test_id}")
+                    return csv_data
                 
-                try:
-                    # Extraer archivo CSV
-                    csv_member = tar.getmember(csv_filename)
-                    csv_file = tar.extractfile(csv_member)
-                    
-                    if csv_file:
-                        import csv
-                        import io
-                        
-                        # Leer contenido CSV
-                        csv_content = csv_file.read().decode('utf-8')
-                        csv_reader = csv.DictReader(io.StringIO(csv_content))
-                        
-                        # Convertir a lista de diccionarios
-                        csv_data = []
-                        for row in csv_reader:
-                            # Convertir valores numéricos
-                            processed_row = {}
-                            for key, value in row.items():
-                                try:
-                                    if key in ['timestamp', 'recording_time', 'left_eye_x', 'left_eye_y', 
-                                            'right_eye_x', 'right_eye_y', 'imu_x', 'imu_y', 'imu_z']:
-                                        processed_row[key] = float(value)
-                                    elif key in ['left_eye_detected', 'right_eye_detected']:
-                                        processed_row[key] = value.lower() == 'true'
-                                    else:
-                                        processed_row[key] = value
-                                except ValueError:
-                                    processed_row[key] = value
-                            
-                            csv_data.append(processed_row)
-                        
-                        print(f"Datos CSV extraídos: {len(csv_data)} registros para prueba {test_id}")
-                        return csv_data
-                        
-                except KeyError:
+                csv_filename = f"data/{test_id}.csv"
+                if csv_filename not in container:
                     print(f"Archivo CSV no encontrado para prueba {test_id}")
                     return []
+                
+                csv_data = self._parse_csv_rows(container.read(csv_filename))
+                print(f"Datos CSV extraídos: {len(csv_data)} registros para prueba {test_id}")
+                return csv_data
                     
         except Exception as e:
             print(f"Error extrayendo datos CSV: {e}")
             return []   
     
+    def extract_test_columns(self, siev_path: str, test_id: str,
+                             columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Extrae los datos de una prueba como arrays por columna
+        
+        Args:
+            siev_path: Ruta del archivo .siev
+            test_id: ID de la prueba
+            columns: Columnas numéricas a extraer (por defecto todas)
+            
+        Returns:
+            Diccionario columna -> np.ndarray float64 (celdas vacías -> NaN)
+        """
+        import numpy as np
+        
+        arrays = self.read_test_columns(siev_path, test_id, columns, mmap=True)
+        return {key: np.array(values, dtype=np.float64) for key, values in arrays.items()}
+    
+    def read_test_columns(self, siev_path: str, test_id: str,
+                          columns: Optional[List[str]] = None,
+                          time_range: Optional[tuple] = None,
+                          mmap: bool = False) -> Dict[str, Any]:
+        """
+        Lee solo las columnas pedidas de una prueba, opcionalmente solo un
+        intervalo de tiempo
+        
+        El intervalo se ubica con búsqueda binaria sobre timestamp. Las
+        columnas .npy sin comprimir (archivos anteriores) se mapean en memoria
+        y de cada una se leen solo los bytes de ese intervalo; las comprimidas
+        y las pruebas guardadas como CSV se leen completas y se recortan.
+        
+        Args:
+            siev_path: Ruta del archivo .siev
+            test_id: ID de la prueba
+            columns: Columnas a leer (por defecto todas)
+            time_range: (inicio, fin) en segundos desde la primera muestra, o None
+            mmap: Retornar vistas de solo lectura mapeadas en memoria en lugar
+                  de copias cuando la columna está sin comprimir (no compactar
+                  el .siev mientras se usan)
+            
+        Returns:
+            Diccionario columna -> np.ndarray con el tipo guardado (float64 y
+            NaN en pruebas CSV), o vacío si la prueba no tiene datos
+        """
+        import numpy as np
+        
+        try:
+            with SievContainer(siev_path) as container:
+                prefix = f"data/{test_id}/"
+                names = {name[len(prefix):-len('.npy')]: name for name in container.names()
+                         if name.startswith(prefix) and name.endswith('.npy')}
+                if names:
+                    if columns is None:
+                        columns = [key for key in SAMPLE_DTYPES if key in names]
+                        columns += sorted(key for key in names if key not in SAMPLE_DTYPES)
+                    sources = {key: self._npy_column(container, names[key])
+                               for key in columns if key in names}
+                    
+                    start, stop = 0, None
+                    if time_range is not None and 'timestamp' in names:
+                        timestamps = sources.get('timestamp')
+                        if timestamps is None:
+                            timestamps = self._npy_column(container, names['timestamp'])
+                        start, stop = self._time_slice(timestamps, time_range)
+                    
+                    if mmap:
+                        return {key: source[start:stop] for key, source in sources.items()}
+                    return {key: np.array(source[start:stop]) for key, source in sources.items()}
+        except Exception as e:
+            print(f"Error leyendo columnas de la prueba {test_id}: {e}")
+            return {}
+        
+        # Prueba guardada como CSV (versiones anteriores)
+        arrays = self._legacy_columns(siev_path, test_id, columns)
+        if arrays and time_range is not None:
+            timestamps = arrays.get('timestamp')
+            if timestamps is None:
+                timestamps = self._legacy_columns(siev_path, test_id, ['timestamp'])['timestamp']
+            start, stop = self._time_slice(timestamps, time_range)
+            arrays = {key: values[start:stop] for key, values in arrays.items()}
+        return arrays
+    
+    def _time_slice(self, timestamps, time_range: tuple) -> tuple:
+        """Índices (inicio, fin) de las muestras dentro de time_range (relativo)"""
+        import numpy as np
+        
+        if len(timestamps) == 0:
+            return 0, 0
+        first = float(timestamps[0])
+        start = int(np.searchsorted(timestamps, first + time_range[0], side='left'))
+        stop = int(np.searchsorted(timestamps, first + time_range[1], side='right'))
+        return start, max(start, stop)
+    
+    def _legacy_columns(self, siev_path: str, test_id: str,
+                        columns: Optional[List[str]]) -> Dict[str, Any]:
+        """Columnas float64 de una prueba guardada como CSV"""
+        import numpy as np
+        
+        rows = self.extract_test_csv_data(siev_path, test_id)
+        if not rows:
+            return {}
+        
+        if columns is None:
+            columns = [key for key, value in rows[0].items() if isinstance(value, (float, bool))]
+        
+        return {
+            key: np.array([row.get(key) if isinstance(row.get(key), (float, bool)) else np.nan
+                           for row in rows], dtype=np.float64)
+            for key in columns
+        }
+    
     def create_user_siev(self, user_data: Dict, siev_path: str = None) -> str:
         """
         Crea un nuevo archivo .siev para un usuario
@@ -132,129 +297,367 @@ class SievManager:
             }
         }
         
-        # Crear archivo .siev usando archivo temporal
-        temp_path = siev_path + "_temp"
-        
+        # Crear archivo .siev (archivo temporal y reemplazo atómico)
         try:
-            with tarfile.open(temp_path, 'w:gz') as tar:
-                # Crear estructura de directorios
-                self._create_directory_structure(tar)
-                
-                # Agregar JSON inicial
-                self._add_json_to_tar(tar, initial_data, "metadata.json")
-                self._add_json_to_tar(tar, initial_data, "metadata_backup.json")
-            
-            # Renombrar archivo temporal a definitivo
-            shutil.move(temp_path, siev_path)
+            metadata_bytes = self._json_bytes(initial_data)
+            create_siev(siev_path, {
+                "metadata.json": metadata_bytes,
+                "metadata_backup.json": metadata_bytes
+            })
+            self._cache_metadata(siev_path, initial_data)
             print(f"Archivo .siev creado: {siev_path}")
             return siev_path
             
         except Exception as e:
-            # Limpiar archivo temporal si hay error
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
             raise Exception(f"Error creando archivo .siev: {e}")
     
 
 
     def add_test_to_siev(self, siev_path: str, test_data: Dict, 
-                        csv_data: List[Dict] = None, video_path: str = None) -> bool:
+                        csv_data: List[Dict] = None, video_path: str = None,
+                        imu_data=None, columns: Dict[str, Any] = None) -> bool:
         """
         Agrega una nueva prueba o actualiza una existente en el archivo .siev
+        
+        Las muestras se guardan por columnas (data/{test_id}/{columna}.npy,
+        tipos en SAMPLE_DTYPES); se pueden pasar ya como columnas (columns)
+        o como filas (csv_data).
+        
+        imu_data (opcional) es el stream crudo del IMU con su propio tiempo
+        (columnas o filas), guardado en data/{test_id}_imu/ para poder
+        realinearlo después.
+        """
+        return self.add_tests_to_siev(siev_path, [{
+            'test_data': test_data,
+            'csv_data': csv_data,
+            'columns': columns,
+            'imu_data': imu_data,
+            'video_path': video_path
+        }])
+
+    def add_tests_to_siev(self, siev_path: str, changes: List[Dict], progress=None) -> bool:
+        """
+        Aplica varios cambios de pruebas con una sola escritura del .siev
+        
+        Args:
+            siev_path: Ruta del archivo .siev
+            changes: Cambios con 'test_data' y opcionalmente 'columns',
+                     'csv_data', 'imu_data' y 'video_path' (ver add_test_to_siev)
+            progress: Función opcional progress(hechos, total)
+            
+        Returns:
+            True si se guardó exitosamente
         """
         if not os.path.exists(siev_path):
             raise FileNotFoundError(f"Archivo .siev no encontrado: {siev_path}")
         
-        temp_path = siev_path + "_temp"
-        
         try:
-            # Leer datos actuales
-            current_data = self._read_metadata_from_siev(siev_path)
+            # Leer, modificar y escribir sin que otra escritura se intercale
+            with siev_lock(siev_path):
+                return self._add_tests_locked(siev_path, changes, progress)
             
-            # Usar ID que viene en test_data o generar uno nuevo
-            test_id = test_data.get('id') or f"test_{int(time.time())}"
+        except Exception as e:
+            raise Exception(f"Error procesando archivo .siev: {e}")
+
+    def _add_tests_locked(self, siev_path: str, changes: List[Dict], progress=None) -> bool:
+        """Cuerpo de add_tests_to_siev (con el lock del archivo tomado)."""
+        # Leer datos actuales
+        current_data = self._read_metadata_from_siev(siev_path)
+        
+        # Agregar solo lo que cambia; las versiones anteriores quedan reemplazadas
+        members = {}
+        files = {}
+        remove = []
+        total = len(changes) + 1
+        for done, change in enumerate(changes, 1):
+            columns = change.get('columns')
+            if columns is None and change.get('csv_data'):
+                columns = self._rows_to_columns(change['csv_data'])
+            imu_data = change.get('imu_data')
+            if imu_data and not isinstance(imu_data, dict):
+                imu_data = self._rows_to_columns(imu_data)
             
-            # BUSCAR SI YA EXISTE LA PRUEBA
-            existing_test = None
-            for i, test in enumerate(current_data["pruebas"]):
-                if test.get("id") == test_id:
-                    existing_test = i
-                    break
+            self._stage_test(current_data, change['test_data'], columns,
+                             change.get('video_path'), imu_data, members, files, remove)
+            if progress:
+                progress(done, total)
+        
+        # Actualizar timestamp
+        current_data["metadata"]["ultima_actualizacion"] = time.time()
+        
+        # Actualizar metadata (la escritura completa es atómica)
+        metadata_bytes = self._json_bytes(current_data)
+        members["metadata_backup.json"] = metadata_bytes
+        members["metadata.json"] = metadata_bytes
+        update_siev(siev_path, members, files, remove=remove)
+        self._cache_metadata(siev_path, current_data)
+        
+        if progress:
+            progress(total, total)
+        return True
+
+    def _stage_test(self, current_data: Dict, test_data: Dict, columns: Optional[Dict[str, Any]],
+                    video_path: Optional[str], imu_data: Optional[Dict[str, Any]],
+                    members: Dict[str, bytes], files: Dict[str, str], remove: List[str]):
+        """Aplica un cambio de prueba a la metadata y agrega sus miembros a escribir."""
+        # Usar ID que viene en test_data o generar uno nuevo
+        test_id = test_data.get('id') or f"test_{int(time.time())}"
+        
+        # BUSCAR SI YA EXISTE LA PRUEBA
+        existing_test = None
+        for i, test in enumerate(current_data["pruebas"]):
+            if test.get("id") == test_id:
+                existing_test = i
+                break
+        
+        # Si existe, ACTUALIZAR; si no existe, CREAR nueva
+        if existing_test is not None:
+            # ACTUALIZAR prueba existente
+            test_to_update = current_data["pruebas"][existing_test]
             
-            # Si existe, ACTUALIZAR; si no existe, CREAR nueva
-            if existing_test is not None:
-                # ACTUALIZAR prueba existente
-                test_to_update = current_data["pruebas"][existing_test]
-                
-                # Actualizar solo campos que no son None o vacíos
-                if test_data.get('tipo') and test_data.get('tipo') != 'video_update':
-                    test_to_update['tipo'] = test_data.get('tipo')
-                if test_data.get('evaluador'):
-                    test_to_update['evaluador'] = test_data.get('evaluador')
-                if test_data.get('hora_inicio'):
-                    test_to_update['hora_inicio'] = test_data.get('hora_inicio')
-                if test_data.get('hora_fin'):
-                    test_to_update['hora_fin'] = test_data.get('hora_fin')
-                
-                # Actualizar archivos
-                if csv_data:
-                    test_to_update['archivos']['csv'] = f"data/{test_id}.csv"
-                if video_path:
-                    test_to_update['archivos']['video'] = f"videos/{test_id}.mp4"
-                    
-                print(f"Actualizando prueba existente: {test_id}")
-            else:
-                # CREAR nueva prueba
-                new_test = {
-                    "id": test_id,
-                    "tipo": test_data.get('tipo', 'desconocido'),
-                    "fecha": test_data.get('fecha', time.time()),
-                    "hora_inicio": test_data.get('hora_inicio'),
-                    "hora_fin": test_data.get('hora_fin'),
-                    "evaluador": test_data.get('evaluador'),
-                    "comentarios": test_data.get('comentarios'),
-                    "archivos": {
-                        "csv": f"data/{test_id}.csv" if csv_data else None,
-                        "video": f"videos/{test_id}.mp4" if video_path else None
-                    },
-                    "metadata_prueba": test_data.get('metadata_prueba', {})
-                }
+            # Actualizar solo campos que no son None o vacíos
+            if test_data.get('tipo') and test_data.get('tipo') != 'video_update':
+                test_to_update['tipo'] = test_data.get('tipo')
+            if test_data.get('evaluador'):
+                test_to_update['evaluador'] = test_data.get('evaluador')
+            if test_data.get('hora_inicio'):
+                test_to_update['hora_inicio'] = test_data.get('hora_inicio')
+            if test_data.get('hora_fin'):
+                test_to_update['hora_fin'] = test_data.get('hora_fin')
+            if test_data.get('metadata_prueba'):
+                test_to_update.setdefault('metadata_prueba', {}).update(test_data['metadata_prueba'])
+            
+            # Actualizar archivos (los CSV anteriores se reemplazan por columnas)
+            archivos = test_to_update.setdefault('archivos', {})
+            if columns:
+                archivos['datos'] = f"data/{test_id}/"
+                archivos['csv'] = None
+            if video_path:
+                archivos['video'] = f"videos/{test_id}.mp4"
+            if imu_data:
+                archivos['imu'] = f"data/{test_id}_imu/"
                 
-                current_data["pruebas"].append(new_test)
-                current_data["metadata"]["total_pruebas"] += 1
-                print(f"Creando nueva prueba: {test_id}")
+            print(f"Actualizando prueba existente: {test_id}")
+        else:
+            # CREAR nueva prueba
+            new_test = {
+                "id": test_id,
+                "tipo": test_data.get('tipo', 'desconocido'),
+                "fecha": test_data.get('fecha', time.time()),
+                "hora_inicio": test_data.get('hora_inicio'),
+                "hora_fin": test_data.get('hora_fin'),
+                "evaluador": test_data.get('evaluador'),
+                "comentarios": test_data.get('comentarios'),
+                "archivos": {
+                    "datos": f"data/{test_id}/" if columns else None,
+                    "video": f"videos/{test_id}.mp4" if video_path else None,
+                    "imu": f"data/{test_id}_imu/" if imu_data else None
+                },
+                "metadata_prueba": test_data.get('metadata_prueba', {})
+            }
             
-            # Actualizar timestamp
-            current_data["metadata"]["ultima_actualizacion"] = time.time()
+            current_data["pruebas"].append(new_test)
+            current_data["metadata"]["total_pruebas"] += 1
+            print(f"Creando nueva prueba: {test_id}")
+        
+        if columns:
+            members.update(self._npy_members(f"data/{test_id}/", columns, SAMPLE_DTYPES))
+            remove.append(f"data/{test_id}.csv")
+        if imu_data:
+            members.update(self._npy_members(f"data/{test_id}_imu/", imu_data))
+            remove.append(f"data/{test_id}_imu.csv")
+        if video_path and os.path.exists(video_path):
+            files[f"videos/{test_id}.mp4"] = video_path
+
+    def recalibrate_test(self, siev_path: str, test_id: str, calibration_parameters: Dict) -> bool:
+        """
+        Recalibra en bloque una prueba ya grabada, sin volver a grabarla.
+        
+        Deshace la calibración guardada con la prueba (si se grabó en grados)
+        y aplica la nueva de forma vectorizada sobre las columnas completas.
+        
+        Args:
+            siev_path: Ruta del archivo .siev
+            test_id: ID de la prueba
+            calibration_parameters: CalibrationManager.get_calibration_parameters()
             
-            # Crear nuevo archivo .siev
-            with tarfile.open(temp_path, 'w:gz') as new_tar:
-                # Copiar contenido existente (excepto metadata)
-                self._copy_existing_content(siev_path, new_tar, exclude=['metadata.json'])
-                
-                # Agregar nuevos archivos
-                if csv_data:
-                    self._add_csv_to_tar(new_tar, csv_data, f"data/{test_id}.csv")
-                
-                if video_path and os.path.exists(video_path):
-                    self._add_file_to_tar(new_tar, video_path, f"videos/{test_id}.mp4")
-                
-                # Actualizar metadata
-                self._add_json_to_tar(new_tar, current_data, "metadata_backup.json")
-                self._add_json_to_tar(new_tar, current_data, "metadata.json")
+        Returns:
+            True si se recalibró exitosamente
+        """
+        from utils.CalibrationManager import recalibrate_columns, is_usable_calibration, EYE_COLUMNS
+        
+        metadata = self._read_metadata_from_siev(siev_path)
+        test = next((t for t in metadata.get("pruebas", []) if t.get("id") == test_id), None)
+        if test is None:
+            raise ValueError(f"Prueba con ID {test_id} no encontrada")
+        
+        columns = self.extract_test_columns(siev_path, test_id, list(SAMPLE_DTYPES))
+        if len(columns.get('timestamp', ())) == 0:
+            print(f"Prueba {test_id} sin datos para recalibrar")
+            return False
+        
+        stored_parameters = test.get('metadata_prueba', {}).get('calibracion')
+        
+        eye_keys = [key for pair in EYE_COLUMNS.values() for key in pair]
+        converted = recalibrate_columns({key: columns[key] for key in eye_keys},
+                                        stored_parameters, calibration_parameters)
+        for key in eye_keys:
+            columns[key] = converted[key]
+        
+        units = 'grados' if is_usable_calibration(calibration_parameters) else 'px'
+        self.add_test_to_siev(
+            siev_path,
+            {'id': test_id, 'metadata_prueba': {'calibracion': calibration_parameters, 'unidades': units}},
+            columns=columns
+        )
+        print(f"Prueba {test_id} recalibrada ({len(columns['timestamp'])} muestras)")
+        return True
+    
+    def extract_test_imu_stream(self, siev_path: str, test_id: str) -> Dict[str, Any]:
+        """
+        Extrae el stream crudo del IMU de una prueba (data/{test_id}_imu/)
+        
+        Returns:
+            Diccionario columna -> np.ndarray float64, o vacío si la prueba
+            no guardó el stream
+        """
+        import numpy as np
+        
+        try:
+            with SievContainer(siev_path) as container:
+                stream = self._read_npy_columns(container, f"data/{test_id}_imu/")
+                if stream:
+                    return {key: values.astype(np.float64) for key, values in stream.items()}
+                # Stream guardado como CSV (versiones anteriores)
+                content = container.read(f"data/{test_id}_imu.csv")
+        except KeyError:
+            return {}
+        except Exception as e:
+            print(f"Error extrayendo stream IMU: {e}")
+            return {}
+        
+        return self._parse_imu_csv(content)
+    
+    def realign_test_imu(self, siev_path: str, test_id: str) -> bool:
+        """
+        Realinea imu_x / imu_y / imu_z de una prueba grabada con su stream IMU.
+        
+        Interpola de forma vectorizada los ángulos del IMU sobre los tiempos
+        de las muestras oculares (útil para pruebas grabadas reteniendo el
+        último valor del IMU en cada muestra).
+        
+        Returns:
+            True si se realineó
+        """
+        import numpy as np
+        from utils.imu_timeline import align_imu_to_eye
+        
+        stream = self.extract_test_imu_stream(siev_path, test_id)
+        if len(stream.get('timestamp', ())) < 2:
+            print(f"Prueba {test_id} sin stream IMU para realinear")
+            return False
+        
+        columns = self.extract_test_columns(siev_path, test_id, list(SAMPLE_DTYPES))
+        if len(columns.get('timestamp', ())) == 0:
+            print(f"Prueba {test_id} sin datos para realinear")
+            return False
+        
+        imu_values = np.column_stack([stream[key] for key in ('angle_x', 'angle_y', 'angle_z')])
+        aligned = align_imu_to_eye(columns['timestamp'], stream['timestamp'], imu_values,
+                                   angle_columns=(0, 1, 2))
+        for index, key in enumerate(('imu_x', 'imu_y', 'imu_z')):
+            columns[key] = aligned[:, index]
+        
+        self.add_test_to_siev(siev_path, {'id': test_id}, columns=columns)
+        print(f"IMU de la prueba {test_id} realineado ({len(columns['timestamp'])} muestras)")
+        return True
+    
+    def compute_analysis_key(self, data_bytes: bytes, parameters: Dict) -> str:
+        """
+        Clave de caché de análisis: hash de los datos de la prueba más los
+        parámetros del análisis. Si cambia cualquiera de los dos, cambia la clave.
+        """
+        digest = hashlib.sha256()
+        digest.update(data_bytes)
+        digest.update(json.dumps(parameters, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get_cached_analyses(self, siev_path: str, test_ids: List[str],
+                            parameters: Dict) -> Dict[str, Dict]:
+        """
+        Obtiene los análisis guardados en el .siev que siguen siendo válidos
+        
+        Args:
+            siev_path: Ruta del archivo .siev
+            test_ids: IDs de las pruebas
+            parameters: Parámetros con los que se quiere el análisis
+            
+        Returns:
+            test_id -> resultados, solo para las pruebas con caché vigente
+        """
+        cached = {}
+        try:
+            with SievContainer(siev_path) as container:
+                for test_id in test_ids:
+                    cache_name = f"analysis/{test_id}.json"
+                    if cache_name not in container:
+                        continue
+                    data_bytes = self._test_data_bytes(container, test_id)
+                    if data_bytes is None:
+                        continue
+                    
+                    entry = json.loads(container.read(cache_name))
+                    key = self.compute_analysis_key(data_bytes, parameters)
+                    if entry.get('clave') == key:
+                        cached[test_id] = entry.get('resultados', {})
+        except Exception as e:
+            print(f"Error leyendo caché de análisis: {e}")
+        
+        return cached
+    
+    def store_analyses(self, siev_path: str, analyses: Dict[str, Dict], parameters: Dict) -> bool:
+        """
+        Guarda resultados de análisis en el .siev (analysis/{test_id}.json),
+        reemplazando las entradas anteriores de esas pruebas
+        
+        Args:
+            siev_path: Ruta del archivo .siev
+            analyses: test_id -> resultados (serializables a JSON)
+            parameters: Parámetros con los que se calcularon
             
-            # Renombrar archivo temporal a definitivo
-            shutil.move(temp_path, siev_path)
+        Returns:
+            True si se guardó exitosamente
+        """
+        if not analyses:
+            return False
+        
+        try:
+            # La clave se calcula sobre los datos actualmente guardados
+            entries = {}
+            with SievContainer(siev_path) as container:
+                for test_id, results in analyses.items():
+                    data_bytes = self._test_data_bytes(container, test_id)
+                    if data_bytes is None:
+                        continue
+                    entries[f"analysis/{test_id}.json"] = {
+                        'clave': self.compute_analysis_key(data_bytes, parameters),
+                        'parametros': parameters,
+                        'fecha': time.time(),
+                        'resultados': results
+                    }
+            
+            if not entries:
+                return False
             
+            update_siev(siev_path, {name: self._json_bytes(entry) for name, entry in entries.items()})
+            self._update_catalog(siev_path)
+            print(f"Análisis guardados en caché: {len(entries)} pruebas")
             return True
             
         except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
-            raise Exception(f"Error procesando archivo .siev: {e}")
-
-
-
+            print(f"Error guardando caché de análisis: {e}")
+            return False
+    
     def update_test_metadata(self, siev_path: str, test_id: str, 
                            evaluator: str = None, comments: str = None) -> bool:
         """
@@ -272,48 +675,46 @@ class SievManager:
         if not os.path.exists(siev_path):
             raise FileNotFoundError(f"Archivo .siev no encontrado: {siev_path}")
         
-        temp_path = siev_path + "_temp"
-        
         try:
-            # Leer datos actuales
-            current_data = self._read_metadata_from_siev(siev_path)
-            
-            # Buscar y actualizar la prueba
-            test_found = False
-            for test in current_data["pruebas"]:
-                if test["id"] == test_id:
-                    if evaluator is not None:
-                        test["evaluador"] = evaluator
-                    if comments is not None:
-                        test["comentarios"] = comments
-                    test["hora_fin"] = time.time()
-                    test_found = True
-                    break
-            
-            if not test_found:
-                raise ValueError(f"Prueba con ID {test_id} no encontrada")
-            
-            current_data["metadata"]["ultima_actualizacion"] = time.time()
-            
-            # Crear nuevo archivo .siev
-            with tarfile.open(temp_path, 'w:gz') as new_tar:
-                # Copiar todo el contenido existente excepto metadata
-                self._copy_existing_content(siev_path, new_tar, exclude=['metadata.json'])
-                
-                # Actualizar metadata
-                self._add_json_to_tar(new_tar, current_data, "metadata_backup.json")
-                self._add_json_to_tar(new_tar, current_data, "metadata.json")
-            
-            # Reemplazar archivo original
-            shutil.move(temp_path, siev_path)
+            with siev_lock(siev_path):
+                self._update_test_metadata_locked(siev_path, test_id, evaluator, comments)
             print(f"Metadatos de prueba actualizados: {test_id}")
             return True
             
         except Exception as e:
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
             raise Exception(f"Error actualizando metadatos: {e}")
     
+    def _update_test_metadata_locked(self, siev_path: str, test_id: str,
+                                     evaluator: Optional[str], comments: Optional[str]):
+        """Cuerpo de update_test_metadata (con el lock del archivo tomado)."""
+        # Leer datos actuales
+        current_data = self._read_metadata_from_siev(siev_path)
+        
+        # Buscar y actualizar la prueba
+        test_found = False
+        for test in current_data["pruebas"]:
+            if test["id"] == test_id:
+                if evaluator is not None:
+                    test["evaluador"] = evaluator
+                if comments is not None:
+                    test["comentarios"] = comments
+                test["hora_fin"] = time.time()
+                test_found = True
+                break
+        
+        if not test_found:
+            raise ValueError(f"Prueba con ID {test_id} no encontrada")
+        
+        current_data["metadata"]["ultima_actualizacion"] = time.time()
+        
+        # Reemplazar solo la metadata
+        metadata_bytes = self._json_bytes(current_data)
+        update_siev(siev_path, {
+            "metadata_backup.json": metadata_bytes,
+            "metadata.json": metadata_bytes
+        })
+        self._cache_metadata(siev_path, current_data)
+    
     def extract_siev_data(self, siev_path: str, output_dir: str) -> bool:
         """
         Extrae todo el contenido de un archivo .siev
@@ -328,8 +729,8 @@ class SievManager:
         try:
             os.makedirs(output_dir, exist_ok=True)
             
-            with tarfile.open(siev_path, 'r:gz') as tar:
-                tar.extractall(output_dir)
+            with SievContainer(siev_path) as container:
+                container.extract_all(output_dir)
             
             print(f"Archivo .siev extraído en: {output_dir}")
             return True
@@ -337,6 +738,110 @@ class SievManager:
         except Exception as e:
             raise Exception(f"Error extrayendo archivo .siev: {e}")
     
+    def needs_repack(self, siev_path: str) -> bool:
+        """
+        True si el .siev no está en el formato actual (contenedor tar.gz o con
+        espacio muerto, o pruebas CSV que se pueden convertir a columnas)
+        """
+        if needs_repack(siev_path):
+            return True
+        with siev_lock(siev_path), SievContainer(siev_path) as container:
+            if not any(name.startswith('data/') and name.endswith('.csv')
+                       for name in container.names()):
+                return False
+            members, remove, _ = self._plan_repack(container)
+            return bool(members or remove)
+    
+    def repack_siev(self, siev_path: str) -> Dict[str, Any]:
+        """
+        Convierte un .siev al formato actual: ZIP compacto con las muestras
+        de cada prueba en columnas .npy
+        
+        Cada columna convertida se relee y se compara con los datos del CSV
+        antes de escribirla; las pruebas con columnas de texto no numérico
+        conservan su CSV. La reescritura verifica los checksums antes de
+        reemplazar el archivo (ver siev_container.repack_siev). El catálogo
+        no se actualiza aquí: lo pone al día el próximo sync.
+        
+        Args:
+            siev_path: Ruta del archivo .siev
+            
+        Returns:
+            {'reempaquetado', 'pruebas_convertidas', 'muestras', 'bytes_antes',
+             'bytes_despues', 'advertencias'}
+        """
+        result = {
+            'reempaquetado': False,
+            'bytes_antes': os.path.getsize(siev_path),
+            'bytes_despues': os.path.getsize(siev_path)
+        }
+        
+        with siev_lock(siev_path):
+            with SievContainer(siev_path) as container:
+                members, remove, summary = self._plan_repack(container)
+            result.update(summary)
+            
+            if not (members or remove or needs_repack(siev_path)):
+                return result
+            repack_siev(siev_path, members, remove=remove)
+        
+        result['reempaquetado'] = True
+        result['bytes_despues'] = os.path.getsize(siev_path)
+        return result
+    
+    def _plan_repack(self, container: SievContainer) -> tuple:
+        """
+        Miembros a escribir y a quitar para pasar las pruebas CSV a columnas
+        
+        Returns:
+            (members, remove, {'pruebas_convertidas', 'muestras', 'advertencias'})
+        """
+        metadata = self._parse_metadata(container)
+        names = set(container.names())
+        members = {}
+        remove = []
+        summary = {'pruebas_convertidas': 0, 'muestras': 0, 'advertencias': []}
+        
+        for test in metadata.get("pruebas", []):
+            test_id = test.get("id")
+            archivos = test.setdefault("archivos", {})
+            
+            csv_name = f"data/{test_id}.csv"
+            if csv_name in names:
+                prefix = f"data/{test_id}/"
+                if any(name.startswith(prefix) for name in names):
+                    # Ya tiene columnas: el CSV quedó de una versión anterior
+                    remove.append(csv_name)
+                else:
+                    rows = self._parse_csv_rows(container.read(csv_name))
+                    text_columns = self._text_columns(rows)
+                    if text_columns:
+                        summary['advertencias'].append(
+                            f"{test_id}: columnas no numéricas {text_columns}, se conserva el CSV")
+                    else:
+                        columns = self._rows_to_columns(rows)
+                        members.update(self._checked_npy_members(prefix, columns, SAMPLE_DTYPES))
+                        remove.append(csv_name)
+                        archivos['datos'] = prefix if columns else None
+                        archivos['csv'] = None
+                        summary['pruebas_convertidas'] += 1
+                        summary['muestras'] += len(rows)
+            
+            imu_name = f"data/{test_id}_imu.csv"
+            if imu_name in names:
+                prefix = f"data/{test_id}_imu/"
+                if not any(name.startswith(prefix) for name in names):
+                    stream = self._parse_imu_csv(container.read(imu_name))
+                    members.update(self._checked_npy_members(prefix, stream))
+                    archivos['imu'] = prefix if stream else None
+                remove.append(imu_name)
+        
+        if members or remove:
+            metadata_bytes = self._json_bytes(metadata)
+            members["metadata_backup.json"] = metadata_bytes
+            members["metadata.json"] = metadata_bytes
+        return members, remove, summary
+    
     def validate_siev(self, siev_path: str) -> Dict[str, Any]:
         """
         Valida la integridad de un archivo .siev
@@ -359,33 +864,35 @@ class SievManager:
                 result["errors"].append("Archivo no existe")
                 return result
             
-            # Validar que es un tar válido
+            # Validar que es un contenedor válido (ZIP o tar.gz legado)
             try:
-                with tarfile.open(siev_path, 'r:gz') as tar:
-                    members = tar.getnames()
+                container = SievContainer(siev_path)
             except Exception as e:
-                result["errors"].append(f"No es un archivo tar válido: {e}")
+                result["errors"].append(f"No es un archivo .siev válido: {e}")
                 return result
             
-            # Validar estructura
-            required_files = ["metadata.json"]
-            for req_file in required_files:
-                if req_file not in members:
-                    result["errors"].append(f"Archivo requerido faltante: {req_file}")
-            
-            # Validar metadata JSON
-            try:
-                metadata = self._read_metadata_from_siev(siev_path)
-                result["metadata"] = metadata
+            with container:
+                members = container.names()
                 
-                # Validar estructura del JSON
-                required_keys = ["usuario", "pruebas", "metadata"]
-                for key in required_keys:
-                    if key not in metadata:
-                        result["errors"].append(f"Clave faltante en metadata: {key}")
+                # Validar estructura
+                required_files = ["metadata.json"]
+                for req_file in required_files:
+                    if req_file not in members:
+                        result["errors"].append(f"Archivo requerido faltante: {req_file}")
                 
-            except Exception as e:
-                result["errors"].append(f"Error leyendo metadata: {e}")
+                # Validar metadata JSON (misma apertura; queda en caché)
+                try:
+                    metadata = self._read_metadata_from_siev(siev_path, container)
+                    result["metadata"] = metadata
+                    
+                    # Validar estructura del JSON
+                    required_keys = ["usuario", "pruebas", "metadata"]
+                    for key in required_keys:
+                        if key not in metadata:
+                            result["errors"].append(f"Clave faltante en metadata: {key}")
+                    
+                except Exception as e:
+                    result["errors"].append(f"Error leyendo metadata: {e}")
             
             # Verificar backup
             if "metadata_backup.json" not in members:
@@ -436,118 +943,235 @@ class SievManager:
     
     # Métodos auxiliares privados
     
-    def _create_directory_structure(self, tar: tarfile.TarFile):
-        """Crea la estructura de directorios dentro del tar"""
-        dirs = ["data/", "videos/"]
-        for dir_name in dirs:
-            tarinfo = tarfile.TarInfo(name=dir_name)
-            tarinfo.type = tarfile.DIRTYPE
-            tarinfo.mode = 0o755
-            tarinfo.mtime = int(time.time())
-            tar.addfile(tarinfo)
-    
-    def _add_json_to_tar(self, tar: tarfile.TarFile, data: Dict, filename: str):
-        """Agrega un archivo JSON al tar"""
-        json_str = json.dumps(data, indent=2, ensure_ascii=False)
-        json_bytes = json_str.encode('utf-8')
-        
-        tarinfo = tarfile.TarInfo(name=filename)
-        tarinfo.size = len(json_bytes)
-        tarinfo.mtime = int(time.time())
-        
-        tar.addfile(tarinfo, BytesIO(json_bytes))
-    
-    def _add_csv_to_tar(self, tar: tarfile.TarFile, csv_data: List[Dict], filename: str):
-        """Agrega datos CSV al tar"""
+    def _json_bytes(self, data: Dict) -> bytes:
+        """Serializa un JSON para guardarlo en el .siev"""
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    
+    def _rows_to_columns(self, rows: List[Dict]) -> Dict[str, Any]:
+        """Convierte filas (diccionarios) a columnas numpy (celdas vacías -> NaN)"""
+        import numpy as np
+        
+        columns = {}
+        for key in rows[0].keys() if rows else ():
+            if key == 'recording_time':
+                continue
+            if SAMPLE_DTYPES.get(key) == 'bool':
+                columns[key] = np.fromiter((row.get(key) in (True, 'True', 'true', 1)
+                                            for row in rows), dtype=bool, count=len(rows))
+            else:
+                columns[key] = np.fromiter((_float_or_nan(row.get(key)) for row in rows),
+                                           dtype=np.float64, count=len(rows))
+        return columns
+    
+    def _npy_members(self, prefix: str, columns: Dict[str, Any],
+                     dtypes: Optional[Dict[str, str]] = None) -> Dict[str, bytes]:
+        """Serializa columnas como miembros .npy (uno por columna) bajo prefix"""
+        import numpy as np
+        
+        members = {}
+        for key, values in columns.items():
+            dtype = (dtypes or {}).get(key, 'float64')
+            buffer = BytesIO()
+            np.lib.format.write_array(buffer, np.ascontiguousarray(values, dtype=dtype),
+                                      allow_pickle=False)
+            members[f"{prefix}{key}.npy"] = buffer.getvalue()
+        return members
+    
+    def _checked_npy_members(self, prefix: str, columns: Dict[str, Any],
+                             dtypes: Optional[Dict[str, str]] = None) -> Dict[str, bytes]:
+        """_npy_members comprobando que cada columna se relee igual"""
+        import numpy as np
+        
+        members = self._npy_members(prefix, columns, dtypes)
+        for key, values in columns.items():
+            expected = np.asarray(values, dtype=(dtypes or {}).get(key, 'float64'))
+            stored = np.lib.format.read_array(BytesIO(members[f"{prefix}{key}.npy"]),
+                                              allow_pickle=False)
+            if not np.array_equal(stored, expected, equal_nan=True):
+                raise ValueError(f"La columna {key} no se conserva al convertirla")
+        return members
+    
+    def _text_columns(self, rows: List[Dict]) -> List[str]:
+        """Columnas de un CSV con celdas de texto no numérico (se perderían en .npy)"""
+        text_columns = set()
+        for row in rows:
+            for key, value in row.items():
+                if (key != 'recording_time' and isinstance(value, str) and value.strip()
+                        and value.strip().lower() != 'nan'
+                        and math.isnan(_float_or_nan(value))):
+                    text_columns.add(key)
+        return sorted(text_columns)
+    
+    def _read_npy_columns(self, container: SievContainer, prefix: str,
+                          columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Lee columnas .npy guardadas bajo prefix (todas si columns es None)
+        
+        Returns:
+            Diccionario columna -> np.ndarray con su tipo guardado, o vacío si
+            no hay columnas bajo prefix
+        """
+        import numpy as np
+        
+        available = {name[len(prefix):-len('.npy')]: name for name in container.names()
+                     if name.startswith(prefix) and name.endswith('.npy')}
+        if not available:
+            return {}
+        
+        if columns is None:
+            columns = [key for key in SAMPLE_DTYPES if key in available]
+            columns += sorted(key for key in available if key not in SAMPLE_DTYPES)
+        
+        return {key: np.array(self._npy_column(container, available[key]))
+                for key in columns if key in available}
+    
+    def _npy_column(self, container: SievContainer, name: str):
+        """
+        Columna .npy de un miembro del .siev sin leerla
+        
+        Si el miembro está sin comprimir retorna un np.memmap de solo lectura
+        sobre sus bytes dentro del .siev; si no, lo lee completo.
+        """
+        import numpy as np
+        
+        member_range = container.member_range(name)
+        if member_range is None:
+            return np.lib.format.read_array(BytesIO(container.read(name)), allow_pickle=False)
+        
+        offset = member_range[0]
+        with open(container.path, 'rb') as f:
+            f.seek(offset)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            data_offset = f.tell()
+        
+        if not shape or shape[0] == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(container.path, dtype=dtype, mode='r',
+                         offset=data_offset, shape=shape,
+                         order='F' if fortran_order else 'C')
+    
+    def _test_data_bytes(self, container: SievContainer, test_id: str) -> Optional[bytes]:
+        """Bytes de los datos guardados de una prueba (para la clave de caché)"""
+        prefix = f"data/{test_id}/"
+        names = sorted(name for name in container.names() if name.startswith(prefix))
+        if names:
+            return b''.join(container.read(name) for name in names)
+        csv_name = f"data/{test_id}.csv"
+        return container.read(csv_name) if csv_name in container else None
+    
+    def _parse_csv_rows(self, content: bytes) -> List[Dict]:
+        """Interpreta un CSV de muestras guardado por versiones anteriores"""
         import csv
         import io
         
-        if not csv_data:
-            return
-        
-        try:
-            # Convertir numpy types a tipos nativos de Python si es necesario
-            processed_data = []
-            for row in csv_data:
-                processed_row = {}
-                for key, value in row.items():
-                    # Convertir numpy types a tipos nativos
-                    if hasattr(value, 'item'):  # numpy types tienen el método .item()
-                        processed_row[key] = value.item()
+        csv_data = []
+        for row in csv.DictReader(io.StringIO(content.decode('utf-8'))):
+            # Convertir valores numéricos
+            processed_row = {}
+            for key, value in row.items():
+                try:
+                    if key in ['timestamp', 'recording_time', 'left_eye_x', 'left_eye_y', 
+                               'right_eye_x', 'right_eye_y', 'imu_x', 'imu_y', 'imu_z']:
+                        processed_row[key] = float(value)
+                    elif key in ['left_eye_detected', 'right_eye_detected']:
+                        processed_row[key] = value.lower() == 'true'
                     else:
                         processed_row[key] = value
-                processed_data.append(processed_row)
-            
-            # Usar StringIO para escribir texto CSV
-            csv_text_buffer = io.StringIO()
-            
-            # Escribir CSV como texto
-            fieldnames = processed_data[0].keys() if processed_data else []
-            writer = csv.DictWriter(csv_text_buffer, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(processed_data)
-            
-            # Obtener el texto CSV y convertir a bytes
-            csv_text = csv_text_buffer.getvalue()
-            csv_bytes = csv_text.encode('utf-8')
-            
-            # Crear TarInfo y agregar al tar
-            tarinfo = tarfile.TarInfo(name=filename)
-            tarinfo.size = len(csv_bytes)
-            tarinfo.mtime = int(time.time())
-            
-            tar.addfile(tarinfo, BytesIO(csv_bytes))
+                except ValueError:
+                    processed_row[key] = value
+            csv_data.append(processed_row)
+        return csv_data
+    
+    def _parse_imu_csv(self, content: bytes) -> Dict[str, Any]:
+        """Interpreta un CSV del stream IMU guardado por versiones anteriores"""
+        import csv
+        import io
+        import numpy as np
+        
+        reader = csv.reader(io.StringIO(content.decode('utf-8')))
+        header = next(reader, None)
+        if not header:
+            return {}
+        values = np.array([[float(v) if v else np.nan for v in row] for row in reader],
+                          dtype=np.float64).reshape(-1, len(header))
+        return {key: values[:, index] for index, key in enumerate(header)}
+    
+    def _read_metadata_from_siev(self, siev_path: str,
+                                 container: Optional[SievContainer] = None) -> Dict:
+        """
+        Lee el metadata JSON de un archivo .siev
+        
+        El JSON se interpreta una sola vez por versión del archivo (ruta,
+        mtime y tamaño); mientras el archivo no cambie se retorna una copia
+        de la caché. container permite reutilizar un .siev ya abierto.
+        """
+        try:
+            key = os.path.normcase(os.path.abspath(siev_path))
+            signature = _siev_signature(siev_path)
+            with _metadata_cache_guard:
+                cached = _metadata_cache.get(key)
+            if cached is not None and cached[0] == signature:
+                return _copy_json(cached[1])
             
-            print(f"CSV agregado al tar: {filename} ({len(processed_data)} filas)")
+            if container is not None:
+                metadata = self._parse_metadata(container)
+            else:
+                with SievContainer(siev_path) as container:
+                    metadata = self._parse_metadata(container)
             
+            with _metadata_cache_guard:
+                _metadata_cache[key] = (signature, metadata)
+            return _copy_json(metadata)
         except Exception as e:
-            print(f"Error agregando CSV al tar: {e}")
-            raise
-    
-    def _add_file_to_tar(self, tar: tarfile.TarFile, file_path: str, archive_name: str):
-        """Agrega un archivo existente al tar"""
-        tar.add(file_path, arcname=archive_name)
-    
-    def _copy_existing_content(self, source_siev: str, target_tar: tarfile.TarFile, 
-                             exclude: List[str] = None):
-        """Copia contenido existente de un .siev a otro, excluyendo archivos específicos"""
-        exclude = exclude or []
-        
-        with tarfile.open(source_siev, 'r:gz') as source_tar:
-            for member in source_tar.getmembers():
-                if member.name not in exclude:
-                    if member.isfile():
-                        file_data = source_tar.extractfile(member)
-                        target_tar.addfile(member, file_data)
-                    else:
-                        target_tar.addfile(member)
+            raise Exception(f"Error leyendo metadata: {e}")
     
-    def _read_metadata_from_siev(self, siev_path: str) -> Dict:
-        """Lee el metadata JSON de un archivo .siev"""
+    def _parse_metadata(self, container: SievContainer) -> Dict:
         try:
-            with tarfile.open(siev_path, 'r:gz') as tar:
-                try:
-                    # Intentar leer metadata principal
-                    metadata_file = tar.extractfile('metadata.json')
-                    metadata = json.load(metadata_file)
-                    return metadata
-                except:
-                    # Si falla, intentar backup
-                    backup_file = tar.extractfile('metadata_backup.json')
-                    metadata = json.load(backup_file)
-                    print("ADVERTENCIA: Usando archivo de backup de metadata")
-                    return metadata
+            # Intentar leer metadata principal
+            return json.loads(container.read('metadata.json'))
+        except:
+            # Si falla, intentar backup
+            metadata = json.loads(container.read('metadata_backup.json'))
+            print("ADVERTENCIA: Usando archivo de backup de metadata")
+            return metadata
+    
+    def _cache_metadata(self, siev_path: str, metadata: Dict):
+        """
+        Guarda en la caché la metadata recién escrita (evita releerla) y
+        actualiza el catálogo de expedientes
+        """
+        key = os.path.normcase(os.path.abspath(siev_path))
+        with _metadata_cache_guard:
+            _metadata_cache[key] = (_siev_signature(siev_path), _copy_json(metadata))
+        self._update_catalog(siev_path)
+    
+    def _update_catalog(self, siev_path: str):
+        """Reindexa un archivo en el catálogo (los errores no afectan al guardado)"""
+        if self.catalog is None:
+            return
+        try:
+            self.catalog.update_archive(siev_path)
         except Exception as e:
-            raise Exception(f"Error leyendo metadata: {e}")
+            print(f"Error actualizando catálogo: {e}")
     
     def list_user_sievs(self) -> List[str]:
         """
         Lista todos los archivos .siev en el directorio base
         
+        Con catálogo, solo se leen los archivos nuevos o modificados.
+        
         Returns:
-            Lista de nombres de archivos .siev
+            Lista de rutas de archivos .siev (más recientes primero)
         """
         try:
+            if self.catalog is not None:
+                self.catalog.sync(self.base_path)
+                return [entry['ruta'] for entry in self.catalog.list_archives(self.base_path)]
+            
             siev_files = []
             if os.path.exists(self.base_path):
                 for file in os.listdir(self.base_path):
@@ -560,8 +1184,37 @@ class SievManager:
         except Exception as e:
             print(f"Error listando archivos .siev: {e}")
             return []
+    
+    def search_patients(self, text: str = "", limit: int = 200) -> List[Dict]:
+        """
+        Busca expedientes por nombre o ID de paciente en el catálogo
         
-    # AGREGAR ESTE MÉTODO A LA CLASE SievManager:
+        Returns:
+            Expedientes (ruta, nombre, id_paciente, total_pruebas, ultima_prueba, ...)
+        """
+        if self.catalog is None:
+            return []
+        try:
+            self.catalog.sync(self.base_path)
+            return self.catalog.search_patients(text, limit)
+        except Exception as e:
+            print(f"Error buscando pacientes: {e}")
+            return []
+    
+    def get_patient_trend(self, metric: str, siev_path: str = None, patient_id: str = None,
+                          test_type: str = None, channel: str = None) -> List[Dict]:
+        """
+        Evolución de una métrica de análisis (p.ej. 'vcl_promedio') en las
+        pruebas de un expediente o de un paciente (ver SievCatalog.get_trend)
+        """
+        if self.catalog is None:
+            return []
+        try:
+            return self.catalog.get_trend(metric, siev_path=siev_path, patient_id=patient_id,
+                                          test_type=test_type, channel=channel)
+        except Exception as e:
+            print(f"Error consultando evolución de {metric}: {e}")
+            return []
 
     def extract_test_video_data(self, siev_path: str, test_id: str) -> bytes:
         """
@@ -579,21 +1232,14 @@ class SievManager:
                 print(f"Archivo .siev no encontrado: {siev_path}")
                 return None
             
-            with tarfile.open(siev_path, 'r:gz') as tar:
+            with SievContainer(siev_path) as container:
                 # Buscar archivo de video para la prueba
                 video_filename = f"videos/{test_id}.mp4"
                 
                 try:
-                    video_member = tar.getmember(video_filename)
-                    video_file = tar.extractfile(video_member)
-                    
-                    if video_file:
-                        video_data = video_file.read()
-                        print(f"Video extraído: {test_id} ({len(video_data)} bytes)")
-                        return video_data
-                    else:
-                        print(f"No se pudo extraer el archivo de video: {video_filename}")
-                        return None
+                    video_data = container.read(video_filename)
+                    print(f"Video extraído: {test_id} ({len(video_data)} bytes)")
+                    return video_data
                         
                 except KeyError:
                     print(f"Video no encontrado en .siev: {video_filename}")
@@ -618,14 +1264,8 @@ class SievManager:
             if not os.path.exists(siev_path):
                 return False
             
-            with tarfile.open(siev_path, 'r:gz') as tar:
-                video_filename = f"videos/{test_id}.mp4"
-                
-                try:
-                    tar.getmember(video_filename)
-                    return True
-                except KeyError:
-                    return False
+            with SievContainer(siev_path) as container:
+                return f"videos/{test_id}.mp4" in container
                     
         except Exception as e:
             print(f"Error verificando video en .siev: {e}")
@@ -646,20 +1286,94 @@ class SievManager:
             if not os.path.exists(siev_path):
                 return {}
             
-            with tarfile.open(siev_path, 'r:gz') as tar:
+            with SievContainer(siev_path) as container:
                 video_filename = f"videos/{test_id}.mp4"
                 
-                try:
-                    video_member = tar.getmember(video_filename)
-                    return {
-                        'filename': video_filename,
-                        'size_bytes': video_member.size,
-                        'size_mb': round(video_member.size / (1024 * 1024), 2),
-                        'modified_time': video_member.mtime
-                    }
-                except KeyError:
+                video_member = container.info(video_filename)
+                if video_member is None:
                     return {}
+                return {
+                    'filename': video_filename,
+                    'size_bytes': video_member['size'],
+                    'size_mb': round(video_member['size'] / (1024 * 1024), 2),
+                    'modified_time': video_member['mtime']
+                }
                     
         except Exception as e:
             print(f"Error obteniendo info de video: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+    def get_test_video_path(self, siev_path: str, test_id: str) -> Optional[str]:
+        """
+        Ruta de un archivo con el video de una prueba, para abrirlo directo
+        con OpenCV sin cargarlo en memoria
+        
+        El video se copia por bloques desde el .siev a una caché persistente
+        (una entrada por prueba y versión del video); las siguientes aperturas
+        usan el archivo ya extraído.
+        
+        Args:
+            siev_path: Ruta al archivo .siev
+            test_id: ID de la prueba
+            
+        Returns:
+            Ruta del video, o None si la prueba no tiene video
+        """
+        import shutil
+        
+        try:
+            if not os.path.exists(siev_path):
+                return None
+            
+            with SievContainer(siev_path) as container:
+                video_filename = f"videos/{test_id}.mp4"
+                info = container.info(video_filename)
+                if info is None:
+                    return None
+                
+                # La clave cambia si el video de la prueba se reemplaza
+                siev_key = hashlib.sha1(os.path.abspath(siev_path).encode('utf-8')).hexdigest()[:12]
+                version = info['crc32'] if info['crc32'] is not None else int(info['mtime'])
+                cached_path = os.path.join(
+                    self.video_cache_path, f"{siev_key}_{test_id}_{version:08x}_{info['size']}.mp4")
+                
+                if os.path.exists(cached_path) and os.path.getsize(cached_path) == info['size']:
+                    os.utime(cached_path)
+                    return cached_path
+                
+                os.makedirs(self.video_cache_path, exist_ok=True)
+                temp_path = cached_path + "_temp"
+                with container.open(video_filename) as source, open(temp_path, 'wb') as dest:
+                    shutil.copyfileobj(source, dest, 1024 * 1024)
+                os.replace(temp_path, cached_path)
+            
+            print(f"Video extraído a caché: {test_id} ({info['size']} bytes)")
+            self._trim_video_cache(keep=cached_path)
+            return cached_path
+            
+        except Exception as e:
+            print(f"Error preparando video de .siev: {e}")
+            return None
+
+    def _trim_video_cache(self, keep: str = None):
+        """Borra los videos menos usados si la caché supera VIDEO_CACHE_MAX_BYTES"""
+        try:
+            entries = []
+            for name in os.listdir(self.video_cache_path):
+                path = os.path.join(self.video_cache_path, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+            
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= VIDEO_CACHE_MAX_BYTES:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass  # En uso por el reproductor
+        except Exception as e:
+            print(f"Error limpiando caché de videos: {e}")
@@ -281,6 +281,14 @@ class VideoRecorder:
                 'tipo': 'video_update',
             }            
             
+            # Guardar en segundo plano: la cola borra el temporal al terminar
+            save_queue = getattr(self.main_window, 'siev_save_queue', None)
+            if save_queue is not None and save_queue.isRunning():
+                save_queue.enqueue(siev_path, test_data, video_path=video_path,
+                                   cleanup=[video_path])
+                print(f"Video encolado para guardar en .siev: {current_test_id}")
+                return True
+            
             # Agregar video al .siev
             success = siev_manager.add_test_to_siev(
                 siev_path, 
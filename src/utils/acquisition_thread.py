@@ -0,0 +1,348 @@
+from PySide6.QtCore import QThread, Signal
+import math
+import queue
+import threading
+import time
+
+try:
+    from utils.imu_timeline import ImuTimeline, parse_imu_line
+except ImportError:
+    from imu_timeline import ImuTimeline, parse_imu_line
+
+
+class EyeAcquisitionThread(QThread):
+    """
+    Hilo de adquisición de muestras oculares independiente de la GUI.
+
+    Recibe las posiciones de pupila directamente del VideoThread y los valores
+    del IMU directamente del SerialReadThread (conexiones directas, sin pasar
+    por el event loop de la GUI). Aplica la calibración, almacena las muestras
+    en DataStorage y publica lotes para los gráficos.
+    """
+
+    # Lote de puntos para gráficos: [(left, right, imu_x, imu_y, graph_time), ...]
+    samples_ready = Signal(list)
+    # Lote de VCL [(graph_time, vcl), ...] y culminaciones por fase
+    spv_ready = Signal(list, dict)
+    # Impulsos cefálicos completados [dict, ...] (ver HeadImpulseEngine)
+    vhit_ready = Signal(list)
+
+    # Muestras del IMU usadas para interpolar un lote en vivo (5 s a 50 Hz)
+    IMU_RECENT_SAMPLES = 250
+    # Segundos que una muestra ocular espera al IMU antes de descartarse para vHIT
+    VHIT_PENDING_MAX_AGE = 1.0
+
+    def __init__(self, data_storage, calibration_manager=None,
+                 graph_interval_ms=50, publish_interval_ms=50):
+        """
+        Args:
+            data_storage: DataStorage donde se guardan las muestras durante la grabación
+            calibration_manager: CalibrationManager para convertir píxeles a grados
+            graph_interval_ms: Separación mínima entre puntos enviados al gráfico
+            publish_interval_ms: Cada cuánto se publica un lote a la UI
+        """
+        super().__init__()
+        self.data_storage = data_storage
+        self.calibration_manager = calibration_manager
+        self.graph_interval = graph_interval_ms / 1000.0
+        self.publish_interval = publish_interval_ms / 1000.0
+
+        self._queue = queue.SimpleQueue()
+        self._running = True
+
+        # Último valor del IMU (escrito desde el hilo serial)
+        self.imu_values = [0.0, 0.0, 0.0]
+        # Historial del IMU con tiempo del host, para interpolar sobre las muestras oculares
+        self.imu_timeline = ImuTimeline()
+
+        # Estado controlado desde la ventana principal
+        self.active = False        # Enviar datos al gráfico
+        self.recording = False     # Almacenar muestras en DataStorage
+        self.time_origin = None    # Tiempo de captura que corresponde a graph_time = 0
+
+        self._graph_batch = []
+        self._graph_capture_times = []
+        self._last_graph_time = None
+
+        # Estimador de VCL opcional (SlowPhaseVelocityEstimator)
+        self.spv_estimator = None
+        self.spv_eye = 'right'
+        self.spv_axis = 0
+        self._spv_batch = []
+
+        # Motor vHIT opcional (HeadImpulseEngine); procesa solo muestras ya cubiertas por el IMU
+        self.vhit_engine = None
+        self.vhit_eye = 'right'
+        self.vhit_axis = 0
+        self._vhit_pending = []    # [(capture_time, posición ocular)]
+        self._vhit_batch = []
+        self._last_publish_time = 0.0
+        self.total_samples = 0
+
+    # ------------------------------------------------------------------
+    # Entradas (se llaman desde los hilos productores)
+    # ------------------------------------------------------------------
+
+    def push_positions(self, pupil_positions, gray_frame=None):
+        """Slot para VideoThread.positions_ready (conexión directa)."""
+        self._queue.put((time.time(), pupil_positions))
+
+    def push_imu_data(self, data):
+        """Slot para SerialReadThread.data_received (conexión directa)."""
+        receive_time = time.time()
+        try:
+            sample = parse_imu_line(data)
+            if sample is None:
+                return
+            device_time, values = sample
+            self.imu_timeline.add(values, receive_time, device_time)
+            self.imu_values = list(values[:3])
+        except Exception as e:
+            print(f"Error procesando datos IMU en adquisición: {e}")
+
+    # ------------------------------------------------------------------
+    # Control de estado
+    # ------------------------------------------------------------------
+
+    def start_session(self, time_origin, recording=False):
+        """
+        Comienza a enviar datos al gráfico.
+
+        El cambio de estado viaja por la misma cola que las muestras, así que
+        se aplica exactamente entre las muestras capturadas antes y después.
+
+        Args:
+            time_origin: time.time() que corresponde a graph_time = 0
+                         (en el futuro durante la fase de calibración)
+            recording: Si las muestras deben almacenarse
+        """
+        self._queue.put(('session', (time_origin, recording)))
+
+    def stop_session(self, timeout=1.0):
+        """
+        Deja de almacenar y de enviar datos al gráfico.
+
+        Bloquea hasta que se procesen las muestras capturadas antes de la
+        llamada, para que DataStorage quede completo antes de cerrarlo; si
+        tarda más de timeout segundos lo avisa y sigue esperando mientras el
+        hilo esté vivo.
+
+        Returns:
+            True si todas las muestras previas quedaron procesadas
+        """
+        done = threading.Event()
+        self._queue.put(('stop', done))
+        if done.wait(timeout) or not self.isRunning():
+            return done.is_set()
+
+        print(f"ADVERTENCIA: Adquisición con {self._queue.qsize()} muestras pendientes "
+              f"después de {timeout:.1f}s, esperando a que se procesen")
+        while not done.wait(timeout):
+            if not self.isRunning():
+                print("ERROR: El hilo de adquisición terminó sin procesar las muestras pendientes")
+                return False
+        return True
+
+    def set_spv_estimator(self, estimator, eye='right', axis=0):
+        """
+        Calcula la VCL en este hilo con todas las muestras (sin decimar).
+
+        Args:
+            estimator: SlowPhaseVelocityEstimator, o None para desactivar
+            eye: 'left' o 'right'
+            axis: 0 = horizontal, 1 = vertical
+        """
+        self._queue.put(('spv', (estimator, eye, axis)))
+
+    def set_spv_phase_config(self, phase_config):
+        """
+        Actualiza las fases del estimador de VCL de este hilo (culminaciones).
+
+        Se aplica en orden con las muestras, sin tocar el estimador desde la GUI.
+        """
+        phase_config = {name: dict(phase) for name, phase in (phase_config or {}).items()}
+        self._queue.put(('spv_phases', phase_config))
+
+    def reset_spv_estimator(self):
+        """Reinicia el estimador de VCL de este hilo, en orden con las muestras."""
+        self._queue.put(('spv_reset', None))
+
+    def set_vhit_engine(self, engine, eye='right', axis=0):
+        """
+        Analiza impulsos cefálicos en este hilo con todas las muestras.
+
+        Args:
+            engine: HeadImpulseEngine, o None para desactivar
+            eye: 'left' o 'right'
+            axis: 0 = horizontal, 1 = vertical
+        """
+        self._queue.put(('vhit', (engine, eye, axis)))
+
+    def _apply_command(self, command, payload):
+        """Aplica un cambio de estado recibido por la cola."""
+        if command == 'session':
+            self.time_origin, self.recording = payload
+            self._last_graph_time = None
+            self.active = True
+            if self.spv_estimator is not None:
+                self.spv_estimator.reset()
+            if self.vhit_engine is not None:
+                self.vhit_engine.reset()
+            self._vhit_pending = []
+        elif command == 'spv':
+            self.spv_estimator, self.spv_eye, self.spv_axis = payload
+        elif command == 'spv_phases':
+            if self.spv_estimator is not None:
+                self.spv_estimator.set_phase_config(payload)
+        elif command == 'spv_reset':
+            if self.spv_estimator is not None:
+                self.spv_estimator.reset()
+            self._spv_batch = []
+        elif command == 'vhit':
+            self.vhit_engine, self.vhit_eye, self.vhit_axis = payload
+            self._vhit_pending = []
+        elif command == 'stop':
+            if self.recording:
+                # Reemplazar el IMU retenido por el interpolado en cada muestra
+                self.data_storage.align_imu(self.imu_timeline)
+            if self.vhit_engine is not None:
+                # Entregar el último impulso aunque su ventana posterior esté incompleta
+                if self._vhit_pending:
+                    self._process_vhit()
+                self._vhit_batch.extend(self.vhit_engine.flush())
+            self.active = False
+            self.recording = False
+            self.time_origin = None
+            self._publish_if_due(force=True)
+            payload.set()
+
+    # ------------------------------------------------------------------
+    # Bucle principal
+    # ------------------------------------------------------------------
+
+    def run(self):
+        while self._running:
+            try:
+                first, second = self._queue.get(timeout=self.publish_interval)
+                if isinstance(first, str):
+                    self._apply_command(first, second)
+                else:
+                    self._process_sample(first, second)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"Error en EyeAcquisitionThread: {e}")
+
+            self._publish_if_due()
+
+        self._publish_if_due(force=True)
+
+    def _process_sample(self, capture_time, pupil_positions):
+        """Convierte, almacena y encola para gráfico una muestra."""
+        if not self.active or self.time_origin is None:
+            return
+
+        left_eye = pupil_positions[1] if len(pupil_positions) > 1 else None
+        right_eye = pupil_positions[0] if len(pupil_positions) > 0 else None
+
+        # Aplicar calibración si está disponible
+        calibration = self.calibration_manager
+        if calibration and calibration.is_calibrated:
+            left_eye, right_eye = calibration.convert_to_degrees(left_eye, right_eye)
+
+        imu_x = float(self.imu_values[0])
+        imu_y = float(self.imu_values[1])
+
+        if self.recording:
+            self.data_storage.add_data_point(left_eye, right_eye, imu_x, imu_y, capture_time)
+            self.total_samples += 1
+
+        graph_time = capture_time - self.time_origin
+        if self._last_graph_time is None or graph_time - self._last_graph_time >= self.graph_interval:
+            self._graph_batch.append((left_eye, right_eye, imu_x, imu_y, graph_time))
+            self._graph_capture_times.append(capture_time)
+            self._last_graph_time = graph_time
+
+        if self.spv_estimator is not None:
+            eye = left_eye if self.spv_eye == 'left' else right_eye
+            position = eye[self.spv_axis] if eye is not None else None
+            self._spv_batch.extend(self.spv_estimator.add_sample(graph_time, position))
+
+        if self.vhit_engine is not None and self.imu_timeline.last_time > -math.inf:
+            # Sin IMU no hay impulsos que medir: no acumular muestras
+            eye = left_eye if self.vhit_eye == 'left' else right_eye
+            self._vhit_pending.append((capture_time, eye[self.vhit_axis] if eye is not None else math.nan))
+
+    def _publish_if_due(self, force=False):
+        """Publica el lote acumulado a la UI si pasó el intervalo."""
+        now = time.time()
+        if not self._graph_batch and not self._spv_batch and not self._vhit_pending and not self._vhit_batch:
+            return
+        if force or now - self._last_publish_time >= self.publish_interval:
+            self._last_publish_time = now
+            if self._vhit_pending:
+                self._process_vhit()
+            if self._graph_batch:
+                batch = self._align_graph_batch(self._graph_batch, self._graph_capture_times)
+                self._graph_batch = []
+                self._graph_capture_times = []
+                self.samples_ready.emit(batch)
+            if self._spv_batch:
+                spv_batch = self._spv_batch
+                self._spv_batch = []
+                self.spv_ready.emit(spv_batch, dict(self.spv_estimator.culminations)
+                                    if self.spv_estimator is not None else {})
+            if self._vhit_batch:
+                vhit_batch = self._vhit_batch
+                self._vhit_batch = []
+                self.vhit_ready.emit(vhit_batch)
+
+    def _process_vhit(self):
+        """
+        Pasa al motor vHIT las muestras que el IMU ya cubre.
+
+        El IMU llega con algo de retraso respecto a la cámara; las muestras
+        posteriores a la última del IMU esperan al siguiente lote para no
+        interpolar la cabeza con un valor retenido; si el IMU deja de llegar,
+        las que esperan más de VHIT_PENDING_MAX_AGE se descartan.
+        """
+        engine = self.vhit_engine
+        if engine is None:
+            self._vhit_pending = []
+            return
+
+        pending = self._vhit_pending
+        oldest_allowed = pending[-1][0] - self.VHIT_PENDING_MAX_AGE
+        if pending[0][0] < oldest_allowed:
+            stale = 0
+            while pending[stale][0] < oldest_allowed:
+                stale += 1
+            self._vhit_pending = pending[stale:]
+
+        last_imu_time = self.imu_timeline.last_time
+        ready = 0
+        while ready < len(self._vhit_pending) and self._vhit_pending[ready][0] <= last_imu_time:
+            ready += 1
+        if ready == 0:
+            return
+
+        samples = self._vhit_pending[:ready]
+        self._vhit_pending = self._vhit_pending[ready:]
+        times, positions = zip(*samples)
+        head = self.imu_timeline.interpolate(times, columns=(self.vhit_axis,),
+                                             recent=self.IMU_RECENT_SAMPLES)
+        if head is None:
+            return
+        self._vhit_batch.extend(engine.add_positions(times, head[:, 0], positions))
+
+    def _align_graph_batch(self, batch, capture_times):
+        """Reemplaza el IMU retenido del lote por el interpolado en cada tiempo de captura."""
+        aligned = self.imu_timeline.interpolate(capture_times, recent=self.IMU_RECENT_SAMPLES)
+        if aligned is None:
+            return batch
+        return [(left, right, imu_x, imu_y, graph_time)
+                for (left, right, _, _, graph_time), (imu_x, imu_y) in zip(batch, aligned.tolist())]
+
+    def stop(self):
+        self._running = False
+        self.wait()
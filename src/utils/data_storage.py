@@ -11,6 +11,13 @@ from typing import List, Dict, Optional, Any
 import json
 import os
 
+import numpy as np
+
+try:
+    from utils.imu_timeline import IMU_COLUMNS, align_imu_to_eye
+except ImportError:
+    from imu_timeline import IMU_COLUMNS, align_imu_to_eye
+
 
 class DataStorage:
     """
@@ -53,6 +60,9 @@ class DataStorage:
             'version': '1.0'
         }
         
+        # Stream crudo del IMU de la grabación: {'timestamp': array, 'angle_x': array, ...}
+        self.imu_stream = None
+        
         # Lock para thread safety
         self.data_lock = threading.Lock()
         
@@ -97,6 +107,7 @@ class DataStorage:
         with self.data_lock:
             self.complete_dataset.clear()
             self.write_buffer.clear()
+            self.imu_stream = None
         
         # Configurar metadatos
         self.recording_metadata = {
@@ -160,6 +171,44 @@ class DataStorage:
         with self.data_lock:
             self.complete_dataset.append(data_point)
     
+    def align_imu(self, imu_timeline) -> bool:
+        """
+        Realinea imu_x / imu_y / imu_z de las muestras grabadas con el IMU.
+        
+        Durante la grabación cada muestra ocular guarda el último valor del IMU
+        recibido; aquí se reemplaza por la interpolación en su tiempo de
+        captura (una sola pasada vectorizada) y se conserva el stream crudo.
+        
+        Args:
+            imu_timeline: ImuTimeline con las muestras del IMU de la sesión
+            
+        Returns:
+            True si se realineó
+        """
+        with self.data_lock:
+            if not self.complete_dataset:
+                return False
+            
+            eye_times = np.fromiter((p['timestamp'] for p in self.complete_dataset),
+                                    dtype=np.float64, count=len(self.complete_dataset))
+            imu_times, imu_values = imu_timeline.get_range(eye_times[0], eye_times[-1])
+            if len(imu_times) < 2:
+                return False
+            
+            aligned = align_imu_to_eye(eye_times, imu_times, imu_values[:, :3],
+                                       angle_columns=(0, 1, 2))
+            for point, (imu_x, imu_y, imu_z) in zip(self.complete_dataset, aligned.tolist()):
+                point['imu_x'] = imu_x
+                point['imu_y'] = imu_y
+                point['imu_z'] = imu_z
+            
+            self.imu_stream = {'timestamp': imu_times}
+            for index, column in enumerate(IMU_COLUMNS):
+                self.imu_stream[column] = imu_values[:, index]
+        
+        print(f"IMU realineado: {len(imu_times)} muestras IMU sobre {len(eye_times)} muestras oculares")
+        return True
+    
     def get_test_data(self):
         """
         Obtener todos los datos de la prueba para envío a SievManager
@@ -195,6 +244,7 @@ class DataStorage:
                 'left_eye_detection_rate': left_detection_rate,
                 'right_eye_detection_rate': right_detection_rate,
                 'data': self.complete_dataset.copy(),  # Copia para seguridad
+                'imu_stream': self.imu_stream,
                 'metadata': self.recording_metadata.copy(),
                 'statistics': {
                     'duration_seconds': duration,
@@ -287,6 +337,7 @@ class DataStorage:
         with self.data_lock:
             self.complete_dataset.clear()
             self.write_buffer.clear()
+            self.imu_stream = None
             print("Datos limpiados de memoria")
     
     def is_recording_active(self):
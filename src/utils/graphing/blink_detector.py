@@ -4,10 +4,74 @@ from typing import List, Dict, Tuple, Optional
 import time
 
 
+class BlinkRegionStore:
+    """
+    Regiones de parpadeo de un ojo en arrays NumPy ordenados.
+
+    Los parpadeos de un ojo llegan en orden y no se solapan, así que tanto
+    los inicios como los finales quedan ordenados y la consulta de una
+    ventana visible es una búsqueda binaria sobre cada array.
+    """
+
+    def __init__(self, initial_capacity: int = 256):
+        self._starts = np.empty(initial_capacity)
+        self._ends = np.empty(initial_capacity)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self._starts[:self._size]
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self._ends[:self._size]
+
+    def extend(self, starts: np.ndarray, ends: np.ndarray):
+        """Añade regiones (ya en orden cronológico)."""
+        count = len(starts)
+        if count == 0:
+            return
+        required = self._size + count
+        if required > len(self._starts):
+            capacity = max(required, 2 * len(self._starts))
+            self._starts = np.resize(self._starts, capacity)
+            self._ends = np.resize(self._ends, capacity)
+        self._starts[self._size:required] = starts
+        self._ends[self._size:required] = ends
+        self._size = required
+
+    def query(self, start_time: float, end_time: float,
+              max_regions: Optional[int] = None) -> List[Tuple]:
+        """
+        Regiones que intersectan [start_time, end_time], las más recientes
+        si hay más de max_regions. O(log n + k).
+        """
+        first = int(np.searchsorted(self.ends, start_time, side='left'))
+        last = int(np.searchsorted(self.starts, end_time, side='right'))
+        if max_regions is not None:
+            first = max(first, last - max_regions)
+        if first >= last:
+            return []
+        return list(zip(self._starts[first:last].tolist(), self._ends[first:last].tolist()))
+
+    def to_list(self) -> List[Tuple]:
+        return list(zip(self.starts.tolist(), self.ends.tolist()))
+
+    def clear(self):
+        self._size = 0
+
+
 class OptimizedBlinkDetector:
     """
     Detector de parpadeos optimizado que procesa los datos por lotes
     en lugar de punto por punto para máximo rendimiento.
+
+    Cada lote se resuelve por longitud de rachas sobre los flags de
+    detección (transiciones visible/no visible con np.diff) y las regiones se
+    guardan en un BlinkRegionStore por ojo.
     """
     
     def __init__(self, max_history_size=5000):
@@ -23,8 +87,7 @@ class OptimizedBlinkDetector:
         self.timestamp_history = deque(maxlen=max_history_size)
         
         # Regiones de parpadeo detectadas
-        self.left_blink_regions = []
-        self.right_blink_regions = []
+        self.regions = {'left': BlinkRegionStore(), 'right': BlinkRegionStore()}
         
         # Estado actual de parpadeo
         self.left_blinking = False
@@ -47,9 +110,18 @@ class OptimizedBlinkDetector:
         
         # Cache de regiones visibles
         self._cached_visible_regions = None
+        self._cache_key = None
         self._cache_timestamp = 0
         self._cache_duration = 0.1  # 100ms
     
+    @property
+    def left_blink_regions(self) -> List[Tuple]:
+        return self.regions['left'].to_list()
+    
+    @property
+    def right_blink_regions(self) -> List[Tuple]:
+        return self.regions['right'].to_list()
+    
     def add_data_point(self, left_eye_visible: bool, right_eye_visible: bool, timestamp: float):
         """
         Añade un punto de datos al buffer de procesamiento.
@@ -70,24 +142,55 @@ class OptimizedBlinkDetector:
         if len(self.processing_buffer) >= self.batch_size:
             self.process_batch()
     
+    def add_data_batch(self, left_visible, right_visible, timestamps):
+        """
+        Procesa directamente un lote de flags de detección.
+        
+        Args:
+            left_visible: Array/lista de bool del ojo izquierdo
+            right_visible: Array/lista de bool del ojo derecho
+            timestamps: Marcas de tiempo crecientes
+        """
+        # Respetar el orden con lo que haya pendiente punto a punto
+        if self.processing_buffer:
+            self.process_batch()
+        self._process_arrays(np.asarray(left_visible, dtype=bool),
+                             np.asarray(right_visible, dtype=bool),
+                             np.asarray(timestamps, dtype=np.float64))
+    
     def process_batch(self):
         """Procesa un lote completo de datos de manera eficiente."""
         if not self.processing_buffer:
             return
         
-        start_time = time.time()
-        
-        # Procesar cada punto del lote
-        for data_point in self.processing_buffer:
-            self._process_single_point(
-                data_point['left_visible'],
-                data_point['right_visible'], 
-                data_point['timestamp']
-            )
+        count = len(self.processing_buffer)
+        left = np.fromiter((p['left_visible'] for p in self.processing_buffer), dtype=bool, count=count)
+        right = np.fromiter((p['right_visible'] for p in self.processing_buffer), dtype=bool, count=count)
+        timestamps = np.fromiter((p['timestamp'] for p in self.processing_buffer),
+                                 dtype=np.float64, count=count)
         
         # Limpiar buffer
         self.processing_buffer.clear()
         
+        self._process_arrays(left, right, timestamps)
+    
+    def _process_arrays(self, left: np.ndarray, right: np.ndarray, timestamps: np.ndarray):
+        """Procesa un lote de ambos ojos y actualiza historial y estadísticas."""
+        if len(timestamps) == 0:
+            return
+        
+        start_time = time.time()
+        
+        # Añadir a historial
+        self.left_eye_history.extend(left.tolist())
+        self.right_eye_history.extend(right.tolist())
+        self.timestamp_history.extend(timestamps.tolist())
+        
+        self.left_blinking, self.left_blink_start = self._process_eye_runs(
+            left, timestamps, 'left', self.left_blinking, self.left_blink_start)
+        self.right_blinking, self.right_blink_start = self._process_eye_runs(
+            right, timestamps, 'right', self.right_blinking, self.right_blink_start)
+        
         # Actualizar estadísticas de performance
         processing_time = time.time() - start_time
         self.processing_times.append(processing_time)
@@ -96,76 +199,43 @@ class OptimizedBlinkDetector:
         # Invalidar cache
         self._cached_visible_regions = None
     
-    def _process_single_point(self, left_visible: bool, right_visible: bool, timestamp: float):
+    def _process_eye_runs(self, visible: np.ndarray, timestamps: np.ndarray, eye: str,
+                          blinking: bool, blink_start: Optional[float]) -> Tuple[bool, Optional[float]]:
         """
-        Procesa un punto individual de datos.
+        Detecta los parpadeos de un ojo en un lote por longitud de rachas.
         
         Args:
-            left_visible: Estado del ojo izquierdo
-            right_visible: Estado del ojo derecho
-            timestamp: Marca de tiempo
-        """
-        # Añadir a historial
-        self.left_eye_history.append(left_visible)
-        self.right_eye_history.append(right_visible)
-        self.timestamp_history.append(timestamp)
-        
-        # Procesar ojo izquierdo
-        self._process_eye_state(
-            left_visible, timestamp, 'left',
-            self.left_blinking, self.left_blink_start,
-            self.left_blink_regions
-        )
-        
-        # Procesar ojo derecho
-        self._process_eye_state(
-            right_visible, timestamp, 'right',
-            self.right_blinking, self.right_blink_start,
-            self.right_blink_regions
-        )
-    
-    def _process_eye_state(self, is_visible: bool, timestamp: float, eye: str,
-                          currently_blinking: bool, blink_start: Optional[float],
-                          blink_regions: List[Tuple]):
-        """
-        Procesa el estado de un ojo específico.
-        
-        Args:
-            is_visible: Si el ojo está visible
-            timestamp: Marca de tiempo actual
+            visible: Flags de detección del lote
+            timestamps: Marcas de tiempo del lote
             eye: 'left' o 'right'
-            currently_blinking: Estado actual de parpadeo
-            blink_start: Tiempo de inicio del parpadeo actual
-            blink_regions: Lista de regiones de parpadeo
-        """
-        if not is_visible and not currently_blinking:
-            # Inicio de parpadeo
-            if eye == 'left':
-                self.left_blinking = True
-                self.left_blink_start = timestamp
-            else:
-                self.right_blinking = True
-                self.right_blink_start = timestamp
-                
-        elif is_visible and currently_blinking:
-            # Fin de parpadeo
-            blink_start = self.left_blink_start if eye == 'left' else self.right_blink_start
-            
-            if blink_start is not None:
-                duration = timestamp - blink_start
-                
-                # Validar duración del parpadeo
-                if self.min_blink_duration <= duration <= self.max_blink_duration:
-                    blink_regions.append((blink_start, timestamp))
-                    self.total_blinks_detected[eye] += 1
+            blinking: Si había un parpadeo en curso al terminar el lote anterior
+            blink_start: Inicio del parpadeo en curso
             
-            # Resetear estado
-            if eye == 'left':
-                self.left_blinking = False
-                self.left_blink_start = None
-            else:
-                self.right_blinking = False
-                self.right_blink_start = None
+        Returns:
+            Estado (parpadeando, inicio) al terminar el lote
+        """
+        # Transiciones respecto al último estado: -1 cierre del ojo, +1 apertura
+        previous = np.int8(0 if blinking else 1)
+        edges = np.diff(visible.astype(np.int8), prepend=previous)
+        start_times = timestamps[edges == -1]
+        end_times = timestamps[edges == 1]
+        
+        if blinking:
+            start_times = np.concatenate(([blink_start], start_times))
+        
+        # Una racha abierta al final queda en curso para el próximo lote
+        closed = len(end_times)
+        blinking = len(start_times) > closed
+        blink_start = float(start_times[-1]) if blinking else None
+        
+        start_times = start_times[:closed]
+        durations = end_times - start_times
+        valid = (durations >= self.min_blink_duration) & (durations <= self.max_blink_duration)
+        if valid.any():
+            self.regions[eye].extend(start_times[valid], end_times[valid])
+            self.total_blinks_detected[eye] += int(valid.sum())
+        
+        return blinking, blink_start
     
     def get_blink_regions(self, current_time: Optional[float] = None) -> Tuple[List[Tuple], List[Tuple]]:
         """
@@ -181,8 +251,8 @@ class OptimizedBlinkDetector:
         if self.processing_buffer:
             self.process_batch()
         
-        left_regions = self.left_blink_regions.copy()
-        right_regions = self.right_blink_regions.copy()
+        left_regions = self.regions['left'].to_list()
+        right_regions = self.regions['right'].to_list()
         
         # Añadir parpadeos en curso si hay tiempo actual
         if current_time is not None:
@@ -207,38 +277,25 @@ class OptimizedBlinkDetector:
         Returns:
             Tupla con regiones visibles (izquierdo, derecho)
         """
+        # Procesar datos pendientes si los hay
+        if self.processing_buffer:
+            self.process_batch()
+        
         # Verificar cache
         cache_key = (start_time, end_time, max_regions)
         current_time = time.time()
         
-        if (self._cached_visible_regions is not None and 
+        if (self._cached_visible_regions is not None and cache_key == self._cache_key and
             current_time - self._cache_timestamp < self._cache_duration):
             return self._cached_visible_regions
         
-        # Obtener todas las regiones
-        left_all, right_all = self.get_blink_regions()
-        
-        # Filtrar por ventana de tiempo
-        left_visible = [
-            (start, end) for start, end in left_all
-            if not (end < start_time or start > end_time)  # Hay intersección
-        ]
-        
-        right_visible = [
-            (start, end) for start, end in right_all
-            if not (end < start_time or start > end_time)  # Hay intersección
-        ]
-        
-        # Limitar número de regiones
-        if len(left_visible) > max_regions:
-            left_visible = left_visible[-max_regions:]
-        
-        if len(right_visible) > max_regions:
-            right_visible = right_visible[-max_regions:]
+        # Búsqueda binaria en cada ojo
+        result = (self.regions['left'].query(start_time, end_time, max_regions),
+                  self.regions['right'].query(start_time, end_time, max_regions))
         
         # Actualizar cache
-        result = (left_visible, right_visible)
         self._cached_visible_regions = result
+        self._cache_key = cache_key
         self._cache_timestamp = current_time
         
         return result
@@ -282,8 +339,8 @@ class OptimizedBlinkDetector:
         self.left_eye_history.clear()
         self.right_eye_history.clear()
         self.timestamp_history.clear()
-        self.left_blink_regions.clear()
-        self.right_blink_regions.clear()
+        self.regions['left'].clear()
+        self.regions['right'].clear()
         self.processing_buffer.clear()
         
         # Resetear estado
@@ -368,8 +425,8 @@ class OptimizedBlinkDetector:
             Diccionario con todos los datos de parpadeos
         """
         return {
-            'left_blink_regions': self.left_blink_regions.copy(),
-            'right_blink_regions': self.right_blink_regions.copy(),
+            'left_blink_regions': self.left_blink_regions,
+            'right_blink_regions': self.right_blink_regions,
             'statistics': self.get_blink_statistics(),
             'current_state': self.get_current_blink_state(),
             'configuration': {
@@ -4,10 +4,22 @@ import pyqtgraph as pg
 import numpy as np
 from PySide6.QtWidgets import QWidget, QVBoxLayout
 from PySide6.QtCore import Signal, QTimer
-from PySide6.QtGui import QColor
+from PySide6.QtGui import QColor, QGuiApplication
 import time
 from typing import Optional, List, Dict, Any
 
+# Importar el buffer circular y el estimador de VCL
+try:
+    from ..optimized_buffer import RingBuffer
+    from ..spv_estimator import SlowPhaseVelocityEstimator
+except ImportError:
+    try:
+        from utils.optimized_buffer import RingBuffer
+        from utils.spv_estimator import SlowPhaseVelocityEstimator
+    except ImportError:
+        from optimized_buffer import RingBuffer
+        from spv_estimator import SlowPhaseVelocityEstimator
+
 class CaloricPlotWidget(QWidget):
     """
     Widget de gráfico especializado para pruebas calóricas.
@@ -17,11 +29,14 @@ class CaloricPlotWidget(QWidget):
     - Autoscale controlado
     - Áreas sombreadas configurables para fases del test
     - Línea vertical móvil sincronizada con video
+    - Buffer circular NumPy con redibujado limitado al refresco de pantalla
+    - VCL en tiempo real con culminación por fase
     """
     
     # Señales
     time_position_changed = Signal(float)  # Cuando se mueve la línea manualmente
     phase_config_changed = Signal(dict)    # Cuando cambia la configuración de fases
+    culminations_changed = Signal(dict)    # Culminación (máxima |VCL|) por fase
     
     # Configuración DEFAULT de fases calóricas (en segundos)
     DEFAULT_PHASE_CONFIG = {
@@ -30,13 +45,25 @@ class CaloricPlotWidget(QWidget):
         'fixation': {'start': 90, 'end': 100, 'color': (150, 255, 150, 80), 'label': 'Fijación'}
     }
     
+    # Frecuencia máxima de muestreo esperada para dimensionar el buffer
+    MAX_SAMPLE_RATE = 200
+    # Puntos máximos enviados a la curva (decimación min/max)
+    MAX_DISPLAY_POINTS = 2000
+    
     def __init__(self, parent=None, total_duration=120, phase_config=None):
         super().__init__(parent)
         
         # Configuración
         self.total_duration = total_duration  # Duración total en segundos
         self.current_video_time = 0.0
-        self.data_buffer = []
+        self.data_buffer = RingBuffer(self._buffer_capacity(total_duration), columns=2)
+        
+        # Redibujado coalescido: muchos add_data_point -> un setData por refresco
+        self._redraw_pending = False
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(self._display_refresh_interval_ms())
+        self.redraw_timer.timeout.connect(self._redraw_curve)
         
         # Configuración de fases (usar default o personalizada)
         self.phase_config = phase_config.copy() if phase_config else self.DEFAULT_PHASE_CONFIG.copy()
@@ -45,11 +72,18 @@ class CaloricPlotWidget(QWidget):
         self.phase_regions = {}
         self.phase_text_items = {}
         
+        # Culminaciones por fase {'fase': {'time': s, 'spv': °/s}}
+        self.culminations = {}
+        self.culmination_text_items = {}
+        self.spv_estimator = None
+        self.spv_acquisition_thread = None  # Hilo donde corre el estimador, si corre fuera de la GUI
+        
         # Setup UI
         self.setup_ui()
         self.setup_plot()
         self.setup_phases()
         self.setup_video_line()
+        self.setup_culmination_markers()
         
         print(f"CaloricPlotWidget inicializado para {total_duration}s")
         print(f"Fases configuradas: {list(self.phase_config.keys())}")
@@ -151,6 +185,86 @@ class CaloricPlotWidget(QWidget):
         
         print("Línea de video configurada")
     
+    def setup_culmination_markers(self):
+        """Configura los marcadores de culminación de cada fase."""
+        self.culmination_scatter = pg.ScatterPlotItem(
+            size=10, symbol='d',
+            pen=pg.mkPen(color=(0, 0, 0), width=1),
+            brush=pg.mkBrush(255, 200, 0)
+        )
+        self.plot_widget.addItem(self.culmination_scatter)
+    
+    def create_spv_estimator(self, acquisition_thread=None, eye: str = 'right', axis: int = 0,
+                             **kwargs) -> SlowPhaseVelocityEstimator:
+        """
+        Crea un estimador de VCL con las fases de este gráfico, que se
+        mantiene sincronizado con los cambios de configuración de fases.
+        
+        Con acquisition_thread el estimador se ejecuta en el hilo de
+        adquisición: spv_ready queda conectado a add_spv_samples y los cambios
+        de fases y los reinicios le llegan por la cola de comandos de ese
+        hilo. Sin él se alimenta directamente con add_eye_position.
+        
+        Args:
+            acquisition_thread: EyeAcquisitionThread, o None
+            eye: 'left' o 'right' (solo con acquisition_thread)
+            axis: 0 = horizontal, 1 = vertical (solo con acquisition_thread)
+        """
+        self.spv_estimator = SlowPhaseVelocityEstimator(phase_config=self.phase_config, **kwargs)
+        if acquisition_thread is not None:
+            acquisition_thread.set_spv_estimator(self.spv_estimator, eye, axis)
+            if acquisition_thread is not self.spv_acquisition_thread:
+                self.phase_config_changed.connect(acquisition_thread.set_spv_phase_config)
+                acquisition_thread.spv_ready.connect(self.add_spv_samples)
+            self.spv_acquisition_thread = acquisition_thread
+        else:
+            self.phase_config_changed.connect(self.spv_estimator.set_phase_config)
+        return self.spv_estimator
+    
+    def add_eye_position(self, timestamp: float, position: Optional[float]):
+        """
+        Alimenta el estimador de VCL propio con una posición calibrada (°)
+        y grafica la VCL cuando se cierra una ventana.
+        """
+        estimator = self.spv_estimator or self.create_spv_estimator()
+        points = estimator.add_sample(timestamp, position)
+        if points:
+            self.add_spv_samples(points, estimator.culminations)
+    
+    def add_spv_samples(self, points: List, culminations: Optional[Dict] = None):
+        """
+        Slot para lotes de VCL [(tiempo, vcl), ...] y sus culminaciones.
+        """
+        if points:
+            rows = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+            rows = rows[rows[:, 0] >= 0]
+            if len(rows):
+                self.data_buffer.extend(rows)
+                self._schedule_redraw()
+        
+        if culminations is not None and culminations != self.culminations:
+            self.update_culminations(culminations)
+    
+    def update_culminations(self, culminations: Dict[str, Dict]):
+        """Actualiza los marcadores de culminación por fase."""
+        self.culminations = dict(culminations)
+        
+        for text_item in self.culmination_text_items.values():
+            self.plot_widget.removeItem(text_item)
+        self.culmination_text_items = {}
+        
+        spots = []
+        for phase_name, culmination in self.culminations.items():
+            spots.append({'pos': (culmination['time'], culmination['spv'])})
+            text_item = pg.TextItem(text=f"{culmination['spv']:.1f}°/s",
+                                    color=(80, 60, 0), anchor=(0.5, 1.2))
+            text_item.setPos(culmination['time'], culmination['spv'])
+            self.plot_widget.addItem(text_item)
+            self.culmination_text_items[phase_name] = text_item
+        
+        self.culmination_scatter.setData(spots)
+        self.culminations_changed.emit(self.culminations)
+    
     def _on_range_changed(self, view_box, ranges):
         """Controla los cambios de rango para mantener restricciones."""
         x_range, y_range = ranges
@@ -212,6 +326,9 @@ class CaloricPlotWidget(QWidget):
         """
         Añade un punto de datos al gráfico.
         
+        El punto se guarda en el buffer circular (O(1)) y el redibujado se
+        agenda para el próximo refresco de pantalla.
+        
         Args:
             timestamp: Tiempo en segundos desde el inicio
             angular_velocity: Velocidad angular en grados/segundo
@@ -220,17 +337,8 @@ class CaloricPlotWidget(QWidget):
         if timestamp < 0:
             return
         
-        # Añadir al buffer
-        self.data_buffer.append((timestamp, angular_velocity))
-        
-        # Mantener buffer limitado (últimos 10000 puntos)
-        if len(self.data_buffer) > 10000:
-            self.data_buffer = self.data_buffer[-5000:]
-        
-        # Actualizar curva
-        if self.data_buffer:
-            timestamps, velocities = zip(*self.data_buffer)
-            self.data_curve.setData(timestamps, velocities)
+        self.data_buffer.append(timestamp, angular_velocity)
+        self._schedule_redraw()
     
     def add_data_batch(self, timestamps: List[float], angular_velocities: List[float]):
         """
@@ -245,27 +353,96 @@ class CaloricPlotWidget(QWidget):
             return
         
         # Filtrar datos válidos (timestamp >= 0)
-        valid_data = [(t, v) for t, v in zip(timestamps, angular_velocities) if t >= 0]
+        rows = np.column_stack((
+            np.asarray(timestamps, dtype=np.float64),
+            np.asarray(angular_velocities, dtype=np.float64)
+        ))
+        rows = rows[rows[:, 0] >= 0]
+        
+        if len(rows):
+            self.data_buffer.extend(rows)
+            self._schedule_redraw()
+    
+    def _schedule_redraw(self):
+        """Agenda un único redibujado para el próximo refresco de pantalla."""
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.redraw_timer.start()
+    
+    def _redraw_curve(self):
+        """Envía a la curva los datos del buffer, decimados para la ventana completa."""
+        self._redraw_pending = False
+        
+        if len(self.data_buffer) == 0:
+            self.data_curve.setData([], [])
+            return
         
-        if valid_data:
-            self.data_buffer.extend(valid_data)
-            
-            # Mantener buffer limitado
-            if len(self.data_buffer) > 10000:
-                self.data_buffer = self.data_buffer[-5000:]
-            
-            # Actualizar curva
-            timestamps, velocities = zip(*self.data_buffer)
-            self.data_curve.setData(timestamps, velocities)
-            
-            print(f"Agregados {len(valid_data)} puntos de datos")
+        data = self.data_buffer.get_ordered()
+        timestamps, velocities = self._decimate_min_max(
+            data[:, 0], data[:, 1], self.MAX_DISPLAY_POINTS
+        )
+        self.data_curve.setData(timestamps, velocities)
+    
+    @staticmethod
+    def _decimate_min_max(timestamps: np.ndarray, values: np.ndarray, max_points: int):
+        """
+        Decimación por picos: conserva el mínimo y el máximo de cada bloque
+        para que los picos de velocidad no desaparezcan al reducir puntos.
+        """
+        n = len(timestamps)
+        if n <= max_points:
+            return timestamps, values
+        
+        bins = max_points // 2
+        block = n // bins
+        usable = bins * block
+        
+        t_blocks = timestamps[:usable].reshape(bins, block)
+        v_blocks = values[:usable].reshape(bins, block)
+        rows = np.arange(bins)
+        idx_min = v_blocks.argmin(axis=1)
+        idx_max = v_blocks.argmax(axis=1)
+        
+        # Mantener el orden temporal dentro de cada bloque
+        first = np.minimum(idx_min, idx_max)
+        second = np.maximum(idx_min, idx_max)
+        t_out = np.column_stack((t_blocks[rows, first], t_blocks[rows, second])).ravel()
+        v_out = np.column_stack((v_blocks[rows, first], v_blocks[rows, second])).ravel()
+        
+        # Incluir la cola que no completa un bloque
+        if usable < n:
+            t_out = np.concatenate((t_out, timestamps[usable:]))
+            v_out = np.concatenate((v_out, values[usable:]))
+        
+        return t_out, v_out
+    
+    def _buffer_capacity(self, duration: float) -> int:
+        """Capacidad del buffer para cubrir la duración completa del test."""
+        return max(10000, int(duration * self.MAX_SAMPLE_RATE))
+    
+    def _display_refresh_interval_ms(self) -> int:
+        """Intervalo de redibujado según la frecuencia de refresco de la pantalla."""
+        screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 60.0
+        if not refresh_rate or refresh_rate <= 0:
+            refresh_rate = 60.0
+        return max(1, int(1000 / refresh_rate))
     
     def clear_data(self):
         """Limpia todos los datos del gráfico."""
+        self.redraw_timer.stop()
+        self._redraw_pending = False
         self.data_buffer.clear()
         self.data_curve.setData([], [])
         self.set_pos_time_video(0)
         
+        if self.spv_acquisition_thread is not None:
+            # No tocar el estimador desde la GUI mientras el hilo lo usa
+            self.spv_acquisition_thread.reset_spv_estimator()
+        elif self.spv_estimator is not None:
+            self.spv_estimator.reset()
+        self.update_culminations({})
+        
         print("Datos del gráfico calórico limpiados")
     
     def get_current_phase(self, timestamp: float = None) -> Optional[str]:
@@ -310,6 +487,11 @@ class CaloricPlotWidget(QWidget):
         """
         self.total_duration = duration
         
+        # Redimensionar buffer si la nueva duración lo requiere
+        capacity = self._buffer_capacity(duration)
+        if capacity > self.data_buffer.capacity:
+            self.data_buffer.resize(capacity)
+        
         # Actualizar límites
         self.plot_widget.setXRange(0, duration, padding=0)
         self.plot_widget.setLimits(xMin=0, xMax=None)
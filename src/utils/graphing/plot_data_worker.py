@@ -0,0 +1,163 @@
+from PySide6.QtCore import QThread
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+
+class FrameDoubleBuffer:
+    """
+    Doble buffer para entregar frames de gráfico del worker al hilo GUI.
+    El worker escribe siempre en el slot trasero y luego intercambia;
+    la GUI solo lee el slot frontal, sin copiar arrays.
+    """
+
+    def __init__(self):
+        self._slots = [None, None]
+        self._front = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def publish(self, frame: Dict):
+        """Escribe un frame en el slot trasero y lo convierte en frontal."""
+        back = 1 - self._front
+        self._slots[back] = frame
+        with self._lock:
+            self._front = back
+            self._sequence += 1
+
+    def acquire(self, last_sequence: int) -> Tuple[Optional[Dict], int]:
+        """
+        Retorna el frame frontal si es más nuevo que last_sequence.
+
+        Returns:
+            (frame o None, número de secuencia actual)
+        """
+        with self._lock:
+            if self._sequence == last_sequence:
+                return None, self._sequence
+            return self._slots[self._front], self._sequence
+
+    def clear(self):
+        with self._lock:
+            self._slots = [None, None]
+            self._sequence += 1
+
+
+class RenderScheduler:
+    """
+    Ajusta el intervalo de redibujado según el costo medido de renderizado,
+    para que el dibujo de gráficos no ocupe más de una fracción del hilo GUI.
+    """
+
+    def __init__(self, max_fps: float = 30, min_fps: float = 4, gui_budget: float = 0.25):
+        """
+        Args:
+            max_fps: Frecuencia máxima de actualización
+            min_fps: Frecuencia mínima aunque el renderizado sea lento
+            gui_budget: Fracción del tiempo GUI permitida para renderizar
+        """
+        self.max_fps = max_fps
+        self.min_fps = min_fps
+        self.gui_budget = gui_budget
+        self.avg_render_time = 0.0
+        self._smoothing = 0.2
+
+    def record_render_time(self, seconds: float):
+        """Registra el costo de un redibujado (media móvil exponencial)."""
+        if self.avg_render_time == 0.0:
+            self.avg_render_time = seconds
+        else:
+            self.avg_render_time += self._smoothing * (seconds - self.avg_render_time)
+
+    def next_interval_ms(self) -> int:
+        """Intervalo recomendado hasta el próximo redibujado."""
+        min_interval = 1.0 / self.max_fps
+        max_interval = 1.0 / self.min_fps
+        interval = self.avg_render_time / self.gui_budget
+        interval = max(min_interval, min(interval, max_interval))
+        return int(interval * 1000)
+
+    def set_max_fps(self, fps: float):
+        self.max_fps = max(self.min_fps, fps)
+
+
+class PlotDataWorker(QThread):
+    """
+    Hilo que prepara los arrays listos para dibujar (ventana visible,
+    downsampling y regiones de parpadeo) fuera del hilo GUI.
+    """
+
+    def __init__(self, display_buffer, curve_mapping: Dict[int, str], max_points: int = 2000):
+        """
+        Args:
+            display_buffer: OptimizedBuffer compartido con el widget
+            curve_mapping: Índice de curva -> clave de datos
+            max_points: Puntos máximos por curva tras el downsampling
+        """
+        super().__init__()
+        self.display_buffer = display_buffer
+        self.curve_mapping = dict(curve_mapping)
+        self.max_points = max_points
+        self.frames = FrameDoubleBuffer()
+
+        self._running = True
+        self._request = threading.Event()
+        self.last_prepare_time = 0.0
+
+    def request_frame(self):
+        """Pide al worker que prepare un nuevo frame."""
+        self._request.set()
+
+    def run(self):
+        while self._running:
+            if not self._request.wait(timeout=0.1):
+                continue
+            self._request.clear()
+            if not self._running:
+                break
+
+            try:
+                start = time.perf_counter()
+                frame = self._prepare_frame()
+                self.last_prepare_time = time.perf_counter() - start
+                if frame is not None:
+                    self.frames.publish(frame)
+            except Exception as e:
+                print(f"Error en PlotDataWorker: {e}")
+
+    def _prepare_frame(self) -> Optional[Dict]:
+        """Construye un frame con los datos por curva y las regiones de parpadeo."""
+        visible_data = self.display_buffer.get_downsampled_data(max_points=self.max_points)
+        timestamps = visible_data['timestamps']
+        if len(timestamps) == 0:
+            return None
+
+        curves = {}
+        for curve_idx, data_type in self.curve_mapping.items():
+            data = visible_data.get(data_type)
+            if data is not None and len(data) == len(timestamps):
+                curves[curve_idx] = data
+
+        left_regions = self._filter_regions(self.display_buffer._detect_blink_regions(
+            timestamps, visible_data['left_eye_states']))
+        right_regions = self._filter_regions(self.display_buffer._detect_blink_regions(
+            timestamps, visible_data['right_eye_states']))
+
+        return {
+            'timestamps': timestamps,
+            'curves': curves,
+            'left_regions': left_regions,
+            'right_regions': right_regions,
+            'last_time': float(timestamps[-1])
+        }
+
+    @staticmethod
+    def _filter_regions(regions: List[Tuple]) -> List[Tuple]:
+        """Descarta regiones demasiado cortas para dibujarse."""
+        return [(float(start), float(end)) for start, end in regions
+                if end > start and (end - start) > 0.01]
+
+    def stop(self):
+        self._running = False
+        self._request.set()
+        self.wait()
@@ -7,12 +7,17 @@ import time
 
 # Importar el buffer optimizado
 try:
-    from ..optimized_buffer import OptimizedBuffer
+    from ..optimized_buffer import OptimizedBuffer, VelocityChannel, disconjugacy_channel
 except ImportError:
     try:
-        from utils.optimized_buffer import OptimizedBuffer
+        from utils.optimized_buffer import OptimizedBuffer, VelocityChannel, disconjugacy_channel
     except ImportError:
-        from optimized_buffer import OptimizedBuffer
+        from optimized_buffer import OptimizedBuffer, VelocityChannel, disconjugacy_channel
+
+try:
+    from .plot_data_worker import PlotDataWorker, RenderScheduler
+except ImportError:
+    from plot_data_worker import PlotDataWorker, RenderScheduler
 
 
 class ConfigurablePlotWidget(QWidget):
@@ -23,6 +28,12 @@ class ConfigurablePlotWidget(QWidget):
     
     linePositionChanged = Signal(float)
     video_sync_signal = Signal(float)  # AGREGAR ESTA LÍNEA
+    
+    # Frecuencia de corte del canal de velocidad filtrada
+    VELOCITY_CUTOFF_HZ = 10.0
+    
+    # Estilo de las etiquetas de los ejes
+    AXIS_LABEL_STYLE = {'color': '#000', 'font-size': '10pt'}
 
     def __init__(self, parent=None, visible_window=60.0, update_fps=10, plot_config=None):
         super().__init__(parent)
@@ -32,12 +43,15 @@ class ConfigurablePlotWidget(QWidget):
             'show_position_x': True,
             'show_position_y': True, 
             'show_imu': True,
+            'show_velocity': False,
+            'show_disconjugacy': False,
             'show_left_eye': True,
             'show_right_eye': True,
             'line_width': 1,
             'colors': {
                 'left_eye': (0, 0, 200),    # Azul
-                'right_eye': (200, 0, 0)    # Rojo
+                'right_eye': (200, 0, 0),   # Rojo
+                'disconjugacy': (0, 130, 0) # Verde
             }
         }
         
@@ -50,6 +64,8 @@ class ConfigurablePlotWidget(QWidget):
         print(f"  - Posición X: {'✓' if self.config['show_position_x'] else '✗'}")
         print(f"  - Posición Y: {'✓' if self.config['show_position_y'] else '✗'}")
         print(f"  - IMU: {'✓' if self.config['show_imu'] else '✗'}")
+        print(f"  - Velocidad: {'✓' if self.config['show_velocity'] else '✗'}")
+        print(f"  - Disconjugación: {'✓' if self.config['show_disconjugacy'] else '✗'}")
         print(f"  - Ojo izquierdo: {'✓' if self.config['show_left_eye'] else '✗'}")
         print(f"  - Ojo derecho: {'✓' if self.config['show_right_eye'] else '✗'}")
         
@@ -69,11 +85,13 @@ class ConfigurablePlotWidget(QWidget):
         
         # Estado de control
         self.is_recording = False
+        self.is_calibrated = False  # Posiciones en grados (True) o en píxeles
         self.auto_scroll = True
         self._updating_range = False
         
         # Crear gráficos y elementos visuales según configuración
         self.plots = []
+        self.plot_labels = []
         self.curves = []
         self.curve_mapping = {}  # Mapeo de curva a tipo de dato
         self.vLines = []
@@ -85,10 +103,20 @@ class ConfigurablePlotWidget(QWidget):
         # Crear los gráficos según configuración
         self._setup_plots()
         
-        # Timer optimizado para actualización visual
+        # Worker que prepara los datos de las curvas fuera del hilo GUI
+        self.data_worker = PlotDataWorker(self.display_buffer, self.curve_mapping)
+        self.data_worker.start()
+        self.render_scheduler = RenderScheduler(max_fps=update_fps)
+        self._last_frame_sequence = 0
+        self._drawn_left_regions = None
+        self._drawn_right_regions = None
+        
+        # Timer optimizado para actualización visual (intervalo adaptativo)
         self.display_timer = QTimer()
+        self.display_timer.setSingleShot(True)
         self.display_timer.timeout.connect(self._update_display)
         self.display_timer.start(self.update_interval)
+        self.data_worker.request_frame()
         
         # Control de performance
         self.last_update_time = 0
@@ -106,13 +134,19 @@ class ConfigurablePlotWidget(QWidget):
         
         # Determinar qué gráficos crear
         if self.config['show_position_x']:
-            plots_to_create.append(('Posición X', 'px'))
+            plots_to_create.append('Posición X')
         
         if self.config['show_position_y']:
-            plots_to_create.append(('Posición Y', 'px'))
+            plots_to_create.append('Posición Y')
         
         if self.config['show_imu']:
-            plots_to_create.append(('IMU', 'g'))
+            plots_to_create.append('IMU')
+        
+        if self.config['show_velocity']:
+            plots_to_create.append('Velocidad X')
+        
+        if self.config['show_disconjugacy']:
+            plots_to_create.append('Disconjugación X')
         
         if not plots_to_create:
             print("ADVERTENCIA: No se configuró ningún gráfico para mostrar")
@@ -120,7 +154,7 @@ class ConfigurablePlotWidget(QWidget):
         
         print(f"Configurando {len(plots_to_create)} gráficos...")
         
-        for i, (label, unit) in enumerate(plots_to_create):
+        for i, label in enumerate(plots_to_create):
             # Crear gráfico optimizado
             plot = pg.PlotWidget()
             plot.setBackground('w')
@@ -130,12 +164,11 @@ class ConfigurablePlotWidget(QWidget):
             plot.getAxis('left').setTextPen(pg.mkPen(color='black'))
             
             # Configurar etiquetas
-            labelStyle = {'color': '#000', 'font-size': '10pt'}
-            plot.setLabel('left', label, units=unit, **labelStyle)
+            plot.setLabel('left', label, units=self._plot_unit(label), **self.AXIS_LABEL_STYLE)
             
             # Solo el último gráfico tiene etiqueta de tiempo
             if i == len(plots_to_create) - 1:
-                plot.setLabel('bottom', 'Tiempo', units='s', **labelStyle)
+                plot.setLabel('bottom', 'Tiempo', units='s', **self.AXIS_LABEL_STYLE)
             
             # Optimizaciones de rendimiento
             plot.showGrid(x=True, y=True)
@@ -145,9 +178,23 @@ class ConfigurablePlotWidget(QWidget):
             
             # Crear curvas según configuración
             curves_created = 0
+            is_disconjugacy = label == 'Disconjugación X'
+            
+            # Disconjugación: una sola curva (izquierdo - derecho)
+            if is_disconjugacy:
+                curve = plot.plot(
+                    pen=pg.mkPen(color=self.config['colors'].get('disconjugacy', (0, 130, 0)),
+                               width=self.config['line_width']),
+                    name=label
+                )
+                curve.setDownsampling(auto=True, method='peak')
+                curve.setClipToView(True)
+                self.curves.append(curve)
+                self.curve_mapping[len(self.curves) - 1] = 'disconjugacy_x'
+                curves_created += 1
             
             # Ojo izquierdo
-            if self.config['show_left_eye']:
+            if self.config['show_left_eye'] and not is_disconjugacy:
                 curve_left = plot.plot(
                     pen=pg.mkPen(color=self.config['colors']['left_eye'], 
                                width=self.config['line_width']),
@@ -163,7 +210,7 @@ class ConfigurablePlotWidget(QWidget):
                 curves_created += 1
             
             # Ojo derecho
-            if self.config['show_right_eye']:
+            if self.config['show_right_eye'] and not is_disconjugacy:
                 curve_right = plot.plot(
                     pen=pg.mkPen(color=self.config['colors']['right_eye'], 
                                width=self.config['line_width']),
@@ -193,6 +240,7 @@ class ConfigurablePlotWidget(QWidget):
             
             # Almacenar referencias
             self.plots.append(plot)
+            self.plot_labels.append(label)
             self.blink_regions.append([])
             self.layout.addWidget(plot)
             
@@ -205,6 +253,36 @@ class ConfigurablePlotWidget(QWidget):
         
         print(f"Todos los gráficos configurados y vinculados")
         print(f"Mapeo de curvas: {self.curve_mapping}")
+        
+        self._register_derived_channels()
+    
+    def _plot_unit(self, label: str) -> str:
+        """Unidad del eje vertical de un gráfico según el estado de calibración."""
+        if label == 'IMU':
+            return 'g'
+        unit = 'grados' if self.is_calibrated else 'px'
+        return f"{unit}/s" if label == 'Velocidad X' else unit
+    
+    def set_calibrated(self, is_calibrated: bool):
+        """
+        Indica si las posiciones recibidas ya vienen convertidas a grados
+        y actualiza las unidades de los ejes.
+        """
+        self.is_calibrated = bool(is_calibrated)
+        for plot, label in zip(self.plots, self.plot_labels):
+            plot.setLabel('left', label, units=self._plot_unit(label), **self.AXIS_LABEL_STYLE)
+    
+    def _register_derived_channels(self):
+        """Declara en el buffer los canales derivados que usan las curvas."""
+        for data_type in set(self.curve_mapping.values()):
+            if data_type.endswith('_velocity_filtered'):
+                source = data_type[:-len('_velocity_filtered')]
+                channel = VelocityChannel(source, cutoff_hz=self.VELOCITY_CUTOFF_HZ)
+            elif data_type.startswith('disconjugacy_'):
+                channel = disconjugacy_channel(data_type[len('disconjugacy_'):])
+            else:
+                continue
+            self.display_buffer.add_derived_channel(channel)
     
     def _get_data_type_for_plot(self, plot_label: str, eye: str) -> str:
         """Determina el tipo de dato para una curva específica."""
@@ -217,6 +295,8 @@ class ConfigurablePlotWidget(QWidget):
                 return 'imu_x'
             else:
                 return 'imu_y'
+        elif plot_label == 'Velocidad X':
+            return f'{eye}_eye_x_velocity_filtered'
         return 'unknown'
     
     def add_data_point(self, left_eye: Optional[List[float]], right_eye: Optional[List[float]], 
@@ -237,57 +317,44 @@ class ConfigurablePlotWidget(QWidget):
             #print(f"Puntos recibidos: {self.data_points_received}, Buffer: {buffer_info['current_size']}")
     
     def _update_display(self):
-        """Actualiza la visualización de manera optimizada."""
-        current_real_time = time.time()
-        
-        # Control de framerate
-        if current_real_time - self.last_update_time < self.frame_skip_threshold:
-            return
-        
-        self.update_count += 1
+        """
+        Dibuja el último frame preparado por el worker.
         
-        # Obtener datos visibles
+        El hilo GUI solo hace setData con arrays ya listos; el intervalo
+        hasta el próximo redibujado lo decide el RenderScheduler.
+        """
         try:
-            visible_data = self.display_buffer.get_downsampled_data(
-                max_points=2000,
-                current_time=None
-            )
+            frame, sequence = self.data_worker.frames.acquire(self._last_frame_sequence)
             
-            if len(visible_data['timestamps']) == 0:
-                if self.update_count % 300 == 0:
-                    buffer_info = self.display_buffer.get_buffer_info()
-                    print(f"Update {self.update_count}: Sin datos visibles. Buffer size: {buffer_info['current_size']}")
+            if frame is None:
+                # Sin frame nuevo (o sin datos visibles todavía)
                 return
             
+            self._last_frame_sequence = sequence
+            self.update_count += 1
+            render_start = time.perf_counter()
+            
             # Debug menos frecuente
             if self.update_count % 300 == 0:
-                print(f"Update {self.update_count}: {len(visible_data['timestamps'])} puntos visibles")
+                print(f"Update {self.update_count}: {len(frame['timestamps'])} puntos visibles")
             
             # Aplicar auto-scroll si está activo
             if self.auto_scroll and self.is_recording:
-                self._apply_auto_scroll(visible_data['timestamps'])
+                self._apply_auto_scroll(frame['timestamps'])
             
-            # Actualizar curvas según mapeo
-            timestamps = visible_data['timestamps']
-            for curve_idx, curve in enumerate(self.curves):
-                if curve_idx in self.curve_mapping:
-                    data_type = self.curve_mapping[curve_idx]
-                    
-                    if data_type in visible_data:
-                        data = visible_data[data_type]
-                        
-                        if len(data) > 0 and len(timestamps) == len(data):
-                            try:
-                                curve.setData(timestamps, data)
-                            except Exception as e:
-                                print(f"Error actualizando curva {curve_idx} ({data_type}): {e}")
-                        elif len(data) > 0:
-                            print(f"Error: timestamps ({len(timestamps)}) != data ({len(data)}) para {data_type}")
+            # Actualizar curvas con los arrays ya preparados
+            timestamps = frame['timestamps']
+            for curve_idx, data in frame['curves'].items():
+                try:
+                    self.curves[curve_idx].setData(timestamps, data)
+                except Exception as e:
+                    print(f"Error actualizando curva {curve_idx} ({self.curve_mapping[curve_idx]}): {e}")
             
             # Actualizar regiones de parpadeo
-            self._update_blink_regions(visible_data)
+            self._update_blink_regions(frame)
             
-            self.last_update_time = current_real_time
+            self.last_update_time = time.time()
+            self.render_scheduler.record_render_time(time.perf_counter() - render_start)
             
             # Debug exitoso
             if self.update_count % 500 == 0:
@@ -299,6 +366,10 @@ class ConfigurablePlotWidget(QWidget):
             print(f"Error en actualización de display: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            # Pedir el siguiente frame y reprogramar según el costo medido
+            self.data_worker.request_frame()
+            self.display_timer.start(self.render_scheduler.next_interval_ms())
     
     def _apply_auto_scroll(self, timestamps: np.ndarray):
         """Aplica auto-scroll optimizado."""
@@ -325,56 +396,65 @@ class ConfigurablePlotWidget(QWidget):
         finally:
             self._updating_range = False
     
-    def _update_blink_regions(self, visible_data: Dict):
-        """Actualiza las regiones de parpadeo de manera eficiente."""
+    def _update_blink_regions(self, frame: Dict):
+        """Actualiza las regiones de parpadeo solo si cambiaron desde el último frame."""
         try:
-            # Obtener regiones de parpadeo
-            left_regions, right_regions = self.display_buffer.get_blink_regions()
+            # Regiones ya calculadas y filtradas por el worker
+            left_regions = frame['left_regions']
+            right_regions = frame['right_regions']
+            
+            if (left_regions == self._drawn_left_regions and
+                    right_regions == self._drawn_right_regions):
+                return
+            self._drawn_left_regions = left_regions
+            self._drawn_right_regions = right_regions
             
             # Limpiar regiones existentes
-            for plot_idx, plot in enumerate(self.plots):
-                for region in self.blink_regions[plot_idx]:
-                    try:
-                        plot.removeItem(region)
-                    except:
-                        pass
-                self.blink_regions[plot_idx].clear()
+            self._remove_blink_regions()
             
             # Añadir nuevas regiones solo si se muestran los ojos correspondientes
             for plot_idx, plot in enumerate(self.plots):
                 # Regiones de ojo izquierdo (azul)
                 if self.config['show_left_eye']:
                     for start, end in left_regions:
-                        if end > start and (end - start) > 0.01:
-                            try:
-                                region = pg.LinearRegionItem(
-                                    values=[start, end],
-                                    brush=pg.mkBrush(0, 0, 255, 50),
-                                    movable=False
-                                )
-                                plot.addItem(region)
-                                self.blink_regions[plot_idx].append(region)
-                            except Exception as e:
-                                print(f"Error añadiendo región izquierda: {e}")
+                        try:
+                            region = pg.LinearRegionItem(
+                                values=[start, end],
+                                brush=pg.mkBrush(0, 0, 255, 50),
+                                movable=False
+                            )
+                            plot.addItem(region)
+                            self.blink_regions[plot_idx].append(region)
+                        except Exception as e:
+                            print(f"Error añadiendo región izquierda: {e}")
                 
                 # Regiones de ojo derecho (rojo)
                 if self.config['show_right_eye']:
                     for start, end in right_regions:
-                        if end > start and (end - start) > 0.01:
-                            try:
-                                region = pg.LinearRegionItem(
-                                    values=[start, end], 
-                                    brush=pg.mkBrush(255, 0, 0, 50),
-                                    movable=False
-                                )
-                                plot.addItem(region)
-                                self.blink_regions[plot_idx].append(region)
-                            except Exception as e:
-                                print(f"Error añadiendo región derecha: {e}")
+                        try:
+                            region = pg.LinearRegionItem(
+                                values=[start, end], 
+                                brush=pg.mkBrush(255, 0, 0, 50),
+                                movable=False
+                            )
+                            plot.addItem(region)
+                            self.blink_regions[plot_idx].append(region)
+                        except Exception as e:
+                            print(f"Error añadiendo región derecha: {e}")
                         
         except Exception as e:
             print(f"Error actualizando regiones de parpadeo: {e}")
     
+    def _remove_blink_regions(self):
+        """Quita de los gráficos todas las regiones de parpadeo dibujadas."""
+        for plot_idx, plot in enumerate(self.plots):
+            for region in self.blink_regions[plot_idx]:
+                try:
+                    plot.removeItem(region)
+                except:
+                    pass
+            self.blink_regions[plot_idx].clear()
+    
     def line_moved_event(self):
         """Maneja el movimiento de la línea vertical."""
         try:
@@ -423,6 +503,7 @@ class ConfigurablePlotWidget(QWidget):
         print("Limpiando datos del gráfico configurable...")
         
         self.display_buffer.clear()
+        self.data_worker.frames.clear()
         self.auto_scroll = True
         
         # Limpiar curvas
@@ -433,13 +514,9 @@ class ConfigurablePlotWidget(QWidget):
                 pass
         
         # Limpiar regiones de parpadeo
-        for plot_idx, plot in enumerate(self.plots):
-            for region in self.blink_regions[plot_idx]:
-                try:
-                    plot.removeItem(region)
-                except:
-                    pass
-            self.blink_regions[plot_idx].clear()
+        self._remove_blink_regions()
+        self._drawn_left_regions = None
+        self._drawn_right_regions = None
         
         # Reset contadores
         self.update_count = 0
@@ -457,7 +534,7 @@ class ConfigurablePlotWidget(QWidget):
         """Cambia la frecuencia de actualización."""
         new_interval = int(1000 / max(1, min(fps, 60)))
         self.update_interval = new_interval
-        self.display_timer.setInterval(self.update_interval)
+        self.render_scheduler.set_max_fps(max(1, min(fps, 60)))
         
         self.frame_skip_threshold = 1.0 / (fps * 1.5)
         
@@ -490,6 +567,8 @@ class ConfigurablePlotWidget(QWidget):
         summary += f"  - Posición X: {'✓' if self.config['show_position_x'] else '✗'}\n"
         summary += f"  - Posición Y: {'✓' if self.config['show_position_y'] else '✗'}\n"
         summary += f"  - IMU: {'✓' if self.config['show_imu'] else '✗'}\n"
+        summary += f"  - Velocidad: {'✓' if self.config['show_velocity'] else '✗'}\n"
+        summary += f"  - Disconjugación: {'✓' if self.config['show_disconjugacy'] else '✗'}\n"
         summary += f"  - Ojo izquierdo: {'✓' if self.config['show_left_eye'] else '✗'}\n"
         summary += f"  - Ojo derecho: {'✓' if self.config['show_right_eye'] else '✗'}\n"
         return summary
@@ -498,6 +577,7 @@ class ConfigurablePlotWidget(QWidget):
         """Limpia recursos al cerrar."""
         print("Cerrando widget de gráficos configurable...")
         self.display_timer.stop()
+        self.data_worker.stop()
         self.clear_data()
         super().closeEvent(event)
 
@@ -537,6 +617,25 @@ class PlotConfigurations:
             }
         }
     
+    @staticmethod
+    def get_horizontal_with_velocity():
+        """Horizontal de ambos ojos con velocidad filtrada y disconjugación."""
+        return {
+            'show_position_x': True,
+            'show_position_y': False,
+            'show_imu': False,
+            'show_velocity': True,
+            'show_disconjugacy': True,
+            'show_left_eye': True,
+            'show_right_eye': True,
+            'line_width': 1,
+            'colors': {
+                'left_eye': (0, 0, 200),
+                'right_eye': (200, 0, 0),
+                'disconjugacy': (0, 130, 0)
+            }
+        }
+    
     @staticmethod
     def get_eyes_only():
         """Solo datos oculares (sin IMU)."""
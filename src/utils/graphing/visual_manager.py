@@ -263,15 +263,21 @@ class OptimizedVisualManager:
             visible_data: Datos visibles
         """
         try:
+            # Limitar número de regiones para performance
+            max_regions = self.optimization_config['blink_region_limit']
+            
             # Obtener regiones de parpadeo
-            if hasattr(blink_detector, 'get_blink_regions'):
+            if hasattr(blink_detector, 'get_visible_blink_regions'):
+                # Solo las regiones de la ventana visible (búsqueda binaria)
+                timestamps = visible_data['timestamps']
+                left_regions, right_regions = blink_detector.get_visible_blink_regions(
+                    float(timestamps[0]), float(timestamps[-1]), max_regions)
+            elif hasattr(blink_detector, 'get_blink_regions'):
                 left_regions, right_regions = blink_detector.get_blink_regions()
             else:
                 # Fallback: detectar desde estados en datos visibles
                 left_regions, right_regions = self._detect_blink_regions_from_data(visible_data)
             
-            # Limitar número de regiones para performance
-            max_regions = self.optimization_config['blink_region_limit']
             if len(left_regions) > max_regions:
                 left_regions = left_regions[-max_regions:]
             if len(right_regions) > max_regions:
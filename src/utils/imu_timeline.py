@@ -0,0 +1,281 @@
+"""
+Línea de tiempo del IMU y alineación con las muestras oculares.
+
+El IMU transmite a ~50 Hz (IMU_READ_LIVE_ON) con su propio reloj en
+milisegundos, mientras que las muestras oculares llegan a la frecuencia de la
+cámara con tiempos time.time() del host. Este módulo guarda las muestras del
+IMU con su tiempo, estima el desfase entre ambos relojes e interpola el ángulo
+de cabeza sobre los tiempos oculares de forma vectorizada.
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    from utils.optimized_buffer import RingBuffer
+except ImportError:
+    from optimized_buffer import RingBuffer
+
+
+# Columnas de valores almacenadas por muestra (además del tiempo)
+IMU_COLUMNS = ('angle_x', 'angle_y', 'angle_z', 'gyro_x', 'gyro_y', 'gyro_z')
+
+
+def _quaternion_to_angles(w: float, x: float, y: float, z: float) -> Tuple[float, float, float]:
+    """
+    Convierte un cuaternión a (yaw, pitch, roll) en grados.
+
+    yaw corresponde a la rotación horizontal de la cabeza y pitch a la
+    vertical, que es lo que se guarda como imu_x / imu_y.
+    """
+    yaw = math.atan2(2.0 * (w * z + x * y), 1.0 - 2.0 * (y * y + z * z))
+    sin_pitch = max(-1.0, min(1.0, 2.0 * (w * y - z * x)))
+    pitch = math.asin(sin_pitch)
+    roll = math.atan2(2.0 * (w * x + y * z), 1.0 - 2.0 * (x * x + y * y))
+    return math.degrees(yaw), math.degrees(pitch), math.degrees(roll)
+
+
+def parse_imu_line(line: str) -> Optional[Tuple[Optional[float], Tuple[float, ...]]]:
+    """
+    Interpreta una línea serial del IMU.
+
+    Formatos aceptados:
+        LIVE:<millis>,acc x3,gyro x3 (rad/s),mag x3,temp,quat_w,quat_x,quat_y,quat_z
+        x,y,z  (formato antiguo, ángulos sin tiempo del dispositivo)
+
+    Returns:
+        (tiempo_dispositivo_s o None, (angle_x, angle_y, angle_z, gyro_x, gyro_y, gyro_z))
+        con ángulos en grados y velocidades en °/s, o None si la línea no es
+        una muestra del IMU
+    """
+    line = line.strip()
+    try:
+        if line.startswith("LIVE:"):
+            parts = line[5:].split(",")
+            if len(parts) < 15:
+                return None
+            device_time = float(parts[0]) / 1000.0
+            gyro = [math.degrees(float(v)) for v in parts[4:7]]
+            angles = _quaternion_to_angles(*(float(v) for v in parts[11:15]))
+            return device_time, (*angles, *gyro)
+
+        parts = line.split(",")
+        if len(parts) >= 3 and ":" not in line:
+            angles = [float(v) for v in parts[:3]]
+            return None, (*angles, math.nan, math.nan, math.nan)
+    except ValueError:
+        return None
+    return None
+
+
+class ClockOffsetEstimator:
+    """
+    Estima el desfase entre el reloj del dispositivo y el reloj del host.
+
+    Cada muestra da host_time - device_time = desfase + latencia, con latencia
+    siempre positiva (transmisión serial y planificación de hilos). El mínimo
+    sobre una ventana deslizante es la mejor estimación del desfase real; la
+    ventana permite seguir la deriva lenta entre cristales.
+    """
+
+    def __init__(self, window_seconds: float = 10.0):
+        """
+        Args:
+            window_seconds: Duración (tiempo de dispositivo) de la ventana del mínimo
+        """
+        self.window_seconds = window_seconds
+        self.reset()
+
+    def reset(self):
+        """Olvida el desfase estimado (p.ej. al reconectar el dispositivo)."""
+        self._candidates = deque()   # (device_time, offset) con offsets crecientes
+        self._last_device_time = None
+
+    @property
+    def offset(self) -> Optional[float]:
+        """Desfase actual en segundos, o None si aún no hay muestras."""
+        return self._candidates[0][1] if self._candidates else None
+
+    def update(self, device_time: float, host_time: float) -> float:
+        """
+        Registra una muestra y retorna el desfase actualizado.
+
+        Args:
+            device_time: Tiempo del dispositivo en segundos
+            host_time: Tiempo de recepción en el host (time.time())
+        """
+        if self._last_device_time is not None and device_time < self._last_device_time:
+            # El dispositivo se reinició: el reloj vuelve a cero
+            self.reset()
+        self._last_device_time = device_time
+
+        offset = host_time - device_time
+        candidates = self._candidates
+        while candidates and candidates[-1][1] >= offset:
+            candidates.pop()
+        candidates.append((device_time, offset))
+        while candidates[0][0] < device_time - self.window_seconds:
+            candidates.popleft()
+        return candidates[0][1]
+
+    def to_host(self, device_time: float) -> float:
+        """Convierte un tiempo del dispositivo al reloj del host."""
+        return device_time + self._candidates[0][1]
+
+
+class ImuTimeline:
+    """
+    Historial de muestras del IMU con tiempo del host.
+
+    Las muestras se guardan en un RingBuffer (tiempo + IMU_COLUMNS) y se
+    interpolan en bloque sobre cualquier conjunto de tiempos. Es seguro
+    escribir desde el hilo serial y leer desde el hilo de adquisición.
+    """
+
+    def __init__(self, capacity: int = 180000, offset_window: float = 10.0):
+        """
+        Args:
+            capacity: Muestras guardadas (180000 = 1 hora a 50 Hz)
+            offset_window: Ventana en segundos del estimador de desfase
+        """
+        self._buffer = RingBuffer(capacity, 1 + len(IMU_COLUMNS))
+        self._lock = threading.Lock()
+        self.clock = ClockOffsetEstimator(offset_window)
+        self._last_time = -math.inf
+
+    def __len__(self):
+        return len(self._buffer)
+
+    @property
+    def last_time(self) -> float:
+        """Tiempo de host de la última muestra (-inf si está vacío)."""
+        return self._last_time
+
+    def clear(self):
+        """Vacía el historial conservando el desfase estimado."""
+        with self._lock:
+            self._buffer.clear()
+            self._last_time = -math.inf
+
+    def add(self, values, host_time: float, device_time: Optional[float] = None) -> bool:
+        """
+        Añade una muestra.
+
+        Args:
+            values: Valores en el orden de IMU_COLUMNS
+            host_time: Tiempo de recepción (time.time())
+            device_time: Tiempo del dispositivo en segundos, si el formato lo trae
+
+        Returns:
+            True si la muestra se guardó
+        """
+        if device_time is not None:
+            self.clock.update(device_time, host_time)
+            sample_time = self.clock.to_host(device_time)
+        else:
+            sample_time = host_time
+
+        with self._lock:
+            # np.interp requiere tiempos crecientes
+            if sample_time <= self._last_time:
+                return False
+            self._buffer.append(sample_time, *values)
+            self._last_time = sample_time
+        return True
+
+    def get_range(self, start_time: float, end_time: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Retorna (tiempos, valores) de las muestras en [start_time, end_time],
+        más una muestra a cada lado para poder interpolar en los bordes.
+        """
+        with self._lock:
+            rows = self._buffer.get_ordered()
+        times = rows[:, 0]
+        first = max(0, np.searchsorted(times, start_time, side='left') - 1)
+        last = min(len(times), np.searchsorted(times, end_time, side='right') + 1)
+        return times[first:last], rows[first:last, 1:]
+
+    def get_recent(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (tiempos, valores) de las últimas count muestras."""
+        with self._lock:
+            rows = self._buffer.get_last(count)
+        return rows[:, 0], rows[:, 1:]
+
+    def interpolate(self, times, columns=(0, 1), recent: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        Interpola columnas del IMU sobre los tiempos dados.
+
+        Args:
+            times: Tiempos del host (crecientes)
+            columns: Índices de IMU_COLUMNS a interpolar (por defecto ángulos x/y)
+            recent: Si se indica, usar solo las últimas `recent` muestras
+                    (suficiente para lotes en vivo y evita copiar todo el historial)
+
+        Returns:
+            Array (len(times), len(columns)) o None si no hay muestras
+        """
+        times = np.asarray(times, dtype=np.float64)
+        if recent is not None:
+            imu_times, imu_values = self.get_recent(recent)
+        elif len(times):
+            imu_times, imu_values = self.get_range(times[0], times[-1])
+        else:
+            return np.empty((0, len(columns)))
+        if len(imu_times) == 0:
+            return None
+        angle_columns = [index for index, column in enumerate(columns)
+                         if IMU_COLUMNS[column].startswith('angle')]
+        return align_imu_to_eye(times, imu_times, imu_values[:, list(columns)],
+                                angle_columns=angle_columns)
+
+
+def align_imu_to_eye(eye_times, imu_times, imu_values, angle_columns=()) -> np.ndarray:
+    """
+    Interpola muestras del IMU sobre los tiempos de las muestras oculares.
+
+    Fuera del rango del IMU se mantiene el valor del extremo más cercano.
+    Las muestras NaN del IMU se ignoran columna por columna.
+
+    Los ángulos vienen en ±180°: interpolar directamente entre 179° y -179°
+    barrería todo el rango pasando por 0. Las columnas de angle_columns se
+    desenvuelven antes de interpolar y el resultado se vuelve a llevar a ±180°.
+
+    Args:
+        eye_times: Tiempos de las muestras oculares (N,)
+        imu_times: Tiempos crecientes del IMU (M,)
+        imu_values: Valores del IMU (M,) o (M, C)
+        angle_columns: Índices de las columnas que son ángulos en grados
+
+    Returns:
+        Array (N,) o (N, C) con los valores interpolados (NaN si una columna
+        no tiene muestras válidas)
+    """
+    eye_times = np.asarray(eye_times, dtype=np.float64)
+    imu_times = np.asarray(imu_times, dtype=np.float64)
+    imu_values = np.asarray(imu_values, dtype=np.float64)
+    squeeze = imu_values.ndim == 1
+    if squeeze:
+        imu_values = imu_values[:, np.newaxis]
+
+    angle_columns = list(angle_columns)
+    result = np.full((len(eye_times), imu_values.shape[1]), np.nan)
+    for column in range(imu_values.shape[1]):
+        values = imu_values[:, column]
+        valid = np.isfinite(values)
+        if not valid.any():
+            continue
+        column_times = imu_times
+        if not valid.all():
+            column_times, values = imu_times[valid], values[valid]
+        if column in angle_columns:
+            values = np.degrees(np.unwrap(np.radians(values)))
+        result[:, column] = np.interp(eye_times, column_times, values)
+
+    if angle_columns:
+        result[:, angle_columns] = (result[:, angle_columns] + 180.0) % 360.0 - 180.0
+
+    return result[:, 0] if squeeze else result
@@ -1,7 +1,177 @@
 import numpy as np
+import math
+from bisect import bisect_left
 from collections import deque
+from itertools import islice
 from typing import List, Dict, Optional, Tuple
+import threading
 import time
+from abc import ABC, abstractmethod
+
+
+class RingBuffer:
+    """
+    Buffer circular de tamaño fijo respaldado por arrays NumPy.
+    Cada append es O(1); el orden cronológico solo se reconstruye al leer.
+    """
+    
+    def __init__(self, capacity: int, columns: int = 2, dtype=np.float64):
+        """
+        Args:
+            capacity: Número máximo de filas almacenadas
+            columns: Número de columnas por fila (p.ej. tiempo y valor)
+            dtype: Tipo de dato de los arrays
+        """
+        self.capacity = max(1, int(capacity))
+        self.columns = columns
+        self._data = np.zeros((self.capacity, columns), dtype=dtype)
+        self._head = 0      # Próxima posición de escritura
+        self._size = 0
+    
+    def __len__(self):
+        return self._size
+    
+    def append(self, *values):
+        """Añade una fila, sobrescribiendo la más antigua si está lleno."""
+        self._data[self._head] = values
+        self._head = (self._head + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+    
+    def extend(self, rows: np.ndarray):
+        """Añade varias filas de una vez (array de forma (n, columns))."""
+        rows = np.asarray(rows, dtype=self._data.dtype).reshape(-1, self.columns)
+        n = len(rows)
+        if n == 0:
+            return
+        if n >= self.capacity:
+            # Solo sobreviven las últimas `capacity` filas
+            self._data[:] = rows[-self.capacity:]
+            self._head = 0
+            self._size = self.capacity
+            return
+        
+        first = min(n, self.capacity - self._head)
+        self._data[self._head:self._head + first] = rows[:first]
+        if first < n:
+            self._data[:n - first] = rows[first:]
+        self._head = (self._head + n) % self.capacity
+        self._size = min(self.capacity, self._size + n)
+    
+    def get_ordered(self) -> np.ndarray:
+        """Retorna una copia de las filas en orden cronológico."""
+        if self._size < self.capacity:
+            return self._data[:self._size].copy()
+        return np.concatenate((self._data[self._head:], self._data[:self._head]))
+
+    def get_last(self, count: int) -> np.ndarray:
+        """Retorna una copia de las últimas count filas en orden cronológico."""
+        count = min(max(0, int(count)), self._size)
+        start = self._head - count
+        if start >= 0:
+            return self._data[start:self._head].copy()
+        return np.concatenate((self._data[start:], self._data[:self._head]))
+
+    def last(self) -> Optional[np.ndarray]:
+        """Retorna la última fila añadida o None si está vacío."""
+        if self._size == 0:
+            return None
+        return self._data[(self._head - 1) % self.capacity]
+    
+    def resize(self, capacity: int):
+        """Cambia la capacidad conservando las filas más recientes."""
+        ordered = self.get_ordered()
+        self.capacity = max(1, int(capacity))
+        self._data = np.zeros((self.capacity, self.columns), dtype=self._data.dtype)
+        self._head = 0
+        self._size = 0
+        self.extend(ordered)
+    
+    def clear(self):
+        """Vacía el buffer sin liberar memoria."""
+        self._head = 0
+        self._size = 0
+
+
+class DerivedChannel(ABC):
+    """
+    Canal calculado a partir de los canales crudos del OptimizedBuffer.
+    Se evalúa una vez por muestra al añadirla, con estado acotado.
+    Las subclases implementan update.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def reset(self):
+        """Reinicia el estado interno."""
+    
+    @abstractmethod
+    def update(self, values: Dict[str, float], timestamp: float) -> float:
+        """
+        Calcula el valor del canal para la muestra recién añadida.
+        
+        Args:
+            values: Valores crudos de la muestra (left_eye_x, ..., imu_y)
+            timestamp: Tiempo de la muestra
+        """
+
+
+class VelocityChannel(DerivedChannel):
+    """
+    Velocidad por diferencia finita de un canal, opcionalmente suavizada
+    con un paso-bajo de primer orden.
+    """
+    
+    def __init__(self, source: str, cutoff_hz: Optional[float] = None, name: Optional[str] = None):
+        """
+        Args:
+            source: Canal crudo (p.ej. 'right_eye_x')
+            cutoff_hz: Frecuencia de corte del suavizado (None = sin filtrar)
+            name: Nombre del canal (por defecto '<source>_velocity[_filtered]')
+        """
+        if name is None:
+            name = f"{source}_velocity" + ("_filtered" if cutoff_hz else "")
+        super().__init__(name)
+        self.source = source
+        self.tau = 1.0 / (2 * math.pi * cutoff_hz) if cutoff_hz else None
+        self.reset()
+    
+    def reset(self):
+        self._prev_value = None
+        self._prev_time = None
+        self._velocity = 0.0
+    
+    def update(self, values: Dict[str, float], timestamp: float) -> float:
+        value = values[self.source]
+        if self._prev_time is not None and timestamp > self._prev_time:
+            dt = timestamp - self._prev_time
+            velocity = (value - self._prev_value) / dt
+            if self.tau is None:
+                self._velocity = velocity
+            else:
+                self._velocity += dt / (dt + self.tau) * (velocity - self._velocity)
+        
+        self._prev_value = value
+        self._prev_time = timestamp
+        return self._velocity
+
+
+class DifferenceChannel(DerivedChannel):
+    """Diferencia entre dos canales (p.ej. disconjugación izquierdo - derecho)."""
+    
+    def __init__(self, minuend: str, subtrahend: str, name: Optional[str] = None):
+        super().__init__(name or f"{minuend}_minus_{subtrahend}")
+        self.minuend = minuend
+        self.subtrahend = subtrahend
+    
+    def update(self, values: Dict[str, float], timestamp: float) -> float:
+        return values[self.minuend] - values[self.subtrahend]
+
+
+def disconjugacy_channel(axis: str = 'x') -> DifferenceChannel:
+    """Canal de disconjugación ojo izquierdo - ojo derecho en un eje."""
+    return DifferenceChannel(f'left_eye_{axis}', f'right_eye_{axis}', name=f'disconjugacy_{axis}')
 
 
 class OptimizedBuffer:
@@ -38,6 +208,32 @@ class OptimizedBuffer:
         
         # Variable para el primer timestamp (referencia)
         self.first_timestamp = None
+        
+        # Lock: el hilo GUI añade puntos mientras el worker de gráficos lee
+        self.lock = threading.Lock()
+        
+        # Canales derivados: se calculan al añadir cada punto
+        self.derived_channels = {}
+        self.derived_data = {}
+    
+    def add_derived_channel(self, channel: DerivedChannel):
+        """
+        Declara un canal derivado. Se calcula incrementalmente desde el
+        siguiente punto añadido (los puntos previos quedan en NaN).
+        """
+        with self.lock:
+            if channel.name in self.derived_channels:
+                return
+            channel.reset()
+            self.derived_channels[channel.name] = channel
+            self.derived_data[channel.name] = deque(
+                [np.nan] * len(self.timestamps), maxlen=self.max_buffer_size)
+    
+    def remove_derived_channel(self, name: str):
+        """Elimina un canal derivado."""
+        with self.lock:
+            self.derived_channels.pop(name, None)
+            self.derived_data.pop(name, None)
     
     def add_data_point(self, left_eye: Optional[List[float]], right_eye: Optional[List[float]], 
                       imu_x: float, imu_y: float, timestamp: float):
@@ -47,6 +243,11 @@ class OptimizedBuffer:
         """
         current_time = timestamp if timestamp is not None else time.time()
         
+        with self.lock:
+            self._append_point(left_eye, right_eye, imu_x, imu_y, current_time)
+    
+    def _append_point(self, left_eye, right_eye, imu_x, imu_y, current_time):
+        """Añade un punto a los deques (el llamador debe tener el lock)."""
         # Añadir timestamp
         self.timestamps.append(current_time)
         
@@ -80,6 +281,21 @@ class OptimizedBuffer:
         self.imu_x.append(float(imu_x))
         self.imu_y.append(float(imu_y))
         
+        # Canales derivados sobre los valores recién añadidos
+        if self.derived_channels:
+            values = {
+                'left_eye_x': self.left_eye_x[-1],
+                'left_eye_y': self.left_eye_y[-1],
+                'right_eye_x': self.right_eye_x[-1],
+                'right_eye_y': self.right_eye_y[-1],
+                'imu_x': self.imu_x[-1],
+                'imu_y': self.imu_y[-1]
+            }
+            for name, channel in self.derived_channels.items():
+                value = channel.update(values, current_time)
+                values[name] = value  # Permite canales derivados de otros derivados
+                self.derived_data[name].append(value)
+        
         # Actualizar estadísticas
         self.total_points_added += 1
         self.last_update_time = current_time
@@ -88,58 +304,55 @@ class OptimizedBuffer:
         """
         Obtiene datos visibles - VERSIÓN SIMPLIFICADA que funciona.
         """
-        if len(self.timestamps) == 0:
-            return self._empty_data()
-        
-        if current_time is None:
-            current_time = self.timestamps[-1]
-        
-        # CLAVE: Calcular ventana visible de manera más robusta
-        if self.first_timestamp is None:
-            start_time = 0
-        else:
-            # Usar tiempo relativo desde el inicio de la grabación
-            elapsed_time = current_time - self.first_timestamp
-            start_time = max(0, elapsed_time - self.visible_window)
-            start_time += self.first_timestamp  # Convertir de nuevo a timestamp absoluto
-        
-        # Encontrar todos los puntos en la ventana visible
-        visible_indices = []
-        for i, timestamp in enumerate(self.timestamps):
-            if timestamp >= start_time:
-                visible_indices.append(i)
-        
-        if not visible_indices:
-            #print(f"DEBUG: No hay datos visibles. start_time={start_time}, current_time={current_time}")
-            #print(f"       Primer timestamp: {self.timestamps[0] if self.timestamps else 'N/A'}")
-            #print(f"       Último timestamp: {self.timestamps[-1] if self.timestamps else 'N/A'}")
-            return self._empty_data()
-        
-        # Extraer datos visibles
-        try:
-            visible_data = {
-                'timestamps': np.array([self.timestamps[i] for i in visible_indices]),
-                'left_eye_x': np.array([self.left_eye_x[i] for i in visible_indices]),
-                'left_eye_y': np.array([self.left_eye_y[i] for i in visible_indices]),
-                'right_eye_x': np.array([self.right_eye_x[i] for i in visible_indices]),
-                'right_eye_y': np.array([self.right_eye_y[i] for i in visible_indices]),
-                'imu_x': np.array([self.imu_x[i] for i in visible_indices]),
-                'imu_y': np.array([self.imu_y[i] for i in visible_indices]),
-                'left_eye_states': np.array([self.left_eye_states[i] for i in visible_indices]),
-                'right_eye_states': np.array([self.right_eye_states[i] for i in visible_indices])
-            }
+        with self.lock:
+            size = len(self.timestamps)
+            if size == 0:
+                return self._empty_data()
             
-            # Debug info
-            if len(visible_data['timestamps']) > 0:
-                #print(f"DEBUG: Datos visibles encontrados: {len(visible_data['timestamps'])} puntos")
-                #print(f"       Rango de tiempo: {visible_data['timestamps'][0]:.2f} - {visible_data['timestamps'][-1]:.2f}")
-                pass
+            if current_time is None:
+                current_time = self.timestamps[-1]
             
-            return visible_data
+            # CLAVE: Calcular ventana visible de manera más robusta
+            if self.first_timestamp is None:
+                start_time = 0
+            else:
+                # Usar tiempo relativo desde el inicio de la grabación
+                elapsed_time = current_time - self.first_timestamp
+                start_time = max(0, elapsed_time - self.visible_window)
+                start_time += self.first_timestamp  # Convertir de nuevo a timestamp absoluto
+            
+            # Ubicar el inicio de la ventana con búsqueda binaria y copiar solo la cola visible
+            first_visible = bisect_left(self.timestamps, start_time)
+            if first_visible >= size:
+                return self._empty_data()
             
-        except Exception as e:
-            print(f"ERROR en get_visible_data: {e}")
-            return self._empty_data()
+            return self._snapshot(size - first_visible)
+    
+    def _snapshot(self, count: int) -> Dict:
+        """
+        Copia de las últimas count muestras de cada canal como arrays NumPy
+        (el llamador debe tener el lock).
+        """
+        snapshot = {
+            'timestamps': self._tail(self.timestamps, count, np.float64),
+            'left_eye_x': self._tail(self.left_eye_x, count, np.float64),
+            'left_eye_y': self._tail(self.left_eye_y, count, np.float64),
+            'right_eye_x': self._tail(self.right_eye_x, count, np.float64),
+            'right_eye_y': self._tail(self.right_eye_y, count, np.float64),
+            'imu_x': self._tail(self.imu_x, count, np.float64),
+            'imu_y': self._tail(self.imu_y, count, np.float64),
+            'left_eye_states': self._tail(self.left_eye_states, count, bool),
+            'right_eye_states': self._tail(self.right_eye_states, count, bool)
+        }
+        for name, data in self.derived_data.items():
+            snapshot[name] = self._tail(data, count, np.float64)
+        return snapshot
+    
+    @staticmethod
+    def _tail(data: deque, count: int, dtype) -> np.ndarray:
+        """Últimos count elementos de un deque, recorriéndolo desde el final."""
+        tail = np.fromiter(islice(reversed(data), count), dtype=dtype, count=count)
+        return tail[::-1].copy()
     
     def get_downsampled_data(self, max_points: int = 2000, current_time: Optional[float] = None) -> Dict:
         """
@@ -169,7 +382,7 @@ class OptimizedBuffer:
     
     def _empty_data(self) -> Dict:
         """Retorna un diccionario con arrays vacíos."""
-        return {
+        empty = {
             'timestamps': np.array([]),
             'left_eye_x': np.array([]),
             'left_eye_y': np.array([]),
@@ -180,6 +393,9 @@ class OptimizedBuffer:
             'left_eye_states': np.array([]),
             'right_eye_states': np.array([])
         }
+        for name in list(self.derived_data):
+            empty[name] = np.array([])
+        return empty
     
     def get_blink_regions(self, current_time: Optional[float] = None) -> Tuple[List[Tuple], List[Tuple]]:
         """
@@ -236,6 +452,15 @@ class OptimizedBuffer:
     
     def clear(self):
         """Limpia todos los datos del buffer."""
+        with self.lock:
+            self._clear_deques()
+        
+        # Resetear estadísticas
+        self.total_points_added = 0
+        self.last_update_time = 0
+    
+    def _clear_deques(self):
+        """Vacía todos los deques (el llamador debe tener el lock)."""
         self.timestamps.clear()
         self.left_eye_x.clear()
         self.left_eye_y.clear()
@@ -245,10 +470,9 @@ class OptimizedBuffer:
         self.imu_y.clear()
         self.left_eye_states.clear()
         self.right_eye_states.clear()
-        
-        # Resetear estadísticas
-        self.total_points_added = 0
-        self.last_update_time = 0
+        for name, data in self.derived_data.items():
+            data.clear()
+            self.derived_channels[name].reset()
     
     def get_buffer_info(self) -> Dict:
         """
@@ -112,7 +112,8 @@ class ProtocolManager:
             "seguimiento_lento": "Seguimiento Lento",
             "optoquinetico": "Optoquinético",
             "sacadas": "Sacadas",
-            "espontaneo": "Espontáneo"
+            "espontaneo": "Espontáneo",
+            "vhit": "Impulso Cefálico (vHIT)"
         }
     
     def open_protocol_dialog(self, protocol_type):
@@ -509,8 +510,8 @@ class ProtocolManager:
             
             # Si es finalización completa con datos
             if test_data:
-                # Preparar datos CSV en formato compatible
-                csv_data = self._prepare_csv_data(test_data)
+                # Preparar las muestras por columnas
+                columns = self._prepare_columns(test_data)
                 
                 # Obtener metadatos actuales de la prueba
                 current_test_data = self._get_test_metadata(test_id)
@@ -519,12 +520,35 @@ class ProtocolManager:
                     current_test_data['estado'] = 'completado'
                     current_test_data['detenido_manualmente'] = stopped_manually
                     
+                    # Guardar la calibración usada para poder recalibrar después
+                    calibration_manager = getattr(self.main_window, 'calibration_manager', None)
+                    if calibration_manager:
+                        calibration = calibration_manager.get_calibration_parameters()
+                        current_test_data.setdefault('metadata_prueba', {}).update({
+                            'calibracion': calibration,
+                            'unidades': 'grados' if calibration['is_calibrated'] else 'px'
+                        })
+                    
+                    # Guardar en segundo plano si está la cola (el video de la
+                    # misma prueba se combina en la misma escritura)
+                    save_queue = getattr(self.main_window, 'siev_save_queue', None)
+                    if save_queue is not None and save_queue.isRunning():
+                        save_queue.enqueue(
+                            siev_path,
+                            current_test_data,
+                            columns=columns,
+                            imu_data=self._prepare_imu_data(test_data)
+                        )
+                        print(f"Datos de prueba {test_id} encolados para guardar en .siev")
+                        return True
+                    
                     # Usar SievManager para agregar datos completos
                     success = siev_manager.add_test_to_siev(
                         siev_path,
                         current_test_data,
-                        csv_data=csv_data,
-                        video_path=None  # TODO: Implementar video si es necesario
+                        video_path=None,  # TODO: Implementar video si es necesario
+                        imu_data=self._prepare_imu_data(test_data),
+                        columns=columns
                     )
                     
                     if success:
@@ -539,46 +563,132 @@ class ProtocolManager:
             print(f"Error actualizando prueba {test_id} en .siev: {e}")
             return False
 
-    def _prepare_csv_data(self, test_data):
+    def recalibrate_test(self, test_id):
         """
-        Convertir datos de prueba al formato CSV para SievManager
+        Recalibrar una prueba ya grabada con la calibración actual
         
         Args:
-            test_data: Datos de la prueba desde data_storage
+            test_id: ID de la prueba
             
         Returns:
-            List[Dict]: Lista de diccionarios con los datos (formato esperado por SievManager)
+            bool: True si se recalibró
         """
         try:
-            # Preparar lista de diccionarios en lugar de cadena CSV
-            csv_data = []
-            
-            # Procesar cada muestra - usar estructura real de data_storage
-            for sample in test_data.get('data', []):
-                # Los datos vienen directamente del data_storage sin anidamiento
-                row_dict = {
-                    'timestamp': sample.get('timestamp', 0),
-                    'recording_time': sample.get('timestamp', 0),  # usar timestamp como recording_time
-                    'left_eye_x': sample.get('left_eye_x', 0),
-                    'left_eye_y': sample.get('left_eye_y', 0),
-                    'left_eye_detected': sample.get('left_eye_detected', False),
-                    'right_eye_x': sample.get('right_eye_x', 0),
-                    'right_eye_y': sample.get('right_eye_y', 0),
-                    'right_eye_detected': sample.get('right_eye_detected', False),
-                    'imu_x': sample.get('imu_x', 0),
-                    'imu_y': sample.get('imu_y', 0),
-                    'imu_z': 0  # No hay imu_z en data_storage, usar 0
-                }
-                
-                csv_data.append(row_dict)
+            siev_manager = self.main_window.siev_manager
+            siev_path = self.main_window.current_user_siev
+            calibration_manager = getattr(self.main_window, 'calibration_manager', None)
+            
+            if not siev_manager or not siev_path or not calibration_manager:
+                raise Exception("Sistema de usuarios o calibración no disponible")
+            
+            return siev_manager.recalibrate_test(
+                siev_path, test_id, calibration_manager.get_calibration_parameters()
+            )
+            
+        except Exception as e:
+            print(f"Error recalibrando prueba {test_id}: {e}")
+            return False
+
+    def realign_test_imu(self, test_id):
+        """
+        Realinear el IMU de una prueba ya grabada con su stream crudo
+        
+        Args:
+            test_id: ID de la prueba
+            
+        Returns:
+            bool: True si se realineó
+        """
+        try:
+            siev_manager = self.main_window.siev_manager
+            siev_path = self.main_window.current_user_siev
+            
+            if not siev_manager or not siev_path:
+                raise Exception("Sistema de usuarios no disponible")
+            
+            return siev_manager.realign_test_imu(siev_path, test_id)
+            
+        except Exception as e:
+            print(f"Error realineando IMU de la prueba {test_id}: {e}")
+            return False
+
+    def analyze_head_impulses(self, test_id, eye='right', axis='x'):
+        """
+        Reprocesar los impulsos cefálicos (vHIT) de una prueba ya grabada
+        
+        Args:
+            test_id: ID de la prueba
+            eye: 'left' o 'right'
+            axis: 'x' (horizontal) o 'y' (vertical)
+            
+        Returns:
+            list: Impulsos detectados (ver HeadImpulseEngine)
+        """
+        try:
+            from utils.vhit_engine import analyze_recorded_impulses
+            
+            siev_manager = self.main_window.siev_manager
+            siev_path = self.main_window.current_user_siev
+            
+            if not siev_manager or not siev_path:
+                raise Exception("Sistema de usuarios no disponible")
+            
+            columns = siev_manager.extract_test_columns(
+                siev_path, test_id, ['timestamp', f'{eye}_eye_{axis}', f'imu_{axis}'])
+            if not columns:
+                return []
+            imu_stream = siev_manager.extract_test_imu_stream(siev_path, test_id)
             
-            print(f"Datos CSV preparados: {len(csv_data)} muestras")
-            return csv_data
+            impulses = analyze_recorded_impulses(columns, imu_stream, eye=eye, axis=axis)
+            print(f"Prueba {test_id}: {len(impulses)} impulsos cefálicos")
+            return impulses
             
         except Exception as e:
-            print(f"Error preparando datos CSV: {e}")
+            print(f"Error analizando impulsos de la prueba {test_id}: {e}")
             return []
 
+    def _prepare_columns(self, test_data):
+        """
+        Convertir las muestras de la prueba a columnas para SievManager
+        
+        Args:
+            test_data: Datos de la prueba desde data_storage
+            
+        Returns:
+            Dict[str, np.ndarray]: columna -> array (sin detección -> NaN),
+            con las columnas de SAMPLE_DTYPES
+        """
+        try:
+            import numpy as np
+            from utils.SievManager import SAMPLE_DTYPES
+            
+            samples = test_data.get('data', [])
+            columns = {}
+            for key, dtype in SAMPLE_DTYPES.items():
+                if dtype == 'bool':
+                    columns[key] = np.fromiter((bool(sample.get(key, False)) for sample in samples),
+                                               dtype=bool, count=len(samples))
+                else:
+                    values = (sample.get(key) for sample in samples)
+                    columns[key] = np.fromiter((np.nan if value is None else value for value in values),
+                                               dtype=np.float64, count=len(samples))
+            
+            print(f"Columnas preparadas: {len(samples)} muestras")
+            return columns
+            
+        except Exception as e:
+            print(f"Error preparando columnas: {e}")
+            return {}
+
+    def _prepare_imu_data(self, test_data):
+        """
+        Stream crudo del IMU (columnas) para SievManager
+        
+        Returns:
+            Dict[str, np.ndarray] o None si la prueba no tiene stream IMU
+        """
+        return test_data.get('imu_stream') or None
+
     def _get_test_metadata(self, test_id):
         """
         Obtener metadatos actuales de una prueba desde el tree widget
@@ -0,0 +1,362 @@
+"""
+Catálogo local (SQLite) de los archivos .siev.
+
+Guarda por archivo los datos del paciente, por prueba su tipo, fecha,
+evaluador y estado, y las métricas de los análisis guardados en el .siev
+(analysis/{test_id}.json). Buscar pacientes, listar expedientes o seguir la
+evolución de una métrica se responde con una consulta, sin abrir archivos.
+
+El catálogo es una caché: SievManager lo actualiza después de cada escritura
+y sync() reindexa en paralelo los archivos que cambiaron por fuera.
+"""
+
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    from utils.siev_container import SievContainer
+except ImportError:
+    from siev_container import SievContainer
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archivos (
+    ruta TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    tamano INTEGER,
+    nombre TEXT,
+    id_paciente TEXT,
+    edad INTEGER,
+    genero TEXT,
+    creado REAL,
+    actualizado REAL,
+    total_pruebas INTEGER
+);
+CREATE TABLE IF NOT EXISTS pruebas (
+    ruta TEXT,
+    test_id TEXT,
+    tipo TEXT,
+    fecha REAL,
+    hora_inicio REAL,
+    hora_fin REAL,
+    evaluador TEXT,
+    estado TEXT,
+    muestras INTEGER,
+    tiene_video INTEGER,
+    PRIMARY KEY (ruta, test_id)
+);
+CREATE TABLE IF NOT EXISTS metricas (
+    ruta TEXT,
+    test_id TEXT,
+    canal TEXT,
+    nombre TEXT,
+    valor REAL
+);
+CREATE INDEX IF NOT EXISTS idx_archivos_nombre ON archivos (nombre);
+CREATE INDEX IF NOT EXISTS idx_archivos_paciente ON archivos (id_paciente);
+CREATE INDEX IF NOT EXISTS idx_pruebas_fecha ON pruebas (fecha);
+CREATE INDEX IF NOT EXISTS idx_metricas_prueba ON metricas (ruta, test_id);
+CREATE INDEX IF NOT EXISTS idx_metricas_nombre ON metricas (nombre);
+"""
+
+
+def _number(value) -> Optional[float]:
+    """Convierte a float los valores numéricos (None para el resto)."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _sample_count(container: SievContainer, test_id: str) -> Optional[int]:
+    """Cantidad de muestras de una prueba (leyendo solo el encabezado .npy)."""
+    import numpy as np
+
+    name = f"data/{test_id}/timestamp.npy"
+    if name not in container:
+        return None
+    with container.open(name) as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, _ = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, _ = np.lib.format.read_array_header_2_0(f)
+    return shape[0] if shape else 0
+
+
+def index_archive(siev_path: str) -> Optional[Dict]:
+    """
+    Lee de un .siev lo que guarda el catálogo.
+
+    Función de módulo para poder ejecutarse en un pool de procesos. Solo
+    lee: un archivo con una actualización a medio recuperar se saltea (la
+    recuperación la hace el próximo acceso de escritura o lectura normal).
+
+    Returns:
+        {'archivo': {...}, 'pruebas': [...], 'metricas': [...]} o None si el
+        archivo no se pudo leer
+    """
+    try:
+        stat = os.stat(siev_path)
+        with SievContainer(siev_path, recover=False) as container:
+            try:
+                metadata = json.loads(container.read('metadata.json'))
+            except Exception:
+                metadata = json.loads(container.read('metadata_backup.json'))
+
+            usuario = metadata.get('usuario') or {}
+            info = metadata.get('metadata') or {}
+            tests = metadata.get('pruebas') or []
+
+            pruebas = []
+            metricas = []
+            for test in tests:
+                test_id = test.get('id')
+                archivos = test.get('archivos') or {}
+                pruebas.append((
+                    siev_path, test_id, test.get('tipo'), _number(test.get('fecha')),
+                    _number(test.get('hora_inicio')), _number(test.get('hora_fin')),
+                    test.get('evaluador'), test.get('estado'),
+                    _sample_count(container, test_id),
+                    int(f"videos/{test_id}.mp4" in container or bool(archivos.get('video')))
+                ))
+
+                # Métricas escalares de los análisis guardados
+                analysis_name = f"analysis/{test_id}.json"
+                if analysis_name in container:
+                    results = json.loads(container.read(analysis_name)).get('resultados') or {}
+                    for channel, values in results.items():
+                        if not isinstance(values, dict):
+                            continue
+                        for key, value in values.items():
+                            value = _number(value)
+                            if value is not None:
+                                metricas.append((siev_path, test_id, channel, key, value))
+
+        archivo = (
+            siev_path, stat.st_mtime_ns, stat.st_size, usuario.get('nombre'),
+            usuario.get('id_paciente'), usuario.get('edad'), usuario.get('genero'),
+            _number(info.get('creado')), _number(info.get('ultima_actualizacion')), len(tests)
+        )
+        return {'archivo': archivo, 'pruebas': pruebas, 'metricas': metricas}
+
+    except Exception as e:
+        print(f"Error indexando {siev_path}: {e}")
+        return None
+
+
+class SievCatalog:
+    """
+    Catálogo SQLite de expedientes .siev.
+
+    Cada operación abre su propia conexión, así que se puede usar desde la
+    UI y desde la cola de guardado a la vez.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: Ruta del archivo SQLite (se crea si no existe)
+        """
+        self.db_path = db_path
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Conexión con commit al salir del bloque (rollback si hubo error)."""
+        connection = sqlite3.connect(self.db_path, timeout=10.0)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _key(siev_path: str) -> str:
+        return os.path.normcase(os.path.abspath(siev_path))
+
+    # Escritura
+
+    def update_archive(self, siev_path: str) -> bool:
+        """Reindexa un archivo (llamado después de cada escritura)."""
+        entry = index_archive(self._key(siev_path))
+        if entry is None:
+            return False
+        self._store([entry])
+        return True
+
+    def remove_archive(self, siev_path: str):
+        """Quita un archivo del catálogo."""
+        self._delete([self._key(siev_path)])
+
+    def _store(self, entries: List[Dict]):
+        with self._write_lock, self._connect() as connection:
+            for entry in entries:
+                path = entry['archivo'][0]
+                connection.execute("DELETE FROM pruebas WHERE ruta = ?", (path,))
+                connection.execute("DELETE FROM metricas WHERE ruta = ?", (path,))
+                connection.execute(
+                    "INSERT OR REPLACE INTO archivos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    entry['archivo'])
+                connection.executemany(
+                    "INSERT OR REPLACE INTO pruebas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    entry['pruebas'])
+                connection.executemany(
+                    "INSERT INTO metricas VALUES (?, ?, ?, ?, ?)", entry['metricas'])
+
+    def _delete(self, paths: List[str]):
+        with self._write_lock, self._connect() as connection:
+            for table in ('archivos', 'pruebas', 'metricas'):
+                connection.executemany(f"DELETE FROM {table} WHERE ruta = ?",
+                                       [(path,) for path in paths])
+
+    def sync(self, directory: str, max_workers: Optional[int] = None, force: bool = False) -> int:
+        """
+        Pone al día el catálogo con los .siev de un directorio.
+
+        Solo se reindexan los archivos nuevos o cuyo mtime/tamaño cambió (todos
+        con force=True), en paralelo con un pool de procesos; los que ya no
+        existen se quitan.
+
+        Returns:
+            Cantidad de archivos reindexados
+        """
+        current = {}
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith('.siev'):
+                        stat = entry.stat()
+                        current[self._key(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+
+        directory_key = self._key(directory)
+        with self._connect() as connection:
+            known = {row['ruta']: (row['mtime_ns'], row['tamano'])
+                     for row in connection.execute("SELECT ruta, mtime_ns, tamano FROM archivos")
+                     if os.path.dirname(row['ruta']) == directory_key}
+
+        removed = [path for path in known if path not in current]
+        if removed:
+            self._delete(removed)
+
+        changed = [path for path, signature in current.items()
+                   if force or known.get(path) != signature]
+        if not changed:
+            return 0
+
+        entries = self._index_parallel(changed, max_workers)
+        self._store(entries)
+        print(f"Catálogo actualizado: {len(entries)} de {len(changed)} archivos indexados")
+        return len(entries)
+
+    def _index_parallel(self, paths: List[str], max_workers: Optional[int]) -> List[Dict]:
+        max_workers = min(max_workers or os.cpu_count() or 1, len(paths))
+        if max_workers <= 1 or len(paths) < 8:
+            entries = [index_archive(path) for path in paths]
+        else:
+            try:
+                # spawn: no heredar por fork los hilos y locks del proceso de la UI
+                with ProcessPoolExecutor(max_workers=max_workers,
+                                         mp_context=multiprocessing.get_context('spawn')) as pool:
+                    entries = list(pool.map(index_archive, paths,
+                                            chunksize=max(1, len(paths) // (4 * max_workers))))
+            except Exception as e:
+                # Sin pool disponible: indexado secuencial
+                print(f"Pool de procesos no disponible, indexado secuencial: {e}")
+                entries = [index_archive(path) for path in paths]
+        return [entry for entry in entries if entry is not None]
+
+    # Consultas
+
+    def list_archives(self, directory: Optional[str] = None) -> List[Dict]:
+        """Expedientes del catálogo (de un directorio), más recientes primero."""
+        query = "SELECT * FROM archivos"
+        parameters = ()
+        if directory is not None:
+            query += " WHERE ruta LIKE ? ESCAPE '\\'"
+            parameters = (self._like_prefix(directory),)
+        query += " ORDER BY mtime_ns DESC"
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(query, parameters)]
+
+    def search_patients(self, text: str = "", limit: int = 200) -> List[Dict]:
+        """
+        Busca expedientes por nombre o ID de paciente (sin distinguir mayúsculas).
+
+        Returns:
+            Expedientes con la fecha de su última prueba ('ultima_prueba')
+        """
+        pattern = f"%{text.strip()}%"
+        with self._connect() as connection:
+            rows = connection.execute(
+                """
+                SELECT archivos.*, MAX(pruebas.fecha) AS ultima_prueba
+                FROM archivos LEFT JOIN pruebas ON pruebas.ruta = archivos.ruta
+                WHERE archivos.nombre LIKE ? OR archivos.id_paciente LIKE ?
+                GROUP BY archivos.ruta
+                ORDER BY COALESCE(MAX(pruebas.fecha), archivos.actualizado) DESC
+                LIMIT ?
+                """, (pattern, pattern, limit))
+            return [dict(row) for row in rows]
+
+    def get_tests(self, siev_path: str) -> List[Dict]:
+        """Pruebas de un expediente ordenadas por fecha."""
+        with self._connect() as connection:
+            rows = connection.execute("SELECT * FROM pruebas WHERE ruta = ? ORDER BY fecha",
+                                      (self._key(siev_path),))
+            return [dict(row) for row in rows]
+
+    def get_trend(self, metric: str, siev_path: Optional[str] = None,
+                  patient_id: Optional[str] = None, test_type: Optional[str] = None,
+                  channel: Optional[str] = None) -> List[Dict]:
+        """
+        Evolución de una métrica de análisis en el tiempo.
+
+        Args:
+            metric: Nombre de la métrica (p.ej. 'vcl_promedio')
+            siev_path: Expediente, o patient_id para buscar en todos sus archivos
+            test_type: Filtrar por tipo de prueba
+            channel: Filtrar por canal
+
+        Returns:
+            [{'fecha', 'test_id', 'tipo', 'canal', 'valor', 'ruta'}, ...] por fecha
+        """
+        query = """
+            SELECT pruebas.fecha, pruebas.test_id, pruebas.tipo, metricas.canal,
+                   metricas.valor, metricas.ruta
+            FROM metricas
+            JOIN pruebas ON pruebas.ruta = metricas.ruta AND pruebas.test_id = metricas.test_id
+            JOIN archivos ON archivos.ruta = metricas.ruta
+            WHERE metricas.nombre = ?
+        """
+        parameters = [metric]
+        if siev_path is not None:
+            query += " AND metricas.ruta = ?"
+            parameters.append(self._key(siev_path))
+        if patient_id is not None:
+            query += " AND archivos.id_paciente = ?"
+            parameters.append(patient_id)
+        if test_type is not None:
+            query += " AND pruebas.tipo = ?"
+            parameters.append(test_type)
+        if channel is not None:
+            query += " AND metricas.canal = ?"
+            parameters.append(channel)
+        query += " ORDER BY pruebas.fecha"
+
+        with self._connect() as connection:
+            return [dict(row) for row in connection.execute(query, parameters)]
+
+    def _like_prefix(self, directory: str) -> str:
+        prefix = os.path.join(self._key(directory), '')
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return escaped + '%'
@@ -0,0 +1,745 @@
+"""
+Contenedor de archivos .siev.
+
+Formato actual: ZIP. Las actualizaciones agregan miembros al final del
+archivo y reescriben solo el directorio central, así que guardar una prueba
+cuesta lo que mide el cambio y no lo que mide el expediente completo. Un
+miembro reemplazado queda como espacio muerto hasta la próxima compactación;
+al leer, siempre gana la última versión de cada nombre.
+
+Las lecturas usan un índice en memoria (SievIndex) con nombre, offset,
+tamaño y CRC32 de cada miembro, así que leer un miembro es un seek directo.
+
+Formato legado: tar.gz. Se sigue leyendo tal cual y se convierte a ZIP la
+primera vez que se escribe (o de antemano con utils.siev_repack).
+"""
+
+import io
+import os
+import shutil
+import struct
+import tarfile
+import threading
+import time
+import warnings
+import zipfile
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+
+# Compactar cuando el espacio muerto supere esta fracción (y tamaño mínimo)
+COMPACT_DEAD_FRACTION = 0.5
+COMPACT_MIN_DEAD_BYTES = 1024 * 1024
+
+_COPY_CHUNK = 1024 * 1024
+
+# Miembros guardados sin comprimir: los videos/imágenes ya vienen comprimidos
+# (volver a comprimirlos cuesta CPU sin reducir el tamaño). Los .npy se
+# comprimen con deflate (~2.3x más chicos que el CSV con gzip, frente a ~1.6x
+# sin comprimir); solo se mapean en memoria los que quedaron sin comprimir
+# en archivos anteriores
+STORED_SUFFIXES = ('.mp4', '.avi', '.mkv', '.mov', '.jpg', '.png')
+
+# Los datos de los miembros sin comprimir empiezan en múltiplos de este valor
+STORED_ALIGNMENT = 64
+_ALIGNMENT_EXTRA_ID = 0xD935
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class SievLock:
+    """
+    Lock reentrante de un .siev entre hilos y entre procesos.
+
+    Entre hilos usa un RLock; entre procesos, un lock del sistema operativo
+    (fcntl/msvcrt) sobre {siev}.lock, tomado mientras algún hilo del proceso
+    tiene el RLock. El lock va en un archivo aparte porque el .siev se
+    reemplaza al compactar o reempaquetar.
+    """
+
+    def __init__(self, siev_path: str):
+        self.lock_path = siev_path + '.lock'
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = _lock_file(self.lock_path)
+            except Exception:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fd, self._fd = self._fd, None
+            _unlock_file(fd)
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def _lock_file(lock_path: str) -> int:
+    """Abre lock_path y toma su lock exclusivo (bloqueante)."""
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK se rinde después de 10 intentos: seguir esperando
+                    pass
+    except Exception:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _unlock_file(fd: int):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    finally:
+        os.close(fd)
+
+
+def siev_lock(siev_path: str) -> SievLock:
+    """
+    Lock de un .siev, compartido por los hilos del proceso y excluyente
+    entre procesos.
+
+    Las escrituras lo toman durante toda la actualización; las lecturas solo
+    mientras leen el directorio central (los datos de miembros existentes no
+    se tocan al agregar). La recuperación con el diario también se hace con
+    el lock tomado: si otro proceso tiene el diario abierto, está escribiendo.
+    """
+    key = os.path.normcase(os.path.abspath(siev_path))
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = SievLock(key)
+        return lock
+
+
+def is_legacy_siev(siev_path: str) -> bool:
+    """True si el archivo es un .siev tar.gz (formato legado)."""
+    with open(siev_path, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+
+def _journal_path(siev_path: str) -> str:
+    return siev_path + '.journal'
+
+
+def recover_siev(siev_path: str) -> bool:
+    """
+    Deshace una actualización interrumpida usando el diario.
+
+    Antes de agregar miembros se guarda la cola original del ZIP (directorio
+    central) y su posición; si el proceso se cortó a mitad de escritura, se
+    trunca el archivo en esa posición y se restaura la cola.
+
+    Returns:
+        True si hubo que recuperar el archivo
+    """
+    journal = _journal_path(siev_path)
+    if not os.path.exists(journal):
+        return False
+
+    with open(journal, 'rb') as f:
+        offset, = struct.unpack('<Q', f.read(8))
+        tail = f.read()
+    with open(siev_path, 'r+b') as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(tail)
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal)
+    print(f"ADVERTENCIA: Actualización interrumpida revertida en {siev_path}")
+    return True
+
+
+class MemberEntry:
+    """
+    Entrada del índice de miembros de un .siev.
+
+    offset es la posición de los datos dentro del archivo (ZIP) o dentro del
+    flujo descomprimido (tar.gz legado, donde no se puede hacer seek).
+    """
+
+    __slots__ = ('name', 'offset', 'size', 'compressed_size', 'compress_type',
+                 'crc32', 'mtime', 'header_offset')
+
+    def __init__(self, name, size, compressed_size, compress_type, crc32, mtime,
+                 header_offset=None, offset=None):
+        self.name = name
+        self.size = size
+        self.compressed_size = compressed_size
+        self.compress_type = compress_type
+        self.crc32 = crc32
+        self.mtime = mtime
+        self.header_offset = header_offset
+        self.offset = offset
+
+    @property
+    def stored(self) -> bool:
+        return self.compress_type == zipfile.ZIP_STORED
+
+
+class SievIndex:
+    """
+    Índice (tabla de contenidos) de un .siev: nombre -> MemberEntry.
+
+    En ZIP se construye desde el directorio central, que ya guarda nombre,
+    tamaños, posición del encabezado y CRC32; el offset de los datos se
+    resuelve leyendo el encabezado local la primera vez que se usa. Se guarda
+    en memoria por (ruta, mtime, tamaño), así que abrir una prueba no depende
+    del tamaño del expediente.
+    """
+
+    def __init__(self, siev_path: str, legacy: bool, entries: Dict[str, MemberEntry]):
+        self.path = siev_path
+        self.legacy = legacy
+        self.entries = entries
+        self._lock = threading.Lock()
+
+    def data_offset(self, entry: MemberEntry, f) -> int:
+        """Posición de los datos de un miembro ZIP (lee el encabezado local)."""
+        if entry.offset is None:
+            with self._lock:
+                f.seek(entry.header_offset)
+                header = f.read(_LOCAL_HEADER_SIZE)
+                if header[:4] != _LOCAL_HEADER_MAGIC:
+                    raise zipfile.BadZipFile(f"Encabezado inválido para {entry.name}")
+                name_length, extra_length = struct.unpack('<HH', header[26:30])
+                entry.offset = entry.header_offset + _LOCAL_HEADER_SIZE + name_length + extra_length
+        return entry.offset
+
+
+_LOCAL_HEADER_SIZE = 30
+_LOCAL_HEADER_MAGIC = b'PK\x03\x04'
+
+_index_cache = {}
+_index_cache_guard = threading.Lock()
+
+
+def get_index(siev_path: str) -> SievIndex:
+    """Índice del .siev, reconstruido solo si el archivo cambió."""
+    stat = os.stat(siev_path)
+    key = os.path.normcase(os.path.abspath(siev_path))
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _index_cache_guard:
+        cached = _index_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    index = _build_index(siev_path)
+    with _index_cache_guard:
+        _index_cache[key] = (signature, index)
+    return index
+
+
+def _build_index(siev_path: str) -> SievIndex:
+    if is_legacy_siev(siev_path):
+        entries = {}
+        with tarfile.open(siev_path, 'r:gz') as tar:
+            for member in tar.getmembers():
+                if member.isfile():
+                    entries[member.name] = MemberEntry(
+                        member.name, member.size, member.size, None, None,
+                        member.mtime, offset=member.offset_data)
+        return SievIndex(siev_path, True, entries)
+
+    entries = {}
+    with zipfile.ZipFile(siev_path, 'r') as archive:
+        # Con nombres repetidos gana la última versión
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            entries[info.filename] = MemberEntry(
+                info.filename, info.file_size, info.compress_size, info.compress_type,
+                info.CRC, time.mktime(info.date_time + (0, 0, -1)),
+                header_offset=info.header_offset)
+    return SievIndex(siev_path, False, entries)
+
+
+class _MemberRange(io.RawIOBase):
+    """Lectura con seek de un rango de bytes del archivo (miembro sin comprimir)."""
+
+    def __init__(self, path: str, offset: int, size: int):
+        self._file = open(path, 'rb')
+        self._start = offset
+        self._size = size
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self._size - self._position)
+        if count <= 0:
+            return 0
+        self._file.seek(self._start + self._position)
+        count = self._file.readinto(memoryview(buffer)[:count])
+        self._position += count
+        return count
+
+    def seek(self, position, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            position += self._position
+        elif whence == io.SEEK_END:
+            position += self._size
+        self._position = max(0, min(position, self._size))
+        return self._position
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+class _DeflatedMember(io.RawIOBase):
+    """Lectura secuencial de un miembro deflate sin cargarlo entero."""
+
+    def __init__(self, path: str, offset: int, compressed_size: int):
+        self._raw = _MemberRange(path, offset, compressed_size)
+        self._decompressor = zlib.decompressobj(-15)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = self._raw.read(_COPY_CHUNK)
+            if not chunk:
+                self._pending = self._decompressor.flush()
+                if not self._pending:
+                    return 0
+                break
+            self._pending = self._decompressor.decompress(chunk)
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+    def close(self):
+        self._raw.close()
+        super().close()
+
+
+class SievContainer:
+    """
+    Acceso de lectura a un .siev, sea ZIP o tar.gz legado.
+
+    Las consultas (nombres, tamaños) salen del índice en memoria y las
+    lecturas de miembros ZIP son seeks directos a su offset.
+
+    Se usa como context manager:
+        with SievContainer(path) as container:
+            metadata = container.read('metadata.json')
+    """
+
+    def __init__(self, siev_path: str, recover: bool = True):
+        """
+        Args:
+            siev_path: Ruta del archivo .siev
+            recover: Deshacer una actualización interrumpida antes de leer;
+                     con False el acceso es de solo lectura y un diario
+                     pendiente es un error
+        """
+        self.path = siev_path
+        with siev_lock(siev_path):
+            if recover:
+                recover_siev(siev_path)
+            elif os.path.exists(_journal_path(siev_path)):
+                raise RuntimeError(f"Actualización pendiente de recuperar en {siev_path}")
+            self.index = get_index(siev_path)
+        self.legacy = self.index.legacy
+        self._file = None
+        self._tar = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index.entries
+
+    def names(self) -> List[str]:
+        """Nombres de los miembros (una vez cada uno)."""
+        return list(self.index.entries)
+
+    def entry(self, name: str) -> Optional[MemberEntry]:
+        """Entrada del índice de un miembro, o None si no existe."""
+        return self.index.entries.get(name)
+
+    def info(self, name: str) -> Optional[Dict]:
+        """Tamaño, fecha y checksum de un miembro, o None si no existe."""
+        entry = self.index.entries.get(name)
+        if entry is None:
+            return None
+        return {'name': name, 'size': entry.size, 'mtime': entry.mtime, 'crc32': entry.crc32}
+
+    def member_range(self, name: str):
+        """
+        (offset, tamaño) de los bytes de un miembro sin comprimir dentro del
+        archivo, o None si el miembro está comprimido o el formato es legado.
+        """
+        entry = self.index.entries[name]
+        if self.legacy or not entry.stored:
+            return None
+        return self.index.data_offset(entry, self._handle()), entry.size
+
+    def _handle(self):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        return self._file
+
+    def _legacy_tar(self):
+        if self._tar is None:
+            self._tar = tarfile.open(self.path, 'r:gz')
+        return self._tar
+
+    def open(self, name: str):
+        """Archivo de lectura de un miembro (KeyError si no existe)."""
+        entry = self.index.entries[name]
+        if self.legacy:
+            return self._legacy_tar().extractfile(name)
+        offset = self.index.data_offset(entry, self._handle())
+        if entry.stored:
+            return io.BufferedReader(_MemberRange(self.path, offset, entry.size), _COPY_CHUNK)
+        return io.BufferedReader(_DeflatedMember(self.path, offset, entry.compressed_size),
+                                 _COPY_CHUNK)
+
+    def read(self, name: str, verify: bool = True) -> bytes:
+        """Contenido completo de un miembro (KeyError si no existe)."""
+        entry = self.index.entries[name]
+        if self.legacy:
+            return self._legacy_tar().extractfile(name).read()
+
+        f = self._handle()
+        f.seek(self.index.data_offset(entry, f))
+        data = f.read(entry.compressed_size)
+        if not entry.stored:
+            data = zlib.decompress(data, -15)
+        if verify and zlib.crc32(data) != entry.crc32:
+            raise zipfile.BadZipFile(f"Checksum inválido en {name}")
+        return data
+
+    def verify(self, name: str) -> bool:
+        """Comprueba el CRC32 de un miembro leyéndolo por bloques."""
+        entry = self.index.entries[name]
+        if self.legacy:
+            return True
+        crc = 0
+        with self.open(name) as f:
+            for chunk in iter(lambda: f.read(_COPY_CHUNK), b''):
+                crc = zlib.crc32(chunk, crc)
+        return crc == entry.crc32
+
+    def extract_all(self, output_dir: str):
+        """Extrae la última versión de cada miembro."""
+        for name in self.index.entries:
+            target = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with self.open(name) as source, open(target, 'wb') as dest:
+                shutil.copyfileobj(source, dest, _COPY_CHUNK)
+
+
+def _compress_type(name: str) -> int:
+    return zipfile.ZIP_STORED if name.endswith(STORED_SUFFIXES) else zipfile.ZIP_DEFLATED
+
+
+def _align_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, zip64: bool):
+    """
+    Rellena el campo extra de un miembro sin comprimir para que sus datos
+    empiecen en un offset múltiplo de STORED_ALIGNMENT.
+    """
+    if info.compress_type != zipfile.ZIP_STORED:
+        return
+    # El encabezado local se escribe en la posición actual de escritura
+    header_end = (archive.start_dir + _LOCAL_HEADER_SIZE + len(info.filename.encode('utf-8'))
+                  + 4 + (20 if zip64 else 0))
+    padding = -header_end % STORED_ALIGNMENT
+    info.extra = struct.pack('<HH', _ALIGNMENT_EXTRA_ID, padding) + b'\0' * padding
+
+
+def _write_member(archive: zipfile.ZipFile, name: str, data=None, file_path: str = None):
+    """Escribe un miembro desde bytes o desde un archivo (sin cargarlo en memoria)."""
+    info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+    info.compress_type = _compress_type(name)
+    if file_path is not None:
+        _align_member(archive, info, zip64=True)
+        with open(file_path, 'rb') as source, archive.open(info, 'w', force_zip64=True) as dest:
+            shutil.copyfileobj(source, dest, _COPY_CHUNK)
+    else:
+        _align_member(archive, info, zip64=len(data) * 1.05 > zipfile.ZIP64_LIMIT)
+        archive.writestr(info, data)
+
+
+def _write_members(archive: zipfile.ZipFile, members: Dict[str, bytes], files: Dict[str, str]):
+    with warnings.catch_warnings():
+        # Reemplazar un miembro es agregar otro con el mismo nombre
+        warnings.filterwarnings('ignore', message='Duplicate name')
+        for name, data in members.items():
+            _write_member(archive, name, data=data)
+        for name, file_path in files.items():
+            _write_member(archive, name, file_path=file_path)
+
+
+def create_siev(siev_path: str, members: Dict[str, bytes]):
+    """Crea un .siev ZIP nuevo (archivo temporal y reemplazo atómico)."""
+    temp_path = siev_path + "_temp"
+    try:
+        with zipfile.ZipFile(temp_path, 'w') as archive:
+            _write_members(archive, members, {})
+        with siev_lock(siev_path):
+            os.replace(temp_path, siev_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def update_siev(siev_path: str, members: Dict[str, bytes] = None,
+               files: Dict[str, str] = None, remove=()):
+    """
+    Agrega o reemplaza miembros de un .siev.
+
+    ZIP: se agregan al final en el mismo archivo, protegidos por el diario.
+    tar.gz legado: se convierte a ZIP una única vez, incluyendo los cambios.
+
+    Args:
+        siev_path: Ruta del archivo .siev
+        members: Nombre -> contenido en bytes
+        files: Nombre -> ruta de un archivo a copiar (p.ej. videos)
+        remove: Nombres a quitar del directorio (sus bytes quedan como espacio
+                muerto); se aplica junto con la escritura de members/files
+    """
+    members = members or {}
+    files = files or {}
+    remove = set(remove) - set(members) - set(files)
+    with siev_lock(siev_path):
+        _update_locked(siev_path, members, files, remove)
+
+
+def _update_locked(siev_path: str, members: Dict[str, bytes], files: Dict[str, str],
+                   remove=frozenset()):
+    """Cuerpo de update_siev (con el lock del archivo tomado)."""
+    recover_siev(siev_path)
+
+    if is_legacy_siev(siev_path):
+        _convert_legacy(siev_path, members, files, remove)
+        return
+
+    with zipfile.ZipFile(siev_path, 'r') as archive:
+        central_directory = archive.start_dir
+
+    journal = _journal_path(siev_path)
+    journal_temp = journal + "_temp"
+    with open(siev_path, 'rb') as f:
+        f.seek(central_directory)
+        tail = f.read()
+    with open(journal_temp, 'wb') as f:
+        f.write(struct.pack('<Q', central_directory))
+        f.write(tail)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(journal_temp, journal)
+
+    with zipfile.ZipFile(siev_path, 'a') as archive:
+        _write_members(archive, members, files)
+        if remove:
+            # El directorio central se reescribe al cerrar, sin estas entradas
+            archive.filelist = [info for info in archive.filelist if info.filename not in remove]
+            for name in remove:
+                archive.NameToInfo.pop(name, None)
+    with open(siev_path, 'rb+') as f:
+        os.fsync(f.fileno())
+    os.remove(journal)
+
+    if _dead_bytes(siev_path) > max(COMPACT_MIN_DEAD_BYTES,
+                                    COMPACT_DEAD_FRACTION * os.path.getsize(siev_path)):
+        compact_siev(siev_path)
+
+
+def _dead_bytes(siev_path: str) -> int:
+    """Bytes ocupados por versiones reemplazadas o quitadas de miembros."""
+    with zipfile.ZipFile(siev_path, 'r') as archive:
+        latest = {info.filename: info for info in archive.infolist()}
+        live = sum(_member_span(info) for info in latest.values())
+        return max(0, archive.start_dir - live)
+
+
+def _member_span(info: zipfile.ZipInfo) -> int:
+    """Bytes que ocupa un miembro en el archivo (encabezado local y datos)."""
+    span = (_LOCAL_HEADER_SIZE + len(info.filename.encode('utf-8')) + len(info.extra)
+            + info.compress_size)
+    if info.extract_version >= 45:
+        # El encabezado local ZIP64 lleva tamaños que el directorio central omite
+        span += 20
+    if info.flag_bits & 0x08:
+        # Descriptor de datos al final del miembro
+        span += 24 if info.extract_version >= 45 else 16
+    return span
+
+
+def compact_siev(siev_path: str):
+    """Reescribe el .siev conservando solo la última versión de cada miembro."""
+    temp_path = siev_path + "_temp"
+    try:
+        with siev_lock(siev_path):
+            with SievContainer(siev_path) as source, zipfile.ZipFile(temp_path, 'w') as target:
+                _copy_members(source, target)
+            os.replace(temp_path, siev_path)
+        print(f"Archivo .siev compactado: {siev_path}")
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _copy_members(source: SievContainer, target: zipfile.ZipFile, exclude=(),
+                  verify: bool = False):
+    """
+    Copia la última versión de cada miembro de source a target.
+
+    Con verify, el CRC32 de lo copiado se compara con el del directorio
+    central de source (ZIP) y con el que target registra al escribirlo.
+    """
+    for name in source.names():
+        if name in exclude:
+            continue
+        entry = source.entry(name)
+        info = zipfile.ZipInfo(name, date_time=time.localtime(entry.mtime)[:6])
+        info.compress_type = _compress_type(name)
+        _align_member(target, info, zip64=True)
+        crc = 0
+        with source.open(name) as src, target.open(info, 'w', force_zip64=True) as dest:
+            for chunk in iter(lambda: src.read(_COPY_CHUNK), b''):
+                dest.write(chunk)
+                if verify:
+                    crc = zlib.crc32(chunk, crc)
+        if verify and (info.CRC != crc or (not source.legacy and crc != entry.crc32)):
+            raise zipfile.BadZipFile(f"Checksum inválido al copiar {name}")
+
+
+def needs_repack(siev_path: str) -> bool:
+    """
+    True si el .siev no está en el formato actual: tar.gz legado, espacio
+    muerto, o miembros con compresión o alineación distinta a la actual.
+    """
+    with siev_lock(siev_path):
+        recover_siev(siev_path)
+        if is_legacy_siev(siev_path):
+            return True
+        if _dead_bytes(siev_path) > 0:
+            return True
+        with SievContainer(siev_path) as container:
+            f = container._handle()
+            for name, entry in container.index.entries.items():
+                if entry.compress_type != _compress_type(name):
+                    return True
+                if entry.stored and container.index.data_offset(entry, f) % STORED_ALIGNMENT:
+                    return True
+    return False
+
+
+def repack_siev(siev_path: str, members: Dict[str, bytes] = None,
+                files: Dict[str, str] = None, remove=()):
+    """
+    Reescribe el .siev completo en el formato actual (ZIP compacto, miembros
+    alineados) aplicando cambios, como update_siev.
+
+    La copia se escribe en un archivo temporal y se verifica (CRC32 de cada
+    miembro copiado contra el original y relectura completa de la copia)
+    antes de reemplazar el original; si algo no coincide el original queda
+    intacto.
+    """
+    members = members or {}
+    files = files or {}
+    exclude = set(members) | set(files) | set(remove)
+    temp_path = siev_path + "_temp"
+    with siev_lock(siev_path):
+        try:
+            with SievContainer(siev_path) as source:
+                signature = os.stat(siev_path).st_mtime_ns, os.path.getsize(siev_path)
+                with zipfile.ZipFile(temp_path, 'w') as target:
+                    _copy_members(source, target, exclude=exclude, verify=True)
+                    _write_members(target, members, files)
+
+            with zipfile.ZipFile(temp_path, 'r') as archive:
+                bad_member = archive.testzip()
+            if bad_member is not None:
+                raise zipfile.BadZipFile(f"Checksum inválido en la copia: {bad_member}")
+
+            # Otro proceso pudo escribir mientras se copiaba
+            if (os.stat(siev_path).st_mtime_ns, os.path.getsize(siev_path)) != signature:
+                raise RuntimeError("El archivo cambió durante el reempaquetado")
+
+            with open(temp_path, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(temp_path, siev_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+
+def _convert_legacy(siev_path: str, members: Dict[str, bytes], files: Dict[str, str],
+                    remove=frozenset()):
+    """Convierte un .siev tar.gz a ZIP aplicando los cambios pendientes."""
+    temp_path = siev_path + "_temp"
+    try:
+        with SievContainer(siev_path) as source, zipfile.ZipFile(temp_path, 'w') as target:
+            _copy_members(source, target, exclude=set(members) | set(files) | set(remove))
+            _write_members(target, members, files)
+        os.replace(temp_path, siev_path)
+        print(f"Archivo .siev convertido a formato ZIP: {siev_path}")
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,163 @@
+"""
+Reempaquetado masivo de archivos .siev.
+
+Convierte un directorio completo de expedientes al formato actual (ZIP con
+las muestras en columnas .npy, ver SievManager.repack_siev) repartiendo los
+archivos en un pool de procesos. Cada archivo se reescribe en un temporal
+que se verifica antes de reemplazar el original, así que el proceso se puede
+interrumpir y volver a lanzar: los archivos ya convertidos se saltan.
+
+Uso (desde src/):
+    python -m utils.siev_repack [directorio] [--workers N] [--dry-run]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+try:
+    from utils.SievManager import SievManager
+except ImportError:
+    from SievManager import SievManager
+
+
+# Gestor del proceso de trabajo (uno por proceso del pool)
+_manager = None
+
+
+def _worker_manager(base_path: str) -> SievManager:
+    global _manager
+    if _manager is None or _manager.base_path != base_path:
+        _manager = SievManager(base_path)
+    return _manager
+
+
+def repack_file(siev_path: str, dry_run: bool = False) -> Dict:
+    """
+    Reempaqueta un archivo si no está en el formato actual.
+
+    Función de módulo para poder ejecutarse en un pool de procesos.
+
+    Returns:
+        Resultado de SievManager.repack_siev más 'ruta', 'estado'
+        ('convertido', 'pendiente', 'al dia' o 'error') y 'segundos'
+    """
+    start = time.perf_counter()
+    size = os.path.getsize(siev_path)
+    result = {'ruta': siev_path, 'bytes_antes': size, 'bytes_despues': size,
+              'pruebas_convertidas': 0, 'muestras': 0, 'advertencias': []}
+    try:
+        manager = _worker_manager(os.path.dirname(os.path.abspath(siev_path)))
+        if not manager.needs_repack(siev_path):
+            result['estado'] = 'al dia'
+        elif dry_run:
+            result['estado'] = 'pendiente'
+        else:
+            result.update(manager.repack_siev(siev_path))
+            result['estado'] = 'convertido' if result['reempaquetado'] else 'al dia'
+    except Exception as e:
+        result['estado'] = 'error'
+        result['advertencias'].append(str(e))
+    result['segundos'] = time.perf_counter() - start
+    return result
+
+
+def repack_directory(directory: str, max_workers: Optional[int] = None,
+                     dry_run: bool = False) -> List[Dict]:
+    """
+    Reempaqueta en paralelo todos los .siev de un directorio.
+
+    Los archivos más grandes se envían primero para repartir mejor la carga
+    entre procesos. Al terminar se pone al día el catálogo del directorio.
+
+    Returns:
+        Resultados de repack_file, en orden de finalización
+    """
+    paths = [entry.path for entry in os.scandir(directory)
+             if entry.is_file() and entry.name.endswith('.siev')]
+    paths.sort(key=os.path.getsize, reverse=True)
+    total = len(paths)
+    total_bytes = sum(os.path.getsize(path) for path in paths)
+    print(f"Reempaquetando {total} archivos ({total_bytes / 1e6:.1f} MB) en {directory}")
+
+    results = []
+    start = time.perf_counter()
+
+    def report(result):
+        results.append(result)
+        line = (f"[{len(results)}/{total}] {os.path.basename(result['ruta'])}: {result['estado']}"
+                f" ({result['bytes_antes'] / 1e6:.1f} MB")
+        if result['estado'] == 'convertido':
+            line += (f" -> {result['bytes_despues'] / 1e6:.1f} MB, "
+                     f"{result['pruebas_convertidas']} pruebas CSV")
+        line += f", {result['segundos']:.2f}s)"
+        print(line)
+        for warning in result['advertencias']:
+            print(f"    ADVERTENCIA: {warning}")
+
+    max_workers = min(max_workers or os.cpu_count() or 1, max(1, total))
+    try:
+        if max_workers <= 1:
+            raise RuntimeError("un solo proceso")
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(repack_file, path, dry_run) for path in paths]
+            for future in as_completed(futures):
+                report(future.result())
+    except Exception as e:
+        # Sin pool disponible: seguir secuencialmente con lo que falte
+        if max_workers > 1:
+            print(f"Pool de procesos no disponible, reempaquetado secuencial: {e}")
+        done = {result['ruta'] for result in results}
+        for path in paths:
+            if path not in done:
+                report(repack_file(path, dry_run))
+
+    elapsed = time.perf_counter() - start
+    converted = [result for result in results if result['estado'] == 'convertido']
+    processed_bytes = sum(result['bytes_antes'] for result in converted)
+    samples = sum(result['muestras'] for result in converted)
+    counts = {}
+    for result in results:
+        counts[result['estado']] = counts.get(result['estado'], 0) + 1
+
+    print(f"Terminado en {elapsed:.1f}s: " +
+          ", ".join(f"{count} {state}" for state, count in sorted(counts.items())))
+    if converted and elapsed > 0:
+        saved = processed_bytes - sum(result['bytes_despues'] for result in converted)
+        print(f"Rendimiento: {len(converted) / elapsed:.1f} archivos/s, "
+              f"{processed_bytes / 1e6 / elapsed:.1f} MB/s, {samples / elapsed:.0f} muestras/s "
+              f"(ahorro {saved / 1e6:.1f} MB)")
+
+    if converted and not dry_run:
+        manager = _worker_manager(os.path.abspath(directory))
+        if manager.catalog is not None:
+            manager.catalog.sync(directory, max_workers=max_workers)
+
+    return results
+
+
+def main(argv=None) -> int:
+    """Punto de entrada de línea de comandos"""
+    parser = argparse.ArgumentParser(
+        description="Convierte los archivos .siev de un directorio al formato actual")
+    parser.add_argument('directory', nargs='?', default=os.path.expanduser("~/siev_data/users"),
+                        help="Directorio con los archivos .siev")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Procesos en paralelo (por defecto, uno por CPU)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Solo listar los archivos que se convertirían")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.directory):
+        print(f"Directorio no encontrado: {args.directory}")
+        return 2
+
+    results = repack_directory(args.directory, args.workers, args.dry_run)
+    return 1 if any(result['estado'] == 'error' for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
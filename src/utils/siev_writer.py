@@ -0,0 +1,184 @@
+from PySide6.QtCore import QThread, Signal
+import os
+import threading
+import time
+
+
+class SievSaveQueue(QThread):
+    """
+    Cola de guardado en segundo plano para archivos .siev.
+
+    Los guardados (datos de una prueba al finalizarla, su video, metadatos)
+    se encolan y la UI sigue respondiendo. Los cambios pendientes de un mismo
+    archivo se combinan por prueba y se escriben con una sola llamada a
+    SievManager.add_tests_to_siev, que agrega los miembros al final del
+    .siev protegido por el diario (un corte a mitad de escritura deja el
+    archivo como estaba).
+    """
+
+    # (ruta .siev, pasos hechos, pasos totales) del lote en curso
+    save_progress = Signal(str, int, int)
+    # (ruta .siev, éxito, mensaje)
+    save_finished = Signal(str, bool, str)
+
+    def __init__(self, siev_manager, coalesce_delay=0.3):
+        """
+        Args:
+            siev_manager: SievManager que realiza las escrituras
+            coalesce_delay: Segundos sin cambios nuevos de un archivo antes de
+                            escribirlo (junta datos y video de la misma prueba)
+        """
+        super().__init__()
+        self.siev_manager = siev_manager
+        self.coalesce_delay = coalesce_delay
+
+        # ruta -> {test_id: cambio combinado}, en orden de llegada
+        self._pending = {}
+        self._last_change = {}
+        self._writing = 0
+        self._condition = threading.Condition()
+        self._running = True
+
+    def enqueue(self, siev_path, test_data, columns=None, imu_data=None,
+                video_path=None, cleanup=None):
+        """
+        Encola un cambio de prueba (mismos datos que SievManager.add_test_to_siev).
+
+        Args:
+            siev_path: Ruta del archivo .siev
+            test_data: Metadatos de la prueba (debe incluir 'id')
+            columns: Columnas de muestras
+            imu_data: Stream crudo del IMU
+            video_path: Video a incorporar
+            cleanup: Archivos temporales a borrar cuando el guardado termine
+        """
+        test_id = test_data.get('id')
+        with self._condition:
+            changes = self._pending.setdefault(siev_path, {})
+            change = changes.get(test_id)
+            if change is None:
+                change = changes[test_id] = {'test_data': {}, 'cleanup': []}
+
+            # Combinar con lo pendiente: gana lo más reciente
+            metadata_prueba = test_data.get('metadata_prueba')
+            if metadata_prueba:
+                merged = dict(change['test_data'].get('metadata_prueba') or {})
+                merged.update(metadata_prueba)
+                test_data = dict(test_data, metadata_prueba=merged)
+            if test_data.get('tipo') == 'video_update' and change['test_data'].get('tipo'):
+                test_data = dict(test_data, tipo=change['test_data']['tipo'])
+            change['test_data'].update(test_data)
+
+            if columns is not None:
+                change['columns'] = columns
+            if imu_data is not None:
+                change['imu_data'] = imu_data
+            if video_path is not None:
+                change['video_path'] = video_path
+            change['cleanup'].extend(cleanup or [])
+
+            self._last_change[siev_path] = time.monotonic()
+            self._condition.notify_all()
+
+        print(f"Guardado encolado: {test_id} -> {os.path.basename(siev_path)}")
+
+    def pending(self, siev_path=None) -> int:
+        """Cantidad de pruebas con cambios sin escribir (de un archivo o de todos)."""
+        with self._condition:
+            if siev_path is not None:
+                return len(self._pending.get(siev_path, {}))
+            return sum(len(changes) for changes in self._pending.values())
+
+    def flush(self, timeout=None) -> bool:
+        """
+        Espera a que se escriban todos los cambios encolados.
+
+        Returns:
+            True si la cola quedó vacía antes del timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            # No esperar la pausa de combinación: escribir ya lo pendiente
+            for siev_path in self._last_change:
+                self._last_change[siev_path] = -float('inf')
+            self._condition.notify_all()
+
+            while self._pending or self._writing:
+                if not self.isRunning():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+        return True
+
+    def stop(self, timeout=None):
+        """Escribe lo pendiente y termina el hilo."""
+        self.flush(timeout)
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                siev_path = self._next_ready()
+                if siev_path is None:
+                    if not self._running:
+                        break
+                    continue
+                changes = list(self._pending.pop(siev_path).values())
+                self._last_change.pop(siev_path, None)
+                self._writing += 1
+
+            try:
+                self._write(siev_path, changes)
+            finally:
+                with self._condition:
+                    self._writing -= 1
+                    self._condition.notify_all()
+
+    def _next_ready(self):
+        """
+        Archivo listo para escribir, esperando la pausa de combinación.
+        Se llama con el lock tomado; retorna None si hay que volver a mirar.
+        """
+        if not self._pending:
+            if self._running:
+                self._condition.wait()
+            return None
+
+        now = time.monotonic()
+        siev_path = min(self._pending, key=lambda path: self._last_change.get(path, now))
+        wait = self._last_change.get(siev_path, now) + self.coalesce_delay - now
+        if wait > 0 and self._running:
+            self._condition.wait(wait)
+            return None
+        return siev_path
+
+    def _write(self, siev_path, changes):
+        """Escribe un lote de cambios de un archivo."""
+        test_ids = ', '.join(str(change['test_data'].get('id')) for change in changes)
+        try:
+            start = time.perf_counter()
+            self.siev_manager.add_tests_to_siev(
+                siev_path, changes,
+                progress=lambda done, total: self.save_progress.emit(siev_path, done, total)
+            )
+            message = f"Guardado en .siev: {test_ids} ({time.perf_counter() - start:.2f}s)"
+            print(message)
+            success = True
+
+            for change in changes:
+                for path in change['cleanup']:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        except Exception as e:
+            message = f"Error guardando {test_ids} en .siev: {e}"
+            print(message)
+            success = False
+
+        self.save_finished.emit(siev_path, success, message)
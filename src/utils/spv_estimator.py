@@ -0,0 +1,128 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+
+class SlowPhaseVelocityEstimator:
+    """
+    Estimador incremental de la velocidad de componente lenta (VCL / SPV).
+
+    Por cada muestra calcula la velocidad ocular por diferencia finita, la
+    suaviza con un paso-bajo de primer orden, descarta las fases rápidas
+    (umbral de velocidad más un tiempo de guarda tras cada sacada) y acumula
+    la velocidad de fase lenta. Cada 1/output_rate segundos emite el promedio
+    de la ventana. El costo por muestra es constante.
+
+    También registra la culminación (máxima |VCL|) de cada fase configurada.
+    """
+
+    def __init__(self, output_rate: float = 10.0, saccade_threshold: float = 40.0,
+                 guard_time: float = 0.05, cutoff_hz: float = 10.0,
+                 min_slow_fraction: float = 0.3, phase_config: Optional[Dict] = None):
+        """
+        Args:
+            output_rate: Frecuencia de salida de la VCL en Hz
+            saccade_threshold: Velocidad (°/s) a partir de la cual se considera fase rápida
+            guard_time: Segundos descartados después de cada fase rápida
+            cutoff_hz: Frecuencia de corte del suavizado de velocidad
+            min_slow_fraction: Fracción mínima de muestras lentas para emitir una ventana
+            phase_config: Fases {'nombre': {'start': s, 'end': s, ...}} para culminaciones
+        """
+        self.period = 1.0 / output_rate
+        self.saccade_threshold = saccade_threshold
+        self.guard_time = guard_time
+        self.tau = 1.0 / (2 * math.pi * cutoff_hz)
+        self.min_slow_fraction = min_slow_fraction
+        self.phase_config = dict(phase_config or {})
+        self.reset()
+
+    def reset(self):
+        """Reinicia el estado (nueva sesión)."""
+        self._prev_time = None
+        self._prev_position = None
+        self._velocity = None
+        self._guard_until = -math.inf
+
+        self._window_end = None
+        self._window_samples = 0
+        self._slow_samples = 0
+        self._slow_sum = 0.0
+
+        self.culminations = {}
+
+    def set_phase_config(self, phase_config: Dict):
+        """Actualiza las fases usadas para las culminaciones."""
+        self.phase_config = dict(phase_config or {})
+
+    def add_sample(self, timestamp: float, position: Optional[float]) -> List[Tuple[float, float]]:
+        """
+        Procesa una muestra de posición calibrada.
+
+        Args:
+            timestamp: Tiempo en segundos
+            position: Posición en grados, o None si no hubo detección
+
+        Returns:
+            Lista (normalmente vacía o de un elemento) de puntos (tiempo, VCL)
+            cuya ventana se cerró con esta muestra
+        """
+        outputs = self._close_windows(timestamp)
+
+        if position is None or not math.isfinite(position):
+            # Sin detección (parpadeo): no derivar a través del hueco
+            self._prev_time = None
+            self._velocity = None
+            return outputs
+
+        if self._prev_time is not None and timestamp > self._prev_time:
+            dt = timestamp - self._prev_time
+            raw_velocity = (position - self._prev_position) / dt
+
+            if self._velocity is None:
+                self._velocity = raw_velocity
+            else:
+                alpha = dt / (dt + self.tau)
+                self._velocity += alpha * (raw_velocity - self._velocity)
+
+            self._window_samples += 1
+            if abs(raw_velocity) > self.saccade_threshold or abs(self._velocity) > self.saccade_threshold:
+                # Fase rápida: descartar también el tiempo de guarda siguiente
+                self._guard_until = timestamp + self.guard_time
+            elif timestamp >= self._guard_until:
+                self._slow_samples += 1
+                self._slow_sum += self._velocity
+
+        self._prev_time = timestamp
+        self._prev_position = position
+        return outputs
+
+    def _close_windows(self, timestamp: float) -> List[Tuple[float, float]]:
+        """Cierra la ventana actual si timestamp ya pasó su final."""
+        if self._window_end is None:
+            self._window_end = timestamp + self.period
+            return []
+        if timestamp < self._window_end:
+            return []
+
+        outputs = []
+        if (self._slow_samples > 0 and
+                self._slow_samples >= self.min_slow_fraction * self._window_samples):
+            point = (self._window_end - self.period / 2, self._slow_sum / self._slow_samples)
+            self._track_culmination(*point)
+            outputs.append(point)
+
+        # Saltar las ventanas vacías si hubo un hueco largo
+        skipped = math.floor((timestamp - self._window_end) / self.period)
+        self._window_end += (skipped + 1) * self.period
+        self._window_samples = 0
+        self._slow_samples = 0
+        self._slow_sum = 0.0
+        return outputs
+
+    def _track_culmination(self, timestamp: float, spv: float):
+        """Actualiza la culminación de la fase que contiene timestamp."""
+        for phase_name, config in self.phase_config.items():
+            if config['start'] <= timestamp <= config['end']:
+                current = self.culminations.get(phase_name)
+                if current is None or abs(spv) > abs(current['spv']):
+                    self.culminations[phase_name] = {'time': timestamp, 'spv': spv}
+                break
@@ -0,0 +1,326 @@
+"""
+Motor de análisis de impulsos cefálicos (vHIT).
+
+Recibe la velocidad de cabeza y la velocidad ocular ya alineadas en el tiempo
+(ver utils.imu_timeline) y detecta los impulsos por umbral de velocidad y de
+aceleración de cabeza. Por cada impulso calcula la ganancia del reflejo
+vestíbulo-oculomotor y marca las sacadas correctoras encubiertas (durante el
+impulso) y manifiestas (después). Los resultados se entregan a medida que
+cada impulso termina; el trabajo por bloque es vectorizado.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    from utils.imu_timeline import align_imu_to_eye
+except ImportError:
+    from imu_timeline import align_imu_to_eye
+
+
+class HeadImpulseEngine:
+    """
+    Detector incremental de impulsos cefálicos.
+
+    Las muestras llegan en bloques (add_samples / add_positions). Un impulso
+    se confirma cuando la velocidad de cabeza supera peak_threshold con una
+    aceleración mayor que acceleration_threshold, y se entrega cuando ya pasó
+    post_window tras su final (para poder ver las sacadas manifiestas).
+    """
+
+    def __init__(self, peak_threshold: float = 120.0, onset_threshold: float = 20.0,
+                 acceleration_threshold: float = 1000.0, saccade_threshold: float = 50.0,
+                 min_duration: float = 0.05, max_duration: float = 0.4,
+                 post_window: float = 0.4, pre_window: float = 0.3,
+                 gain_latency: float = 0.06):
+        """
+        Args:
+            peak_threshold: Velocidad pico de cabeza mínima (°/s)
+            onset_threshold: Velocidad que marca el inicio y fin del impulso (°/s)
+            acceleration_threshold: Aceleración pico mínima de cabeza (°/s²)
+            saccade_threshold: Exceso de velocidad ocular compensatoria sobre la
+                               cabeza para considerar una sacada (°/s)
+            min_duration: Duración mínima del impulso (s)
+            max_duration: Duración máxima del impulso (s)
+            post_window: Tiempo tras el impulso en que se buscan sacadas manifiestas (s)
+            pre_window: Historia conservada antes del punto de búsqueda (s)
+            gain_latency: Tiempo desde el inicio para la ganancia instantánea (s)
+        """
+        self.peak_threshold = peak_threshold
+        self.onset_threshold = onset_threshold
+        self.acceleration_threshold = acceleration_threshold
+        self.saccade_threshold = saccade_threshold
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.post_window = post_window
+        self.pre_window = pre_window
+        self.gain_latency = gain_latency
+        self.reset()
+
+    def reset(self):
+        """Reinicia el estado (nueva sesión)."""
+        self._times = np.empty(0)
+        self._head = np.empty(0)
+        self._eye = np.empty(0)
+        self._scan = 0
+        self._last_position = None
+        self.impulses = []
+
+    # ------------------------------------------------------------------
+    # Entrada
+    # ------------------------------------------------------------------
+
+    def add_positions(self, times, head_angle, eye_position) -> List[Dict]:
+        """
+        Añade un bloque de posiciones y deriva las velocidades.
+
+        La primera muestra del bloque se deriva contra la última del bloque
+        anterior, así que los bloques pueden ser de cualquier tamaño.
+
+        Args:
+            times: Tiempos en segundos (crecientes)
+            head_angle: Ángulo de cabeza en grados
+            eye_position: Posición ocular en grados (NaN sin detección)
+
+        Returns:
+            Impulsos completados con este bloque
+        """
+        times = np.asarray(times, dtype=np.float64)
+        head_angle = np.asarray(head_angle, dtype=np.float64)
+        eye_position = np.asarray(eye_position, dtype=np.float64)
+        if len(times) == 0:
+            return []
+
+        if self._last_position is not None:
+            last_time, last_head, last_eye = self._last_position
+            all_times = np.concatenate(([last_time], times))
+            all_head = np.concatenate(([last_head], head_angle))
+            all_eye = np.concatenate(([last_eye], eye_position))
+        else:
+            all_times = np.concatenate((times[:1], times))
+            all_head = np.concatenate((head_angle[:1], head_angle))
+            all_eye = np.concatenate((eye_position[:1], eye_position))
+        self._last_position = (times[-1], head_angle[-1], eye_position[-1])
+
+        dt = np.diff(all_times)
+        dt[dt <= 0] = np.nan
+        # El yaw salta de +180 a -180: derivar la diferencia envuelta
+        head_step = (np.diff(all_head) + 180.0) % 360.0 - 180.0
+        head_velocity = np.nan_to_num(head_step / dt)
+        eye_velocity = np.diff(all_eye) / dt
+
+        return self.add_samples(times, head_velocity, eye_velocity)
+
+    def add_samples(self, times, head_velocity, eye_velocity) -> List[Dict]:
+        """
+        Añade un bloque de velocidades alineadas.
+
+        Args:
+            times: Tiempos en segundos (crecientes)
+            head_velocity: Velocidad de cabeza en °/s
+            eye_velocity: Velocidad ocular en °/s (NaN sin detección)
+
+        Returns:
+            Impulsos completados con este bloque
+        """
+        self._times = np.concatenate((self._times, np.asarray(times, dtype=np.float64)))
+        self._head = np.concatenate((self._head, np.asarray(head_velocity, dtype=np.float64)))
+        self._eye = np.concatenate((self._eye, np.asarray(eye_velocity, dtype=np.float64)))
+        return self._process(final=False)
+
+    def flush(self) -> List[Dict]:
+        """Entrega los impulsos pendientes aunque su ventana posterior esté incompleta."""
+        return self._process(final=True)
+
+    # ------------------------------------------------------------------
+    # Detección
+    # ------------------------------------------------------------------
+
+    def _process(self, final: bool) -> List[Dict]:
+        """Busca impulsos completos desde la posición de búsqueda."""
+        times, head = self._times, self._head
+        n = len(times)
+        completed = []
+
+        while self._scan < n:
+            above = np.flatnonzero(np.abs(head[self._scan:]) >= self.peak_threshold)
+            if above.size == 0:
+                self._scan = n
+                break
+
+            crossing = self._scan + above[0]
+            direction = 1.0 if head[crossing] > 0 else -1.0
+            directed = direction * head
+
+            below_before = np.flatnonzero(directed[:crossing] < self.onset_threshold)
+            start = below_before[-1] if below_before.size else 0
+            below_after = np.flatnonzero(directed[crossing:] < self.onset_threshold)
+
+            if below_after.size == 0:
+                if final or times[-1] - times[start] > self.max_duration:
+                    # Movimiento sostenido (no es un impulso) o fin de datos
+                    self._scan = n
+                    continue
+                self._scan = crossing
+                break
+
+            end = crossing + below_after[0]
+            if not final and times[-1] < times[end] + self.post_window:
+                self._scan = crossing
+                break
+
+            impulse = self._measure(start, end, direction)
+            if impulse is not None:
+                self.impulses.append(impulse)
+                completed.append(impulse)
+            self._scan = end
+
+        self._trim()
+        return completed
+
+    def _trim(self):
+        """Descarta la historia anterior a pre_window antes del punto de búsqueda."""
+        if self._scan == 0:
+            return
+        reference = self._times[min(self._scan, len(self._times) - 1)]
+        keep_from = min(self._scan, int(np.searchsorted(self._times, reference - self.pre_window)))
+        if keep_from > 0:
+            self._times = self._times[keep_from:]
+            self._head = self._head[keep_from:]
+            self._eye = self._eye[keep_from:]
+            self._scan -= keep_from
+
+    def _measure(self, start: int, end: int, direction: float) -> Optional[Dict]:
+        """Valida un impulso y calcula ganancia y sacadas."""
+        times = self._times
+        duration = times[end] - times[start]
+        if not self.min_duration <= duration <= self.max_duration:
+            return None
+
+        head = direction * self._head
+        # Velocidad ocular compensatoria: opuesta a la cabeza
+        eye = -direction * self._eye
+
+        segment = slice(start, end + 1)
+        peak = start + int(np.argmax(head[segment]))
+        peak_velocity = head[peak]
+
+        rise_dt = np.diff(times[start:peak + 1])
+        rise_dv = np.diff(head[start:peak + 1])
+        valid_dt = rise_dt > 0
+        peak_acceleration = float(np.max(rise_dv[valid_dt] / rise_dt[valid_dt])) if valid_dt.any() else 0.0
+        if peak_acceleration < self.acceleration_threshold:
+            return None
+
+        # Sacadas: la velocidad compensatoria supera a la de cabeza
+        post_end = int(np.searchsorted(times, times[end] + self.post_window, side='right'))
+        window = slice(start, post_end)
+        with np.errstate(invalid='ignore'):
+            saccade_mask = (eye[window] - head[window]) > self.saccade_threshold
+        saccades = self._saccade_runs(saccade_mask, eye, start, end)
+
+        # Ganancia por áreas, excluyendo sacadas y muestras sin detección
+        weights = np.gradient(times[segment]) if end > start else np.ones(1)
+        usable = np.isfinite(eye[segment]) & ~saccade_mask[:end + 1 - start]
+        gain = None
+        if usable.sum() >= 0.5 * (end + 1 - start):
+            head_area = np.sum(head[segment][usable] * weights[usable])
+            if head_area > 0:
+                gain = float(np.sum(eye[segment][usable] * weights[usable]) / head_area)
+
+        gain_time = times[start] + self.gain_latency
+        gain_instant = None
+        if gain_time <= times[end] and usable.any():
+            head_at = np.interp(gain_time, times[segment][usable], head[segment][usable])
+            if head_at > 0:
+                eye_at = np.interp(gain_time, times[segment][usable], eye[segment][usable])
+                gain_instant = float(eye_at / head_at)
+
+        return {
+            'time': float(times[peak]),
+            'start': float(times[start]),
+            'end': float(times[end]),
+            'direction': int(direction),
+            'peak_velocity': float(peak_velocity),
+            'peak_acceleration': peak_acceleration,
+            'gain': gain,
+            'gain_instant': gain_instant,
+            'saccades': saccades,
+            'covert_saccade': any(s['type'] == 'covert' for s in saccades),
+            'overt_saccade': any(s['type'] == 'overt' for s in saccades),
+        }
+
+    def _saccade_runs(self, mask: np.ndarray, eye: np.ndarray, start: int, end: int) -> List[Dict]:
+        """Convierte la máscara de sacadas (desde start) en una lista de sacadas."""
+        edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        onsets = np.flatnonzero(edges == 1)
+        offsets = np.flatnonzero(edges == -1)
+
+        times = self._times
+        saccades = []
+        for onset, offset in zip(onsets, offsets):
+            onset_index = start + onset
+            run = slice(onset_index, start + offset)
+            saccades.append({
+                'time': float(times[onset_index]),
+                'latency': float(times[onset_index] - times[start]),
+                'peak_velocity': float(np.nanmax(eye[run])),
+                'type': 'covert' if onset_index <= end else 'overt',
+            })
+        return saccades
+
+
+def analyze_head_impulses(times, head_velocity, eye_velocity, **parameters) -> List[Dict]:
+    """
+    Variante por lotes: analiza una prueba completa.
+
+    Args:
+        times: Tiempos en segundos
+        head_velocity: Velocidad de cabeza en °/s
+        eye_velocity: Velocidad ocular en °/s
+        **parameters: Parámetros de HeadImpulseEngine
+
+    Returns:
+        Lista de impulsos (mismo formato que el motor en tiempo real)
+    """
+    engine = HeadImpulseEngine(**parameters)
+    impulses = engine.add_samples(times, head_velocity, eye_velocity)
+    impulses.extend(engine.flush())
+    return impulses
+
+
+def analyze_recorded_impulses(columns: Dict[str, np.ndarray], imu_stream: Optional[Dict] = None,
+                              eye: str = 'right', axis: str = 'x', **parameters) -> List[Dict]:
+    """
+    Analiza los impulsos de una prueba grabada.
+
+    Args:
+        columns: Columnas de la prueba (SievManager.extract_test_columns)
+        imu_stream: Stream crudo del IMU (SievManager.extract_test_imu_stream);
+                    si no existe se usa la columna imu_<axis> ya alineada
+        eye: 'left' o 'right'
+        axis: 'x' (horizontal) o 'y' (vertical)
+        **parameters: Parámetros de HeadImpulseEngine
+
+    Returns:
+        Lista de impulsos
+    """
+    times = np.asarray(columns['timestamp'], dtype=np.float64)
+    eye_position = np.asarray(columns[f'{eye}_eye_{axis}'], dtype=np.float64)
+    if len(times) < 3:
+        return []
+
+    stream_key = f'angle_{axis}'
+    if imu_stream and len(imu_stream.get('timestamp', ())) >= 2 and stream_key in imu_stream:
+        angle = np.degrees(np.unwrap(np.radians(imu_stream[stream_key])))
+        head_angle = align_imu_to_eye(times, imu_stream['timestamp'], angle)
+    else:
+        head_angle = np.degrees(np.unwrap(np.radians(np.asarray(columns[f'imu_{axis}'], dtype=np.float64))))
+
+    # Misma derivada hacia atrás que en tiempo real (add_positions), para que
+    # la ganancia de una prueba reprocesada coincida con la vista en vivo
+    engine = HeadImpulseEngine(**parameters)
+    impulses = engine.add_positions(times, head_angle, eye_position)
+    impulses.extend(engine.flush())
+    return impulses
@@ -19,6 +19,12 @@ class VideoPlayerThread(QThread):
     duration_changed = Signal(float)  # Duración total del video
     
     def __init__(self, video_data, analysis_config=None):
+        """
+        Args:
+            video_data: Ruta del archivo de video (se abre directamente) o
+                        datos binarios del video (se escriben a un temporal)
+            analysis_config: Configuración del análisis de pupila
+        """
         super().__init__()
         
         # === DATOS DEL VIDEO ===
@@ -52,17 +58,22 @@ class VideoPlayerThread(QThread):
         self.crop_area = None  # (x, y, width, height)
         
     def load_video_from_data(self):
-        """Cargar video desde datos binarios"""
+        """Cargar video desde una ruta o desde datos binarios"""
         try:
-            print("Cargando video desde datos...")
-            
-            # Crear archivo temporal
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
-                temp_file.write(self.video_data)
-                self.temp_video_path = temp_file.name
+            if isinstance(self.video_data, (str, os.PathLike)):
+                print("Cargando video desde archivo...")
+                video_path = os.fspath(self.video_data)
+            else:
+                print("Cargando video desde datos...")
+                
+                # Crear archivo temporal
+                with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as temp_file:
+                    temp_file.write(self.video_data)
+                    self.temp_video_path = temp_file.name
+                video_path = self.temp_video_path
             
             # Abrir con OpenCV
-            self.cap = cv2.VideoCapture(self.temp_video_path)
+            self.cap = cv2.VideoCapture(video_path)
             
             if not self.cap.isOpened():
                 print("Error: No se pudo abrir el video")
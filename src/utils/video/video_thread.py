@@ -1,12 +1,19 @@
 import cv2
 import numpy as np
 from PySide6.QtCore import QThread, Signal, QTimer
+from PySide6.QtGui import QImage
 import time
 from utils.video.video_processes import VideoProcesses
 
     
 class VideoThread(QThread):
-    frame_ready = Signal(np.ndarray, object, object)  
+    # Para la GUI, al ritmo de pantalla: frame, pupil_positions, gray (siempre None:
+    # el gray llega por positions_ready)
+    frame_ready = Signal(object, object, object)
+    # Para consumidores fuera de la GUI (conexión directa), a la tasa de la cámara:
+    # pupil_positions, gray
+    positions_ready = Signal(object, object)
+    scaled_frame_ready = Signal(QImage)  # Frame ya escalado al tamaño destino (fullscreen)
     
     def __init__(self, camera_id=2, cap_width=960,
                  cap_height=540, cap_fps=120, 
@@ -38,7 +45,38 @@ class VideoThread(QThread):
         self.nose_width = 0.25
         self.slider_th_pressed = False
         self.changed_prop_cap = False
+        
+        # Ritmo de visualización: no enviar a la UI más frames que el refresco de pantalla
+        self.display_interval = 1.0 / 60.0
+        self._last_display_time = 0.0
+        self.target_size = None  # (ancho, alto) para el frame escalado, o None
 
+    def set_display_rate(self, refresh_rate):
+        """Establece la frecuencia máxima (Hz) de frames enviados para mostrar."""
+        if refresh_rate and refresh_rate > 0:
+            self.display_interval = 1.0 / refresh_rate
+    
+    def set_target_size(self, width, height):
+        """Establece el tamaño destino del frame escalado (None para desactivar)."""
+        if width and height and width > 0 and height > 0:
+            self.target_size = (int(width), int(height))
+        else:
+            self.target_size = None
+    
+    def _scale_to_target(self, frame, target_size):
+        """Escala el frame RGB al tamaño destino manteniendo la proporción."""
+        target_w, target_h = target_size
+        height, width = frame.shape[:2]
+        scale = min(target_w / width, target_h / height)
+        new_w = max(1, int(width * scale))
+        new_h = max(1, int(height * scale))
+        
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+        scaled = cv2.resize(frame, (new_w, new_h), interpolation=interpolation)
+        
+        # copy(): el QImage debe ser dueño de sus datos al cruzar de hilo
+        return QImage(scaled.data, new_w, new_h, 3 * new_w, QImage.Format_RGB888).copy()
+    
     def toggle_yolo(self, enabled):
         """Activa o desactiva el uso de YOLO para detección de ojos"""
         try:
@@ -82,7 +120,7 @@ class VideoThread(QThread):
         
         # Emitir este frame directamente para actualizar la UI
         dummy_frame_rgb = cv2.cvtColor(dummy_frame, cv2.COLOR_BGR2RGB)
-        self.frame_ready.emit(dummy_frame_rgb, [None, None])
+        self.frame_ready.emit(dummy_frame_rgb, [None, None], None)
         
         print("Señales reiniciadas")
 
@@ -103,8 +141,17 @@ class VideoThread(QThread):
                     # Aquí está el problema - necesitamos usar .value para acceder a la variable compartida
                     self.vp.slider_th_pressed.value = self.slider_th_pressed
                     
-                    # Emitir frame y posiciones
-                    self.frame_ready.emit(frame, pupil_positions, gray)
+                    # Posiciones y gray a la tasa de la cámara (adquisición, grabación)
+                    self.positions_ready.emit(pupil_positions, gray)
+                    
+                    # A la GUI solo al ritmo de pantalla; el resto se descarta sin convertir
+                    now = time.perf_counter()
+                    if now - self._last_display_time >= self.display_interval:
+                        self._last_display_time = now
+                        target_size = self.target_size
+                        if target_size is not None and frame is not None:
+                            self.scaled_frame_ready.emit(self._scale_to_target(frame, target_size))
+                        self.frame_ready.emit(frame, pupil_positions, None)
                 else:
                     # Dormir un poco para no sobrecargar la CPU
                     time.sleep(0.001)
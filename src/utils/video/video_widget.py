@@ -1,7 +1,7 @@
         
 import numpy as np
-from PySide6.QtCore import QThread, Signal,QObject
-from PySide6.QtGui import QImage, QPixmap
+from PySide6.QtCore import QThread, Signal,QObject, Qt
+from PySide6.QtGui import QImage, QPixmap, QGuiApplication
 import time
 from utils.video.video_thread import VideoThread
 from utils.video.video_player_thread import VideoPlayerThread
@@ -9,6 +9,7 @@ from PySide6.QtCore import QTimer
 
 class VideoWidget(QObject):
     sig_pos = Signal(list)
+    sig_frame = Signal(QImage)  # Frame escalado por el VideoThread al tamaño fullscreen
     def __init__(self, camera_frame, sliders, cbres, camera_id=2, video_callback=None):
         super().__init__()
 
@@ -19,6 +20,9 @@ class VideoWidget(QObject):
         self.sliders = sliders
         self.camera_frame = camera_frame
         self.pos_eye = []
+        self.fullscreen_target_size = None
+        # Consumidores de positions_ready que corren en el hilo de video (sin pasar por la GUI)
+        self.position_consumers = []
 
         # === NUEVAS PROPIEDADES PARA PLAYER ===
         self.video_player_thread = None
@@ -63,11 +67,63 @@ class VideoWidget(QObject):
                                             cap_height=height, 
                                             cap_fps=fps, brightness=slider_brightness.value(), 
                                             contrast=slider_contrast.value())
-            self.video_thread.frame_ready.connect(self.update_frame)
+            self._connect_video_thread(self.video_thread)
                     
             self.current_fps = 0
             self.video_thread.start(QThread.HighPriority)
 
+    def _connect_video_thread(self, video_thread):
+        """Conecta las señales del VideoThread y le pasa el ritmo y tamaño de pantalla."""
+        video_thread.frame_ready.connect(self.update_camera_frame)
+        video_thread.positions_ready.connect(self._deliver_positions, Qt.DirectConnection)
+        for consumer in self.position_consumers:
+            video_thread.positions_ready.connect(consumer, Qt.DirectConnection)
+        video_thread.scaled_frame_ready.connect(self.sig_frame)
+        video_thread.set_display_rate(self._display_refresh_rate())
+        if self.fullscreen_target_size:
+            video_thread.set_target_size(*self.fullscreen_target_size)
+    
+    def add_position_consumer(self, consumer):
+        """
+        Registra un consumidor de (pupil_positions, gray) que se ejecuta
+        directamente en el hilo del VideoThread, a la tasa de la cámara.
+        Se mantiene conectado aunque el VideoThread se recree.
+        """
+        self.position_consumers.append(consumer)
+        if getattr(self, 'video_thread', None):
+            self.video_thread.positions_ready.connect(consumer, Qt.DirectConnection)
+    
+    def _deliver_positions(self, pupil_positions, gray_frame):
+        """
+        Desde el hilo de video, a la tasa de la cámara: pasa cada gray al
+        video_callback (grabación) y emite sig_pos con cada posición.
+        """
+        if gray_frame is not None and self.video_callback:
+            self.video_callback(gray_frame)  # main_window decide si procesar o no
+        
+        self.pos_eye = pupil_positions
+        self.sig_pos.emit(pupil_positions)
+    
+    def _display_refresh_rate(self):
+        """Frecuencia de refresco de la pantalla que muestra el video (Hz)."""
+        screen = self.camera_frame.screen() if hasattr(self.camera_frame, 'screen') else None
+        if screen is None:
+            screen = QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 60.0
+        return refresh_rate if refresh_rate and refresh_rate > 0 else 60.0
+    
+    def set_fullscreen_target(self, width, height):
+        """Pide al VideoThread frames ya escalados a este tamaño (ventana fullscreen)."""
+        self.fullscreen_target_size = (width, height)
+        if getattr(self, 'video_thread', None):
+            self.video_thread.set_target_size(width, height)
+    
+    def clear_fullscreen_target(self):
+        """Deja de producir frames escalados."""
+        self.fullscreen_target_size = None
+        if getattr(self, 'video_thread', None):
+            self.video_thread.set_target_size(None, None)
+    
     def _create_dummy_display(self):
         """Crea una imagen dummy de 640x200 con texto 'sin cámara'"""
         from PySide6.QtGui import QPainter, QFont, QColor
@@ -178,7 +234,7 @@ class VideoWidget(QObject):
 
         
             # Conectar señales al nuevo hilo
-            self.video_thread.frame_ready.connect(self.update_frame)
+            self._connect_video_thread(self.video_thread)
             
             # Iniciar el nuevo hilo
             print("Iniciando nuevo hilo de video...")
@@ -301,31 +357,23 @@ class VideoWidget(QObject):
             if config_update:
                 self.video_player_thread.update_analysis_config(config_update)
 
+    def update_camera_frame(self, frame, pupil_positions=None, gray_frame=None):
+        """
+        Muestra un frame de la cámara (llega al ritmo de pantalla). Las
+        posiciones y el gray llegan aparte por positions_ready.
+        """
+        try:
+            self._show_frame(frame)
+        except Exception as e:
+            print(f"Error en update_camera_frame: {e}")
+    
     def update_frame(self, frame, pupil_positions, gray_frame=None):
-        """Actualiza el frame de video y las posiciones de las pupilas"""
+        """
+        Actualiza el frame de video y las posiciones de las pupilas
+        (reproductor de video).
+        """
         try:          
-            # Actualizar la imagen
-            if frame is not None and frame.size > 0:
-                # Verificar que frame sea una matriz continua en memoria
-                if not frame.flags['C_CONTIGUOUS']:
-                    frame = np.ascontiguousarray(frame)
-                
-                height, width = frame.shape[:2]
-                bytes_per_line = 3 * width
-                
-                # Crear imagen QImage desde los datos
-                image = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
-                
-                if not image.isNull():
-                    # Crear QPixmap y establecer en el widget
-                    pixmap = QPixmap.fromImage(image)
-                    self.camera_frame.setPixmap(pixmap)
-                    
-                    # Ajustar el tamaño del QLabel si es necesario
-                    current_size = self.camera_frame.size()
-                    if current_size.width() != width or current_size.height() != height:
-                        print(f"Ajustando tamaño del widget a {width}x{height}")
-                        self.camera_frame.setFixedSize(width, height)
+            self._show_frame(frame)
 
             if gray_frame is not None and self.video_callback:
                 self.video_callback(gray_frame)  # main_window decide si procesar o no
@@ -340,6 +388,31 @@ class VideoWidget(QObject):
             print(f"Error en update_frame: {e}")
             import traceback
             traceback.print_exc()
+    
+    def _show_frame(self, frame):
+        """Convierte el frame RGB a QPixmap y lo muestra."""
+        # Actualizar la imagen
+        if frame is not None and frame.size > 0:
+            # Verificar que frame sea una matriz continua en memoria
+            if not frame.flags['C_CONTIGUOUS']:
+                frame = np.ascontiguousarray(frame)
+            
+            height, width = frame.shape[:2]
+            bytes_per_line = 3 * width
+            
+            # Crear imagen QImage desde los datos
+            image = QImage(frame.data, width, height, bytes_per_line, QImage.Format_RGB888)
+            
+            if not image.isNull():
+                # Crear QPixmap y establecer en el widget
+                pixmap = QPixmap.fromImage(image)
+                self.camera_frame.setPixmap(pixmap)
+                
+                # Ajustar el tamaño del QLabel si es necesario
+                current_size = self.camera_frame.size()
+                if current_size.width() != width or current_size.height() != height:
+                    print(f"Ajustando tamaño del widget a {width}x{height}")
+                    self.camera_frame.setFixedSize(width, height)
 
     def set_yolo_enabled(self, enabled):
         """Activa o desactiva el uso de YOLO"""
@@ -446,7 +519,7 @@ class VideoWidget(QObject):
             )
             
             # Conectar señales
-            self.video_thread.frame_ready.connect(self.update_frame)
+            self._connect_video_thread(self.video_thread)
             
             # Iniciar thread
             self.video_thread.start(QThread.HighPriority)
@@ -630,6 +703,7 @@ class VideoWidget(QObject):
             if hasattr(self, 'video_thread') and self.video_thread:
                 try:
                     self.video_thread.frame_ready.disconnect()
+                    self.video_thread.positions_ready.disconnect()
                 except:
                     pass
                 